@@ -0,0 +1,392 @@
+"""
+Benchmark local del pipeline de sincronización
+Genera tablas con volúmenes realistas en el backend SQLite embebido y mide
+los pasos de APIGateway, la comparación y la inyección sin SQL Server
+
+Uso:
+    python benchmark.py --filas 50000 --nodos 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database import DatabaseManager, close_all_pools
+from src.api_gateway import APIGateway
+from src.comparison import iter_records
+from src.injection import DataInjector
+
+MOTORES = ("hash", "merge", "pushdown", "parallel", "vector", "external")
+ESTADOS = ["OPEN", "IN PROGRESS", "PENDING", "RESOLVED", "CLOSED"]
+MOTIVOS = [
+    ("SIN SERVICIO", "FALLA"),
+    ("INTERMITENCIA", "FALLA"),
+    ("MANTENIMIENTO PROGRAMADO", "MANTENIMIENTO"),
+    ("MANTENIMIENTO DE RED", "MANTENIMIENTO CON AFECTACION"),
+    ("CONSULTA", "ATENCION"),
+]
+
+TABLAS = {
+    "[tigostar].[homeb2c_tck]": (
+        "Ticket NVARCHAR(50), Nodo NVARCHAR(50), Estado_Evento NVARCHAR(50), "
+        "Tecnico NVARCHAR(100), Cierre_Evento DATETIME"
+    ),
+    "[tigostar].[homeb2c_tiv]": (
+        "Incident NVARCHAR(50), Summary NVARCHAR(200), Reported_By NVARCHAR(100), "
+        "Reported_Date DATETIME, Nodo NVARCHAR(50), Status NVARCHAR(50), "
+        "Owner NVARCHAR(100), Owner_Group NVARCHAR(100)"
+    ),
+    "[tigostar].[homeb2c_consolidado]": (
+        "Incident NVARCHAR(50), Summary NVARCHAR(200), Reported_By NVARCHAR(100), "
+        "Reported_Date DATETIME, Nodo NVARCHAR(50), Status NVARCHAR(50), "
+        "Owner NVARCHAR(100), Owner_Group NVARCHAR(100), Ultima_Actualizacion DATETIME, "
+        "Fecha_Cierre DATETIME, Gestionado_En_A INT"
+    ),
+    "[tigostar].[homeb2c_mtv_a]": "MOTIVO_APERTURA NVARCHAR(200), CATEGORIA NVARCHAR(100)",
+    "[tigostar].[homecc_fal]": (
+        "Ticket NVARCHAR(50), Motivo_Apertura NVARCHAR(200), Direccion NVARCHAR(200), "
+        "Estado NVARCHAR(50), Inicio_Evento DATETIME, Cierre_Evento DATETIME, "
+        "Nodo NVARCHAR(50), Fecha_Fin_Falla DATETIME, Fecha_Creado DATETIME, "
+        "Crea NVARCHAR(100), Clientes_Afectados NVARCHAR(20)"
+    ),
+    "[dbo].[tabla1]": (
+        "Codigo NVARCHAR(50), Nombre NVARCHAR(100), Nodo NVARCHAR(50), "
+        "Estado NVARCHAR(50), Monto DECIMAL(12,2), Ultima_Actualizacion DATETIME"
+    ),
+    "[dbo].[tabla2]": (
+        "Codigo NVARCHAR(50), Nombre NVARCHAR(100), Nodo NVARCHAR(50), "
+        "Estado NVARCHAR(50), Monto DECIMAL(12,2), Ultima_Actualizacion DATETIME"
+    ),
+}
+
+# Índices equivalentes a las claves de las tablas reales
+INDICES = [
+    "CREATE INDEX [tigostar].ix_tiv_incident ON homeb2c_tiv (Incident)",
+    "CREATE INDEX [tigostar].ix_consolidado_incident ON homeb2c_consolidado (Incident)",
+    "CREATE INDEX [tigostar].ix_consolidado_nodo ON homeb2c_consolidado (Nodo)",
+    "CREATE INDEX [tigostar].ix_tck_ticket ON homeb2c_tck (Ticket)",
+    "CREATE INDEX [tigostar].ix_fal_ticket ON homecc_fal (Ticket, Nodo)",
+    "CREATE INDEX ix_tabla1_codigo ON tabla1 (Codigo)",
+    "CREATE INDEX ix_tabla2_codigo ON tabla2 (Codigo)",
+    "CREATE INDEX ix_tabla1_actualizacion ON tabla1 (Ultima_Actualizacion)",
+    "CREATE INDEX ix_tabla2_actualizacion ON tabla2 (Ultima_Actualizacion)",
+]
+
+
+def crear_config(ruta: str) -> dict:
+    """DB_CONFIG para el backend SQLite en `ruta` (archivo o ":memory:")"""
+    return {"backend": "sqlite", "database": ruta, "schemas": ["tigostar"]}
+
+
+def sembrar(db: DatabaseManager, filas: int, nodos: int, semilla: int = 42):
+    """
+    Crea y llena las tablas de prueba
+    - tiv (B) con `filas` incidentes; ~90% pasan a consolidado (C)
+    - tck (A) gestiona ~10% de los incidentes
+    - tabla1/tabla2 comparten ~80% de los códigos; ~5% con otros valores
+    """
+    rnd = random.Random(semilla)
+    ahora = datetime.now()
+    nombres_nodo = [f"NODO{i}" for i in range(1, nodos + 1)]
+
+    for tabla, columnas in TABLAS.items():
+        db.execute_non_query(f"DROP TABLE IF EXISTS {tabla}")
+        db.execute_non_query(f"CREATE TABLE {tabla} ({columnas})")
+    db.schema.invalidate()
+
+    db.execute_insert(
+        "INSERT INTO [tigostar].[homeb2c_mtv_a] VALUES (?, ?)", MOTIVOS, bulk=True
+    )
+
+    tiv, consolidado, tck = [], [], []
+    for i in range(filas):
+        incidente = f"INC{i:08d}"
+        motivo = rnd.choice(MOTIVOS)[0]
+        nodo = rnd.choice(nombres_nodo)
+        reportado = ahora - timedelta(minutes=rnd.randint(0, 60 * 24 * 30))
+        estado = rnd.choice(ESTADOS)
+        owner = f"TECNICO{rnd.randint(1, 200)}"
+        fila = (incidente, motivo, f"USUARIO{rnd.randint(1, 500)}", reportado, nodo,
+                estado, owner, f"GRUPO{rnd.randint(1, 20)}")
+        tiv.append(fila)
+        if rnd.random() < 0.9:
+            # Parte del consolidado quedó desactualizado respecto a B
+            estado_c = estado if rnd.random() < 0.8 else rnd.choice(ESTADOS)
+            consolidado.append(fila[:5] + (estado_c,) + fila[6:] + (
+                ahora - timedelta(minutes=rnd.randint(0, 60)), None, 0,
+            ))
+        if rnd.random() < 0.1:
+            tck.append((incidente, nodo, rnd.choice(ESTADOS), owner,
+                        None if rnd.random() < 0.5 else ahora))
+
+    db.execute_insert("INSERT INTO [tigostar].[homeb2c_tiv] VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                      tiv, bulk=True)
+    db.execute_insert(
+        "INSERT INTO [tigostar].[homeb2c_consolidado] "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        consolidado, bulk=True,
+    )
+    db.execute_insert("INSERT INTO [tigostar].[homeb2c_tck] VALUES (?, ?, ?, ?, ?)",
+                      tck, bulk=True)
+
+    tabla1, tabla2 = [], []
+    for i in range(filas):
+        fila = (f"COD{i:08d}", f"CLIENTE {i}", rnd.choice(nombres_nodo),
+                rnd.choice(ESTADOS), round(rnd.uniform(1, 10000), 2), "2024-01-01 00:00:00")
+        destino = rnd.random()
+        if destino < 0.75:
+            tabla1.append(fila)
+            tabla2.append(fila)
+        elif destino < 0.8:
+            tabla1.append(fila)
+            tabla2.append(fila[:3] + ("MODIFICADO",) + fila[4:])
+        elif destino < 0.9:
+            tabla1.append(fila)
+        else:
+            tabla2.append(fila)
+    db.execute_insert("INSERT INTO [dbo].[tabla1] VALUES (?, ?, ?, ?, ?, ?)", tabla1, bulk=True)
+    db.execute_insert("INSERT INTO [dbo].[tabla2] VALUES (?, ?, ?, ?, ?, ?)", tabla2, bulk=True)
+    for indice in INDICES:
+        db.execute_non_query(indice)
+    db.execute_non_query("DROP TABLE IF EXISTS [dbo].[tabla3]")
+    db.execute_non_query("DROP TABLE IF EXISTS [dbo].[sync_watermark]")
+    db.schema.invalidate()
+    return nombres_nodo
+
+
+def medir(resultados: dict, nombre: str, func, *args, **kwargs):
+    """Ejecuta func y guarda su duración en segundos bajo `nombre`"""
+    inicio = time.perf_counter()
+    valor = func(*args, **kwargs)
+    resultados[nombre] = round(time.perf_counter() - inicio, 3)
+    print(f"  {nombre:<32} {resultados[nombre]:>9.3f} s")
+    return valor
+
+
+def comparar_str(comparador, tablas: dict) -> tuple:
+    """Línea base original: conjuntos de str(dict) por fila (sin columnas clave)"""
+    origen = comparador.get_table_data(tablas["source_table"])
+    comparacion = comparador.get_table_data(tablas["comparison_table"])
+    origen_set = {str(item) for item in origen}
+    comparacion_set = {str(item) for item in comparacion}
+    return (
+        [item for item in origen if str(item) not in comparacion_set],
+        [item for item in comparacion if str(item) not in origen_set],
+        [item for item in origen if str(item) in comparacion_set],
+    )
+
+
+def comparar_tabla_resultado(db: DatabaseManager, tablas: dict) -> dict:
+    """
+    Inserción y consultas sobre tabla3 tipada e indexada frente al formato
+    anterior (todas las columnas NVARCHAR(MAX), sin índices)
+    """
+    columnas = ["Codigo", "Nombre", "Nodo", "Estado", "Monto"]
+    codigos = [fila[0] for fila in db.execute_query(
+        "SELECT TOP 500 Codigo FROM [dbo].[tabla1] ORDER BY Monto"
+    )]
+    resultado = {}
+    for formato, tabla in (("nvarchar_max", "dbo.tabla3_nvarchar"), ("tipada", "dbo.tabla3")):
+        db.execute_non_query(f"DROP TABLE IF EXISTS {tabla}")
+        db.schema.invalidate(tabla)
+        if formato == "nvarchar_max":
+            db.execute_non_query(
+                f"CREATE TABLE {tabla} (ID INT PRIMARY KEY IDENTITY(1,1), "
+                + ", ".join(f"[{c}] NVARCHAR(MAX)" for c in columnas)
+                + ", [TIPO_COMPARACION] NVARCHAR(50))"
+            )
+        injector = DataInjector(db, {**tablas, "result_table": tabla})
+        tiempos = {}
+        medir(tiempos, f"inject_data[{formato}]", injector.inject_data, bulk=True, pipelined=False)
+        medir(tiempos, f"tabla3[{formato}] por tipo", db.execute_query,
+              f"SELECT COUNT(*) FROM {tabla} WHERE TIPO_COMPARACION = 'MODIFICADO'")
+        medir(tiempos, f"tabla3[{formato}] 500 claves", lambda: [
+            db.execute_query(f"SELECT * FROM {tabla} WHERE Codigo = ?", (codigo,))
+            for codigo in codigos
+        ])
+        resultado[formato] = tiempos
+    return resultado
+
+
+def comparar_lotes(db: DatabaseManager) -> dict:
+    """
+    Inserción sin bulk (un commit por lote) con batch_size fijo frente al
+    tamaño adaptativo; la segunda corrida adaptativa parte del tamaño aprendido
+    """
+    filas = db.execute_query("SELECT Codigo, Nombre, Nodo, Estado, Monto FROM [dbo].[tabla1]")
+    db.execute_non_query("DROP TABLE IF EXISTS [dbo].[tabla_lotes]")
+    db.execute_non_query(
+        "CREATE TABLE [dbo].[tabla_lotes] (Codigo NVARCHAR(20), Nombre NVARCHAR(100), "
+        "Nodo NVARCHAR(10), Estado NVARCHAR(20), Monto DECIMAL(12,2))"
+    )
+    consulta = "INSERT INTO [dbo].[tabla_lotes] VALUES (?, ?, ?, ?, ?)"
+    resultado = {}
+    for nombre, adaptativo in (("fijo", False), ("adaptativo", True),
+                               ("aprendido", True)):
+        db.execute_non_query("DELETE FROM [dbo].[tabla_lotes]")
+        medir(resultado, f"execute_insert[{nombre}]", db.execute_insert, consulta, filas,
+              adaptive=adaptativo)
+        resultado[nombre] = db.last_insert_stats.get("lotes", {}).get("tamanos")
+    db.execute_non_query("DROP TABLE [dbo].[tabla_lotes]")
+    return resultado
+
+
+def bytes_por_fila(db: DatabaseManager, tabla: str, columnas: list) -> dict:
+    """Memoria retenida por fila: diccionarios (get_table_data) vs registros compactos"""
+    consulta = f"SELECT {', '.join(f'[{c}]' for c in columnas)} FROM {tabla}"
+    formatos = {
+        "dict": lambda: [dict(zip(columnas, fila)) for fila in db.iter_query(consulta)],
+        "registro": lambda: list(iter_records(db, consulta, columnas)),
+    }
+    resultado = {}
+    for nombre, cargar in formatos.items():
+        tracemalloc.start()
+        filas = cargar()
+        retenida, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        resultado[nombre] = round(retenida / max(len(filas), 1), 1)
+        del filas
+    return resultado
+
+
+def ejecutar(args) -> dict:
+    """Siembra los datos y mide el pipeline completo"""
+    db = DatabaseManager(crear_config(args.db))
+    tablas = {"source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+              "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+              "ignore_columns": ["Ultima_Actualizacion"],
+              "watermark_column": "Ultima_Actualizacion"}
+    resultados = {}
+
+    print(f"Sembrando {args.filas} filas en {args.nodos} nodos ({args.db})")
+    nodos = medir(resultados, "siembra", sembrar, db, args.filas, args.nodos, args.semilla)
+    db.metrics.reset()
+
+    gateway = APIGateway(db, tablas)
+    gateway.comparador.indice.directorio = os.path.join(os.path.dirname(args.db), "cache")
+    muestra = nodos[:args.muestra_nodos]
+    medir(resultados, "process_node", lambda: [gateway.process_node(n) for n in muestra])
+    medir(resultados, "process_node_optimizado",
+          lambda: [gateway.process_node_optimizado(n) for n in muestra])
+
+    # Tres ediciones en un nodo: el índice de checksums sólo baja a sus subrangos
+    for (ticket,) in db.execute_query(
+        "SELECT TOP 3 Ticket FROM [tigostar].[homeb2c_tck] WHERE Nodo = ?", (muestra[0],)
+    ):
+        db.execute_non_query(
+            "UPDATE [tigostar].[homeb2c_tck] SET Estado_Evento = 'EDITADO' WHERE Ticket = ?",
+            (ticket,)
+        )
+    incremental = medir(resultados, "comparar_optimizado[3 cambios]",
+                        gateway.comparador.comparar_optimizado,
+                        muestra[0], "homeb2c_tck", "homeb2c_tiv")
+    resultados["filas_transferidas_3_cambios"] = incremental.get("registros_procesados")
+    print(f"  filas transferidas (3 cambios)   {resultados['filas_transferidas_3_cambios']}")
+
+    injector = DataInjector(db, tablas)
+    resultados["comparacion"] = {}
+    medir(resultados, "compare[str]", comparar_str, injector.comparator, tablas)
+    for motor in MOTORES:
+        comparacion = medir(resultados, f"compare[{motor}]", injector.comparator.compare, motor)
+        resultados["comparacion"][motor] = comparacion.stats
+    medir(resultados, "compare_tables", injector.comparator.compare_tables)
+    resultados["bytes_por_fila"] = bytes_por_fila(
+        db, tablas["source_table"], ["Codigo", "Nombre", "Nodo", "Estado", "Monto"]
+    )
+    print(f"  bytes por fila                   {resultados['bytes_por_fila']}")
+    resultados["tabla_resultado"] = comparar_tabla_resultado(db, tablas)
+    resultados["lotes"] = comparar_lotes(db)
+    print(f"  tamaños de lote adaptativos      {resultados['lotes']['aprendido']}")
+    injector.clear_result_table()
+    medir(resultados, "inject_pipelined", injector.inject_pipelined, bulk=True)
+    resultados["pipeline"] = injector.last_pipeline_stats
+    print(f"  etapas de la tubería             "
+          f"comparación={resultados['pipeline']['comparacion']['registros_por_segundo']}/s "
+          f"escritura={[e['registros_por_segundo'] for e in resultados['pipeline']['escritores']]}/s")
+
+    # Incremental: reconciliación completa y luego una corrida con 10 cambios
+    medir(resultados, "inject_incremental[completo]", injector.inject_incremental, bulk=True)
+    for (codigo,) in db.execute_query("SELECT TOP 10 Codigo FROM [dbo].[tabla1]"):
+        db.execute_non_query(
+            "UPDATE [dbo].[tabla1] SET Estado = 'EDITADO', "
+            "Ultima_Actualizacion = '2024-02-01 00:00:00' WHERE Codigo = ?", (codigo,)
+        )
+    medir(resultados, "inject_incremental[10 cambios]", injector.inject_incremental, bulk=True)
+
+    # Diferencial: la primera corrida completa ROW_HASH; luego 1% de filas cambiadas
+    medir(resultados, "inject_differential[huellas]", injector.inject_differential, bulk=True)
+    cambios = max(args.filas // 100, 1)
+    for (codigo,) in db.execute_query(f"SELECT TOP {cambios} Codigo FROM [dbo].[tabla1]"):
+        db.execute_non_query(
+            "UPDATE [dbo].[tabla1] SET Estado = 'DIFERENCIAL' WHERE Codigo = ?", (codigo,)
+        )
+    medir(resultados, "inject_differential[1% cambios]", injector.inject_differential, bulk=True)
+    resultados["diferencial"] = injector.last_differential_stats
+    print(f"  diferencial (1% cambios)         {resultados['diferencial']}")
+    resultados["escritores"] = {}
+    for escritores in (1, 2, 4):
+        injector.clear_result_table()
+        medir(resultados, f"inject_sharded[{escritores} escritores]", injector.inject_sharded,
+              escritores, bulk=True)
+        resultados["escritores"][escritores] = [
+            e["registros_por_segundo"] for e in injector.last_sharded_stats["escritores"]
+        ]
+    print(f"  registros/s por escritor         {resultados['escritores']}")
+    medir(resultados, "inject_staged", injector.inject_staged, bulk=True)
+    resultados["staging"] = injector.last_staged_stats
+    print(f"  etapas del staging               {resultados['staging']}")
+    medir(resultados, "truncate + inject_data", lambda: (
+        injector.clear_result_table()
+        and injector.inject_data(bulk=True, pipelined=False, differential=False)
+    ))
+
+    resultados["consultas"] = db.metrics.report()
+    return resultados
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark local con backend SQLite")
+    parser.add_argument("--filas", type=int, default=50000)
+    parser.add_argument("--nodos", type=int, default=20)
+    parser.add_argument("--muestra-nodos", type=int, default=3,
+                        help="nodos procesados por APIGateway")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--db", help="archivo SQLite (por defecto uno temporal)")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    temporal = None
+    if not args.db:
+        temporal = tempfile.TemporaryDirectory()
+        args.db = os.path.join(temporal.name, "benchmark.db")
+
+    try:
+        resultados = ejecutar(args)
+        print("\nConsultas (ms):")
+        for label, datos in resultados["consultas"].items():
+            print(
+                f"  {label:<32} llamadas={datos['llamadas']:<5} filas={datos['filas']:<8} "
+                f"p50={datos['ejecutar_ms']['p50']:<8} total={datos['ejecutar_ms']['total']}"
+            )
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+        return 0
+    finally:
+        close_all_pools()
+        if temporal:
+            temporal.cleanup()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -214,6 +214,7 @@ def get_stats():
     """
     Endpoint: GET /api/gateway/stats
     Obtiene estadísticas de optimización (caché, checksums, tiempo ahorrado)
+    y percentiles p50/p95/p99 por consulta (PASO 1-6) y estado del pool
     """
     try:
         logger.info("Obteniendo estadísticas de optimización")
@@ -6,6 +6,7 @@ Orquesta el flujo de comparación e inyección de datos usando el API Gateway
 import sys
 from src.logger import setup_logger
 from src.api_gateway import APIGateway
+from src.database import close_all_pools
 from config.credentials import DB_CONFIG
 
 logger = setup_logger(__name__)
@@ -54,6 +55,7 @@ def main():
         logger.error(f"❌ Error inesperado: {e}")
         return 1
     finally:
+        close_all_pools()
         logger.info("=" * 60)
         logger.info("Proceso finalizado")
         logger.info("=" * 60)
@@ -3,12 +3,19 @@ from fastapi import FastAPI, HTTPException, Query
 from datetime import datetime
 import logging
 from src.database import DatabaseManager  # <-- usa tu clase existente
+from src.async_database import AsyncDatabaseManager
 
 app = FastAPI(title="API Gateway - Motor Integrado")
 logger = logging.getLogger("api_gateway")
 logger.setLevel(logging.INFO)
 
 db = DatabaseManager()  # instancia con la configuración que ya carga desde config.credentials
+adb = AsyncDatabaseManager(db)  # executor propio, acotado al tamaño del pool
+
+
+@app.on_event("shutdown")
+def cerrar_executor():
+    adb.close()
 
 
 def _serialize_row(columns, row):
@@ -23,28 +30,25 @@ def _serialize_row(columns, row):
 
 
 @app.get("/tickets")
-def obtener_tickets(nodo: str = Query(..., min_length=1)):
+async def obtener_tickets(nodo: str = Query(..., min_length=1)):
     if not nodo:
         raise HTTPException(status_code=400, detail="Nodo vacío")
 
     try:
         # Paso 1: revisar última actualización
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-
+        async with adb.transaction() as tx:
             check_sql = """
             SELECT TOP 1 Ultima_Actualizacion
             FROM tigostar.homeb2c_consolidado
             WHERE Ultima_Actualizacion > DATEADD(MINUTE, -10, GETDATE())
             """
-            cursor.execute(check_sql)
-            last = cursor.fetchone()
+            _, last = await tx.fetch(check_sql, label="paso1_revisar_tiempo")
             if not last:
                 # Si prefieres no abortar, puedes comentar la siguiente línea y continuar.
                 return {"success": False, "error": "Datos no actualizados en los últimos 10 minutos"}
 
             # PASO 2 - Cierres automáticos (UPDATE)
-            cursor.execute("""
+            await tx.execute("""
             UPDATE C
             SET C.Fecha_Cierre = GETDATE(),
                 C.Status = 'CLOSED',
@@ -53,11 +57,11 @@ def obtener_tickets(nodo: str = Query(..., min_length=1)):
             WHERE C.Fecha_Cierre IS NULL
               AND NOT EXISTS (SELECT 1 FROM tigostar.homeb2c_tiv B WHERE B.Incident = C.Incident)
               AND NOT EXISTS (SELECT 1 FROM tigostar.homeb2c_tck A WHERE A.Ticket = C.Incident AND A.Cierre_Evento IS NULL)
-            """)
-            conn.commit()
+            """, label="paso2_cierres_automaticos")
+            await tx.commit()
 
             # PASO 3 - MERGE TIV -> CONSOLIDADO
-            cursor.execute("""
+            await tx.execute("""
             MERGE tigostar.homeb2c_consolidado AS TGT
             USING tigostar.homeb2c_tiv AS SRC
               ON TGT.Incident = SRC.Incident
@@ -66,11 +70,11 @@ def obtener_tickets(nodo: str = Query(..., min_length=1)):
             WHEN NOT MATCHED THEN
               INSERT (Incident, Summary, Reported_By, Reported_Date, Nodo, Status, Owner, Owner_Group, Ultima_Actualizacion)
               VALUES (SRC.Incident, SRC.Summary, SRC.Reported_By, SRC.Reported_Date, SRC.Nodo, SRC.Status, SRC.Owner, SRC.Owner_Group, GETDATE());
-            """)
-            conn.commit()
+            """, label="paso3_merge_tiv")
+            await tx.commit()
 
             # PASO 4 - Prioridad gestión manual (A -> C)
-            cursor.execute("""
+            await tx.execute("""
             UPDATE C
             SET C.Gestionado_En_A = 1,
                 C.Status = A.Estado_Evento,
@@ -79,11 +83,11 @@ def obtener_tickets(nodo: str = Query(..., min_length=1)):
                 C.Ultima_Actualizacion = GETDATE()
             FROM tigostar.homeb2c_consolidado C
             INNER JOIN tigostar.homeb2c_tck A ON C.Incident = A.Ticket
-            """)
-            conn.commit()
+            """, label="paso4_gestion_equipo")
+            await tx.commit()
 
             # PASO 5 - Volcado a homecc_fal (MERGE)
-            cursor.execute("""
+            await tx.execute("""
             MERGE tigostar.homecc_fal AS FAL
             USING (
                 SELECT CON.*
@@ -100,8 +104,8 @@ def obtener_tickets(nodo: str = Query(..., min_length=1)):
             WHEN NOT MATCHED THEN
               INSERT (Ticket, Motivo_Apertura, Direccion, Estado, Inicio_Evento, Cierre_Evento, Nodo, Fecha_Fin_Falla, Fecha_Creado, Crea, Clientes_Afectados)
               VALUES (SOURCE.Incident, SOURCE.Summary, '', SOURCE.Status, SOURCE.Reported_Date, SOURCE.Fecha_Cierre, SOURCE.Nodo, SOURCE.Fecha_Cierre, SOURCE.Reported_Date, SOURCE.Owner, '0');
-            """)
-            conn.commit()
+            """, label="paso5_merge_fallas")
+            await tx.commit()
 
             # PASO 6 - Consulta final (SELECT parametrizado)
             select_sql = """
@@ -115,10 +119,7 @@ def obtener_tickets(nodo: str = Query(..., min_length=1)):
             WHERE Nodo = ?
               AND Fecha_Cierre IS NULL
             """
-            cursor.execute(select_sql, (nodo,))
-            rows = cursor.fetchall()
-            columns = [c[0] for c in cursor.description] if cursor.description else []
-
+            columns, rows = await tx.fetch(select_sql, (nodo,), label="paso6_datos_nodo")
             data = [_serialize_row(columns, row) for row in rows]
 
             return {"success": True, "data": data}
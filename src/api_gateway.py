@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any
 from src.database import DatabaseManager
 from src.optimizacion import SyncCache, ComparadorOptimizado, MonitorOptimizacion
+from src.resilience import CircuitBreaker
 from config.credentials import TABLES_CONFIG
 
 logger = logging.getLogger(__name__)
@@ -18,9 +19,9 @@ logger = logging.getLogger(__name__)
 class APIGateway:
     """Motor de sincronización entre tablas"""
 
-    def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.config = TABLES_CONFIG
+    def __init__(self, db_manager=None, config=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.config = config or TABLES_CONFIG
         # Inicializar sistemas de optimización
         self.cache = SyncCache(self.db_manager)
         self.comparador = ComparadorOptimizado(self.db_manager, self.cache)
@@ -35,6 +36,11 @@ class APIGateway:
         if not nodo or not nodo.strip():
             return {"success": False, "error": "Nodo vacio"}
 
+        # Con la BD caída no tiene sentido intentar los pasos uno por uno
+        if self.db_manager.breaker.state == CircuitBreaker.OPEN:
+            logger.error(f"Nodo {nodo} omitido: circuito de base de datos abierto")
+            return {"success": False, "error": "Base de datos no disponible (circuito abierto)"}
+
         try:
             # PASO 1: REVISAR TIEMPO - Verificar si hay actualizaciones recientes
             logger.info(f"PASO 1: Revisando tiempo para nodo {nodo}")
@@ -44,7 +50,7 @@ class APIGateway:
                 WHERE Ultima_Actualizacion > DATEADD(MINUTE, -10, GETDATE())
             """
             try:
-                res_check = self.db_manager.execute_query(check)
+                res_check = self.db_manager.execute_query(check, label="paso1_revisar_tiempo")
                 if not res_check:
                     logger.warning("No hay actualizaciones recientes")
             except Exception as e:
@@ -71,7 +77,7 @@ class APIGateway:
                 )
             """
             try:
-                self._execute_update(update_cierres)
+                self._execute_update(update_cierres, "paso2_cierres_automaticos")
                 logger.info("Cierres automáticos detectados y actualizados")
             except Exception as e:
                 logger.error(f"Error en detección de cierres: {e}")
@@ -91,7 +97,7 @@ class APIGateway:
                     VALUES (SRC.Incident, SRC.Summary, SRC.Reported_By, SRC.Reported_Date, SRC.Nodo, SRC.Status, SRC.Owner, SRC.Owner_Group, GETDATE());
             """
             try:
-                self._execute_update(merge_sync)
+                self._execute_update(merge_sync, "paso3_merge_tiv")
                 logger.info("Sincronización de carga automática completada")
             except Exception as e:
                 logger.error(f"Error en sincronización B->C: {e}")
@@ -109,7 +115,7 @@ class APIGateway:
                 AND UPPER(ISNULL(SRC.Status, C.Status)) IN ('CLOSED','RESOLVED')
             """
             try:
-                self._execute_update(close_by_status)
+                self._execute_update(close_by_status, "paso3.1_cerrar_por_status")
             except Exception as e:
                 logger.error(f"Error cerrando por Status: {e}")
             
@@ -127,7 +133,7 @@ class APIGateway:
                 AND UPPER(ISNULL(SRC.Status,'')) NOT IN ('CLOSED','RESOLVED')
             """
             try:
-                self._execute_update(reopen_by_status)
+                self._execute_update(reopen_by_status, "paso3.2_reabrir_por_status")
             except Exception as e:
                 logger.error(f"Error reabriendo por Status: {e}")
 
@@ -147,7 +153,7 @@ class APIGateway:
                 ON C.Incident = A.Ticket
             """
             try:
-                self._execute_update(update_gestion)
+                self._execute_update(update_gestion, "paso4_gestion_equipo")
                 logger.info("Prioridad de gestión de equipo aplicada")
             except Exception as e:
                 logger.error(f"Error en prioridad A->C: {e}")
@@ -175,7 +181,7 @@ class APIGateway:
                     VALUES (SOURCE.Incident, SOURCE.Summary, '', SOURCE.Status, SOURCE.Reported_Date, SOURCE.Fecha_Cierre, SOURCE.Nodo, SOURCE.Fecha_Cierre, SOURCE.Reported_Date, SOURCE.Owner, '0');
             """
             try:
-                self._execute_update(merge_fallas)
+                self._execute_update(merge_fallas, "paso5_merge_fallas")
                 logger.info("Volcado a fallas masivas completado")
             except Exception as e:
                 logger.error(f"Error en volcado a fallas: {e}")
@@ -195,8 +201,12 @@ class APIGateway:
                 AND UPPER(ISNULL(Status,'')) NOT IN ('CLOSED','RESOLVED')
             """
 
+            # Lectura enviada a la réplica si existe (puede llevar un retraso
+            # mínimo respecto a los pasos anteriores ejecutados en el primario)
             try:
-                results = self.db_manager.execute_query(sql_data, (nodo,))
+                results = self.db_manager.execute_query(
+                    sql_data, (nodo,), label="paso6_datos_nodo", route="read"
+                )
                 for row in results:
                     response["data"].append(self._format_row(row))
                 logger.info(f"Obtenidos {len(response['data'])} registros")
@@ -212,12 +222,10 @@ class APIGateway:
 
         return response
 
-    def _execute_update(self, query: str) -> None:
+    def _execute_update(self, query: str, label: str = None) -> None:
         """Ejecuta una consulta de actualización (UPDATE/MERGE/INSERT)"""
         try:
-            with self.db_manager.get_cursor() as cursor:
-                cursor.execute(query)
-                cursor.commit()
+            self.db_manager.execute_non_query(query, label=label)
         except Exception as e:
             logger.error(f"Error ejecutando update: {e}")
             raise
@@ -247,7 +255,7 @@ class APIGateway:
                 FROM [tigostar].[homeb2c_consolidado]
                 WHERE Nodo = ?
             """
-            result = self.db_manager.execute_query(query, (nodo,))
+            result = self.db_manager.execute_query(query, (nodo,), route="read")
             if result:
                 row = result[0]
                 return {
@@ -276,7 +284,7 @@ class APIGateway:
                 SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_tck]
                 WHERE Nodo IS NOT NULL
             """
-            resultados_a = self.db_manager.execute_query(query_a)
+            resultados_a = self.db_manager.execute_query(query_a, route="read")
             if resultados_a:
                 for row in resultados_a:
                     if row[0]:
@@ -289,7 +297,7 @@ class APIGateway:
                 SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_tiv]
                 WHERE Nodo IS NOT NULL
             """
-            resultados_b = self.db_manager.execute_query(query_b)
+            resultados_b = self.db_manager.execute_query(query_b, route="read")
             if resultados_b:
                 for row in resultados_b:
                     if row[0]:
@@ -302,7 +310,7 @@ class APIGateway:
                 SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_consolidado]
                 WHERE Nodo IS NOT NULL
             """
-            resultados_c = self.db_manager.execute_query(query_c)
+            resultados_c = self.db_manager.execute_query(query_c, route="read")
             if resultados_c:
                 for row in resultados_c:
                     if row[0]:
@@ -331,19 +339,19 @@ class APIGateway:
             
             # Tabla A
             query_a = "SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_tck] WHERE Nodo IS NOT NULL"
-            resultados_a = self.db_manager.execute_query(query_a)
+            resultados_a = self.db_manager.execute_query(query_a, route="read")
             if resultados_a:
                 nodos_a = {row[0].strip() for row in resultados_a if row[0]}
             
             # Tabla B
             query_b = "SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_tiv] WHERE Nodo IS NOT NULL"
-            resultados_b = self.db_manager.execute_query(query_b)
+            resultados_b = self.db_manager.execute_query(query_b, route="read")
             if resultados_b:
                 nodos_b = {row[0].strip() for row in resultados_b if row[0]}
             
             # Tabla C
             query_c = "SELECT DISTINCT Nodo FROM [tigostar].[homeb2c_consolidado] WHERE Nodo IS NOT NULL"
-            resultados_c = self.db_manager.execute_query(query_c)
+            resultados_c = self.db_manager.execute_query(query_c, route="read")
             if resultados_c:
                 nodos_c = {row[0].strip() for row in resultados_c if row[0]}
             
@@ -387,7 +395,9 @@ class APIGateway:
             response['optimizacion'] = {
                 'desde_cache': resultado_comparacion.get('desde_cache', False),
                 'razon': resultado_comparacion.get('razon', ''),
-                'tiempo_ahorrado': 'sí' if resultado_comparacion.get('desde_cache') else 'no'
+                'tiempo_ahorrado': 'sí' if resultado_comparacion.get('desde_cache') else 'no',
+                'subrangos_modificados': resultado_comparacion.get('subrangos_modificados', 0),
+                'filas_transferidas': resultado_comparacion.get('registros_procesados', 0)
             }
             
             # Si está en caché y sin cambios, retornar directamente
@@ -420,9 +430,18 @@ class APIGateway:
         return response
     
     def get_optimization_stats(self) -> Dict[str, Any]:
-        """Obtiene estadísticas de optimización"""
+        """
+        Obtiene estadísticas de optimización, percentiles por consulta y
+        tamaños de lote adaptativos por sentencia INSERT
+        """
         return {
             'success': True,
-            'estadisticas': self.monitor.reporte()
+            'estadisticas': self.monitor.reporte(),
+            'consultas': self.db_manager.metrics.report(),
+            'pool': self.db_manager.pool.stats(),
+            'pool_lectura': self.db_manager.read_pool.stats(),
+            'circuito': self.db_manager.breaker.stats(),
+            'circuito_lectura': self.db_manager.read_breaker.stats(),
+            'lotes': self.db_manager.batch_sizes.report()
         }
 
@@ -0,0 +1,121 @@
+"""
+Fachada asíncrona sobre DatabaseManager
+Ejecuta las llamadas bloqueantes de pyodbc en un executor dedicado y acotado
+al tamaño del pool, sin ocupar el threadpool por defecto de FastAPI
+Un semáforo con tantos cupos como hilos limita las llamadas y transacciones
+en curso: ningún hilo queda bloqueado esperando una conexión que sólo podría
+liberar una transacción sin hilo para avanzar
+"""
+
+import asyncio
+import functools
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from src.database import DatabaseManager
+from src.metrics import label_for
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransaction:
+    """Conexión prestada del pool, usada desde corrutinas hasta el commit final"""
+
+    def __init__(self, adb, conn):
+        self._adb = adb
+        self._conn = conn
+
+    def _execute(self, query, params, fetch, label):
+        cursor = self._conn.cursor()
+        try:
+            inicio = time.perf_counter()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            ejecutada = time.perf_counter()
+            if fetch:
+                columns = [c[0] for c in cursor.description] if cursor.description else []
+                data = cursor.fetchall()
+                result, rows = (columns, data), len(data)
+            else:
+                result = rows = cursor.rowcount
+            self._adb.db_manager.metrics.record(
+                label or label_for(query), 0.0, ejecutada - inicio,
+                time.perf_counter() - ejecutada, rows,
+            )
+            return result
+        finally:
+            cursor.close()
+
+    async def fetch(self, query: str, params=None, label=None):
+        """Ejecuta un SELECT y retorna (columnas, filas)"""
+        return await self._adb._run(self._execute, query, params, True, label)
+
+    async def execute(self, query: str, params=None, label=None) -> int:
+        """Ejecuta una sentencia sin confirmar y retorna filas afectadas"""
+        return await self._adb._run(self._execute, query, params, False, label)
+
+    async def commit(self):
+        await self._adb._run(self._conn.commit)
+
+
+class AsyncDatabaseManager:
+    """Versión async de DatabaseManager para los endpoints de FastAPI"""
+
+    def __init__(self, db_manager: DatabaseManager = None, max_workers: int = None):
+        self.db_manager = db_manager or DatabaseManager()
+        # Más hilos que conexiones sólo añadiría hilos esperando al pool
+        max_workers = max_workers or self.db_manager.pool.max_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="db-async"
+        )
+        # Cupos = hilos: cada llamada suelta o transacción abierta ocupa uno
+        # (una transacción lo retiene hasta el commit), así siempre hay un
+        # hilo libre para el próximo paso de cada transacción en curso
+        self._slots = asyncio.Semaphore(max_workers)
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def fetch(self, query: str, params=None, label=None, route=None):
+        """Ejecuta un SELECT y retorna todas las filas (route="read" -> réplica)"""
+        async with self._slots:
+            return await self._run(
+                self.db_manager.execute_query, query, params, label=label, route=route
+            )
+
+    async def execute(self, query: str, params=None, label=None) -> int:
+        """Ejecuta UPDATE/MERGE/INSERT con commit y retorna filas afectadas"""
+        async with self._slots:
+            return await self._run(
+                self.db_manager.execute_non_query, query, params, label=label
+            )
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Presta una conexión durante todo el bloque
+        Confirma al salir sin errores; si hay excepción se descarta lo pendiente
+        Con todos los cupos ocupados espera en el loop (no en un hilo del executor)
+        """
+        async with self._slots:
+            connection_cm = self.db_manager.get_connection()
+            conn = await self._run(connection_cm.__enter__)
+            try:
+                yield AsyncTransaction(self, conn)
+                await self._run(conn.commit)
+            except BaseException:
+                await self._run(connection_cm.__exit__, *sys.exc_info())
+                raise
+            else:
+                await self._run(connection_cm.__exit__, None, None, None)
+
+    def close(self):
+        """Detiene el executor (al apagar la aplicación)"""
+        self._executor.shutdown(wait=False)
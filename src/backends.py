@@ -0,0 +1,677 @@
+"""
+Backends SQL intercambiables
+- sqlserver: pyodbc contra SQL Server (producción)
+- sqlite: motor embebido con emulación del dialecto T-SQL usado en el
+  proyecto (TOP, MERGE, DATEADD/GETDATE, CHECKSUM_AGG, OFFSET/FETCH...)
+  para ejecutar y medir la sincronización completa sin servidor
+"""
+
+import datetime
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from typing import List, Tuple
+
+try:
+    import pyodbc
+except ImportError:  # sólo lo necesita el backend sqlserver
+    pyodbc = None
+
+logger = logging.getLogger(__name__)
+
+
+class SqlServerBackend:
+    """Conexiones pyodbc a SQL Server; el SQL se envía tal cual"""
+
+    name = "sqlserver"
+    supports_columnstore = True
+
+    def __init__(self):
+        if pyodbc is None:
+            raise ImportError("pyodbc no está instalado (requerido por el backend sqlserver)")
+        self.Error = pyodbc.Error
+
+    def connection_string(self, config, read_only=False) -> str:
+        """Construye la cadena de conexión correcta para SQL Server"""
+        return (
+            f"DRIVER={{{config['driver']}}};"
+            f"SERVER={config['server']},{config['port']};"
+            f"DATABASE={config['database']};"
+            f"UID={config['username']};"
+            f"PWD={config['password']};"
+            "Encrypt=yes;"
+            "TrustServerCertificate=yes;"
+            + ("ApplicationIntent=ReadOnly;" if read_only else "")
+        )
+
+    def connect(self, connection_string: str, timeout: int = 10):
+        return pyodbc.connect(connection_string, timeout=timeout)
+
+    @staticmethod
+    def binary_order(column: str, data_type: str) -> str:
+        """Expresión de ORDER BY con el mismo orden que Python (textos en BIN2)"""
+        if data_type and "char" in data_type.lower():
+            return f"{column} COLLATE Latin1_General_BIN2"
+        return column
+
+    @staticmethod
+    def exact_text(expression: str, data_type: str) -> Tuple[str, ...]:
+        """
+        Expresiones que, comparadas de a pares con =, igualan textos como
+        Python: BIN2 distingue mayúsculas y DATALENGTH los espacios finales
+        (= los ignora con cualquier intercalación)
+        """
+        if data_type and "char" in data_type.lower():
+            return f"{expression} COLLATE Latin1_General_BIN2", f"DATALENGTH({expression})"
+        return (expression,)
+
+
+# ---------------------------------------------------------------------------
+# Emulación de T-SQL sobre SQLite
+# ---------------------------------------------------------------------------
+
+_DATEADD_UNITS = {
+    "SECOND": "seconds", "SS": "seconds", "S": "seconds",
+    "MINUTE": "minutes", "MI": "minutes", "N": "minutes",
+    "HOUR": "hours", "HH": "hours",
+    "DAY": "days", "DD": "days", "D": "days",
+    "MONTH": "months", "MM": "months", "M": "months",
+    "YEAR": "years", "YYYY": "years", "YY": "years",
+}
+
+_NOW = "datetime('now', 'localtime')"
+
+
+def _depths(sql: str) -> List[int]:
+    """Profundidad de paréntesis en cada posición (ignora literales '...')"""
+    depths = []
+    depth = 0
+    in_string = False
+    for ch in sql:
+        if in_string:
+            depths.append(depth + 1)
+            if ch == "'":
+                in_string = False
+            continue
+        if ch == "'":
+            in_string = True
+            depths.append(depth + 1)
+            continue
+        if ch == ")":
+            depth -= 1
+        depths.append(depth)
+        if ch == "(":
+            depth += 1
+    return depths
+
+
+def _top_level(pattern: str, sql: str, start: int = 0):
+    """Coincidencias del patrón fuera de paréntesis y literales"""
+    depths = _depths(sql)
+    return [
+        m for m in re.finditer(pattern, sql[start:], re.IGNORECASE)
+        if depths[start + m.start()] == 0
+    ]
+
+
+def _split_top_level(sql: str, separator: str = ",") -> List[str]:
+    depths = _depths(sql)
+    parts, last = [], 0
+    for i, ch in enumerate(sql):
+        if ch == separator and depths[i] == 0:
+            parts.append(sql[last:i].strip())
+            last = i + 1
+    parts.append(sql[last:].strip())
+    return parts
+
+
+def _matching_paren(sql: str, open_index: int) -> int:
+    depths = _depths(sql)
+    target = depths[open_index]
+    for i in range(open_index + 1, len(sql)):
+        if sql[i] == ")" and depths[i] == target:
+            return i
+    raise ValueError("Paréntesis sin cerrar en SQL")
+
+
+def _replace_function(sql: str, name: str, build) -> str:
+    """Reemplaza NAME(args...) usando build(lista_de_args) -> SQL"""
+    pattern = re.compile(rf"\b{name}\s*\(", re.IGNORECASE)
+    while True:
+        match = pattern.search(sql)
+        if not match:
+            return sql
+        open_index = match.end() - 1
+        close_index = _matching_paren(sql, open_index)
+        args = _split_top_level(sql[open_index + 1:close_index])
+        sql = sql[:match.start()] + build(args) + sql[close_index + 1:]
+
+
+def _translate_convert(args) -> str:
+    """CONVERT(VARCHAR(n), x, estilo) -> primeros n caracteres del texto de x"""
+    text = re.match(r"^\s*N?VARCHAR\s*\(\s*(\d+)\s*\)\s*$", args[0], re.IGNORECASE)
+    if text:
+        return f"SUBSTR(CAST({args[1]} AS TEXT), 1, {text.group(1)})"
+    return f"CAST({args[1]} AS {args[0]})"
+
+
+def _strip_alias(assignments: str, alias: str) -> str:
+    """'T.a = x, T.b = y' -> 'a = x, b = y' (SQLite no admite alias a la izquierda)"""
+    result = []
+    for assignment in _split_top_level(assignments):
+        left, right = assignment.split("=", 1)
+        left = re.sub(rf"^\s*\[?{re.escape(alias)}\]?\.", "", left.strip(), flags=re.IGNORECASE)
+        result.append(f"{left} = {right.strip()}")
+    return ", ".join(result)
+
+
+def _translate_update_from(sql: str) -> str:
+    """UPDATE alias SET ... FROM tabla alias [JOIN ...] WHERE ... (estilo T-SQL)"""
+    head = re.match(r"^\s*UPDATE\s+(\w+)\s+SET\s+", sql, re.IGNORECASE)
+    if not head:
+        return sql
+    alias = head.group(1)
+    froms = _top_level(r"\bFROM\b", sql, head.end())
+    if not froms:
+        return sql
+    from_start = head.end() + froms[0].start()
+    assignments = sql[head.end():from_start]
+    rest = sql[from_start + len("FROM"):]
+
+    wheres = _top_level(r"\bWHERE\b", rest)
+    where = rest[wheres[0].end():].strip() if wheres else ""
+    from_clause = rest[:wheres[0].start()] if wheres else rest
+
+    first = re.match(r"\s*([\[\]\w.]+)\s+(?:AS\s+)?(\w+)\s*(.*)$", from_clause,
+                     re.IGNORECASE | re.DOTALL)
+    if not first or first.group(2).lower() != alias.lower():
+        return sql
+    table, joins = first.group(1), first.group(3).strip()
+
+    conditions = []
+    join_from = ""
+    if joins:
+        join = re.match(
+            r"(?:INNER\s+)?JOIN\s+([\[\]\w.]+)\s+(?:AS\s+)?(\w+)\s+ON\s+(.*)$",
+            joins, re.IGNORECASE | re.DOTALL,
+        )
+        if not join:
+            return sql
+        on_and_more = join.group(3)
+        more = _top_level(r"\b(?:INNER\s+)?JOIN\b", on_and_more)
+        on = on_and_more[:more[0].start()] if more else on_and_more
+        join_from = f" FROM {join.group(1)} AS {join.group(2)}"
+        if more:
+            join_from += " " + on_and_more[more[0].start():].strip()
+        conditions.append(f"({on.strip()})")
+    if where:
+        conditions.append(f"({where})")
+
+    translated = f"UPDATE {table} AS {alias} SET {_strip_alias(assignments, alias)}{join_from}"
+    if conditions:
+        translated += " WHERE " + " AND ".join(conditions)
+    return translated
+
+
+def _translate_merge(sql: str) -> List[Tuple[str, bool]]:
+    """
+    MERGE -> secuencia de sentencias SQLite
+    Las filas a insertar se calculan antes de aplicar UPDATE/DELETE para
+    respetar que MERGE evalúa todas las cláusulas sobre el estado inicial
+    Retorna [(sentencia, cuenta_en_rowcount)]
+    """
+    sql = sql.strip().rstrip(";")
+    head = re.match(r"^\s*MERGE\s+(?:INTO\s+)?([\[\]\w.]+)\s+(?:AS\s+)?(\w+)\s+USING\s+",
+                    sql, re.IGNORECASE)
+    if not head:
+        raise ValueError("MERGE no soportado por el backend sqlite")
+    target, talias = head.group(1), head.group(2)
+    pos = head.end()
+    if sql[pos] == "(":
+        close = _matching_paren(sql, pos)
+        source = sql[pos:close + 1]
+        pos = close + 1
+    else:
+        source = re.match(r"[\[\]\w.]+", sql[pos:]).group(0)
+        pos += len(source)
+    alias_on = re.match(r"\s*(?:AS\s+)?(\w+)\s+ON\s+", sql[pos:], re.IGNORECASE)
+    salias = alias_on.group(1)
+    pos += alias_on.end()
+
+    whens = _top_level(r"\bWHEN\b", sql, pos)
+    on = sql[pos:pos + whens[0].start()].strip()
+    source_from = f"{source} AS {salias}"
+    match_exists = f"EXISTS (SELECT 1 FROM {source_from} WHERE {on})"
+
+    clauses = []
+    for i, when in enumerate(whens):
+        start = pos + when.start()
+        end = pos + whens[i + 1].start() if i + 1 < len(whens) else len(sql)
+        clauses.append(sql[start:end].strip())
+
+    inserts, others = [], []
+    matched_prior = []
+    for clause in clauses:
+        c = re.match(
+            r"WHEN\s+(NOT\s+MATCHED(?:\s+BY\s+(?:TARGET|SOURCE))?|MATCHED)"
+            r"(?:\s+AND\s+(.*?))?\s+THEN\s+(.*)$",
+            clause, re.IGNORECASE | re.DOTALL,
+        )
+        kind = " ".join(c.group(1).upper().split())
+        condition = c.group(2)
+        action = c.group(3).strip()
+        extra = f" AND ({condition})" if condition else ""
+
+        if kind == "MATCHED":
+            # La primera cláusula MATCHED que aplica gana, como en T-SQL
+            skip = "".join(f" AND NOT ({prev})" for prev in matched_prior)
+            if condition:
+                matched_prior.append(condition)
+            if action.upper().startswith("DELETE"):
+                others.append(
+                    f"DELETE FROM {target} AS {talias} WHERE EXISTS "
+                    f"(SELECT 1 FROM {source_from} WHERE ({on}){extra}{skip})"
+                )
+            else:
+                assignments = re.sub(r"^UPDATE\s+SET\s+", "", action, flags=re.IGNORECASE)
+                others.append(
+                    f"UPDATE {target} AS {talias} SET {_strip_alias(assignments, talias)} "
+                    f"FROM {source_from} WHERE ({on}){extra}{skip}"
+                )
+        elif kind == "NOT MATCHED BY SOURCE":
+            where = f"NOT {match_exists}{extra}"
+            if action.upper().startswith("DELETE"):
+                others.append(f"DELETE FROM {target} AS {talias} WHERE {where}")
+            else:
+                assignments = re.sub(r"^UPDATE\s+SET\s+", "", action, flags=re.IGNORECASE)
+                others.append(
+                    f"UPDATE {target} AS {talias} SET "
+                    f"{_strip_alias(assignments, talias)} WHERE {where}"
+                )
+        else:
+            ins = re.match(r"INSERT\s*(\(.*?\))\s*VALUES\s*\((.*)\)\s*$", action,
+                           re.IGNORECASE | re.DOTALL)
+            values = _split_top_level(ins.group(2))
+            select = ", ".join(f"{v} AS c{i}" for i, v in enumerate(values))
+            inserts.append((ins.group(1), select, extra))
+
+    statements = []
+    if inserts and others:
+        statements.append(("DROP TABLE IF EXISTS temp._merge_insert", False))
+        columns, select, extra = inserts[0]
+        statements.append((
+            f"CREATE TEMP TABLE _merge_insert AS SELECT {select} FROM {source_from} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {target} AS {talias} WHERE {on}){extra}",
+            False,
+        ))
+        statements.extend((statement, True) for statement in others)
+        statements.append((f"INSERT INTO {target} {columns} SELECT * FROM temp._merge_insert", True))
+        statements.append(("DROP TABLE temp._merge_insert", False))
+    else:
+        statements.extend((statement, True) for statement in others)
+        for columns, select, extra in inserts:
+            statements.append((
+                f"INSERT INTO {target} {columns} SELECT {select} FROM {source_from} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {target} AS {talias} WHERE {on}){extra}",
+                True,
+            ))
+    return statements
+
+
+class SQLiteDialect:
+    """Traduce el T-SQL usado en el proyecto a SQL de SQLite"""
+
+    name = "sqlite"
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def translate(sql: str) -> Tuple[Tuple[str, bool], ...]:
+        """T-SQL -> ((sentencia, cuenta_en_rowcount), ...)"""
+        # Nombres: [db].[schema].[tabla] -> [schema].[tabla]; dbo es la base principal
+        sql = re.sub(r"\[?\w+\]?\.(\[?\w+\]?\.\[?\w+\]?)", r"\1", sql)
+        sql = re.sub(r"(?<![\w\]])\[?dbo\]?\.", "", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bINFORMATION_SCHEMA\.(COLUMNS|TABLES)\b", r"INFORMATION_SCHEMA_\1",
+                     sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bWITH\s*\(\s*(?:NOLOCK|TABLOCK|TABLOCKX|HOLDLOCK|READPAST)\s*\)", "",
+                     sql, flags=re.IGNORECASE)
+
+        # DDL
+        ddl = re.match(r"^\s*IF\s+NOT\s+EXISTS\s*\(", sql, re.IGNORECASE)
+        if ddl:
+            close = _matching_paren(sql, ddl.end() - 1)
+            sql = re.sub(r"^\s*CREATE\s+TABLE\b", "CREATE TABLE IF NOT EXISTS",
+                         sql[close + 1:], flags=re.IGNORECASE)
+        sql = re.sub(r"\bINT\s+PRIMARY\s+KEY\s+IDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)",
+                     "INTEGER PRIMARY KEY AUTOINCREMENT", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bIDENTITY\s*\(\s*\d+\s*,\s*\d+\s*\)", "", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\(\s*MAX\s*\)", "", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bDEFAULT\s+GETDATE\(\)", f"DEFAULT ({_NOW})", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"^\s*TRUNCATE\s+TABLE\b", "DELETE FROM", sql, flags=re.IGNORECASE)
+        # CREATE [NON]CLUSTERED INDEX ix ON [schema].[t] -> CREATE INDEX [schema].ix ON [t]
+        sql = re.sub(
+            r"^\s*CREATE\s+(UNIQUE\s+)?(?:NONCLUSTERED\s+|CLUSTERED\s+)?INDEX\s+(\[?\w+\]?)\s+"
+            r"ON\s+(?:(\[?\w+\]?)\.)?(\[?\w+\]?)",
+            lambda m: (f"CREATE {m.group(1) or ''}INDEX "
+                       f"{m.group(3) + '.' if m.group(3) else ''}{m.group(2)} ON {m.group(4)}"),
+            sql, flags=re.IGNORECASE,
+        )
+
+        # EXEC sp_rename 'schema.tabla', 'nuevo' -> ALTER TABLE ... RENAME TO
+        rename = re.match(r"^\s*EXEC(?:UTE)?\s+sp_rename\s+'([^']+)'\s*,\s*'([^']+)'\s*;?\s*$",
+                          sql, re.IGNORECASE)
+        if rename:
+            table = ".".join(f"[{part.strip('[]')}]" for part in rename.group(1).split("."))
+            sql = f"ALTER TABLE {table} RENAME TO [{rename.group(2).strip('[]')}]"
+
+        # Funciones
+        sql = re.sub(r"\bGETDATE\(\)", _NOW, sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bISNULL\s*\(", "IFNULL(", sql, flags=re.IGNORECASE)
+        sql = re.sub(r"\bLEN\s*\(", "LENGTH(", sql, flags=re.IGNORECASE)
+        sql = _replace_function(sql, "CONVERT", _translate_convert)
+        sql = _replace_function(
+            sql, "DATEADD",
+            lambda args: (
+                f"datetime({args[2]}, ({args[1]}) || ' "
+                f"{_DATEADD_UNITS[args[0].strip().upper()]}')"
+            ),
+        )
+
+        # Paginación
+        sql = re.sub(
+            r"\bOFFSET\s+(\S+)\s+ROWS\s+FETCH\s+(?:NEXT|FIRST)\s+(\S+)\s+ROWS\s+ONLY",
+            r"LIMIT \1, \2", sql, flags=re.IGNORECASE,
+        )
+        top = re.match(r"^(\s*SELECT\s+(?:DISTINCT\s+)?)TOP\s*\(?\s*(\d+|\?)\s*\)?\s+", sql,
+                       re.IGNORECASE)
+        if top:
+            sql = top.group(1) + sql[top.end():].rstrip().rstrip(";") + f" LIMIT {top.group(2)}"
+
+        if re.match(r"^\s*MERGE\b", sql, re.IGNORECASE):
+            return tuple(_translate_merge(sql))
+        return ((_translate_update_from(sql), True),)
+
+
+def _signed32(value: int) -> int:
+    return value - 2 ** 32 if value >= 2 ** 31 else value
+
+
+def _binary_checksum(*values) -> int:
+    """Equivalente local de BINARY_CHECKSUM: entero de 32 bits estable por fila"""
+    return _signed32(zlib.crc32(repr(values).encode("utf-8")))
+
+
+class _ChecksumAgg:
+    """CHECKSUM_AGG: XOR de los checksums (NULL si no hay filas)"""
+
+    def __init__(self):
+        self.value = None
+
+    def step(self, value):
+        if value is not None:
+            self.value = (self.value or 0) ^ value
+
+    def finalize(self):
+        return self.value
+
+
+_ALTER_DROP = re.compile(r"^\s*(?:ALTER|DROP)\b", re.IGNORECASE)
+_RENAME_INDEX = re.compile(
+    r"^\s*EXEC(?:UTE)?\s+sp_rename\s+'([^']+)'\s*,\s*'([^']+)'\s*,\s*'INDEX'\s*;?\s*$",
+    re.IGNORECASE,
+)
+
+
+class SQLiteCursor:
+    """Cursor con la interfaz de pyodbc usada en el proyecto"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._raw.cursor()
+        self.fast_executemany = False
+        self.rowcount = -1
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql: str, *params):
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = params[0]
+        statements = self._connection._translate(sql)
+        if len(statements) > 1 and params:
+            raise ValueError("Parámetros no soportados en sentencias MERGE con sqlite")
+        if _ALTER_DROP.match(statements[0][0]) and not self._connection._raw.in_transaction:
+            # Como en SQL Server, renombrar/borrar tablas queda en la transacción
+            # hasta commit (intercambio atómico de tabla3)
+            self._cursor.execute("BEGIN")
+        self.rowcount = 0
+        for statement, counts in statements:
+            self._cursor.execute(statement, params)
+            if counts and self._cursor.rowcount > 0:
+                self.rowcount += self._cursor.rowcount
+        if len(statements) == 1:
+            self.rowcount = self._cursor.rowcount
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        (statement, _), = self._connection._translate(sql)
+        self._cursor.executemany(statement, seq_of_params)
+        self.rowcount = self._cursor.rowcount
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión sqlite3 con la interfaz de pyodbc usada en el proyecto"""
+
+    def __init__(self, raw, schemas):
+        self._raw = raw
+        self._schemas = schemas
+        self._star_cache = {}
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._raw.close()
+
+    def _translate(self, sql: str):
+        rename = _RENAME_INDEX.match(sql)
+        if rename:
+            return self._rename_index(rename.group(1), rename.group(2))
+        statements = SQLiteDialect.translate(sql)
+        if "BINARY_CHECKSUM(*)" in sql.upper():
+            statements = tuple(
+                (self._expand_star_checksum(statement), counts)
+                for statement, counts in statements
+            )
+        return statements
+
+    def _rename_index(self, target: str, new_name: str):
+        """
+        sp_rename '[schema.]tabla.índice', 'nuevo', 'INDEX'
+        SQLite no renombra índices: se recrea con el nuevo nombre
+        """
+        parts = [p.strip("[]") for p in target.split(".")]
+        schema = parts[-3] if len(parts) == 3 and parts[-3].lower() != "dbo" else "main"
+        table, index = parts[-2], parts[-1]
+        rows = self._raw.execute(
+            f"SELECT sql FROM [{schema}].sqlite_master "
+            f"WHERE type = 'index' AND name = ? AND tbl_name = ?",
+            (index, table),
+        ).fetchall()
+        if not rows:
+            raise sqlite3.OperationalError(f"No existe el índice {target}")
+        create = re.sub(
+            r"^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?:\[[^\]]+\]|\"[^\"]+\"|\S+)",
+            lambda m: f"CREATE {m.group(1) or ''}INDEX [{schema}].[{new_name.strip('[]')}]",
+            rows[0][0], flags=re.IGNORECASE,
+        )
+        return (f"DROP INDEX [{schema}].[{index}]", False), (create, False)
+
+    def _expand_star_checksum(self, sql: str) -> str:
+        """BINARY_CHECKSUM(*) -> BINARY_CHECKSUM(col1, col2, ...) de la tabla del FROM"""
+        table = re.search(r"\bFROM\s+([\[\]\w.]+)", sql, re.IGNORECASE).group(1)
+        columns = self._star_cache.get(table)
+        if columns is None:
+            parts = [p.strip("[]") for p in table.split(".")]
+            schema, name = (parts[0], parts[1]) if len(parts) == 2 else ("main", parts[0])
+            rows = self._raw.execute(f"PRAGMA [{schema}].table_info([{name}])").fetchall()
+            columns = self._star_cache[table] = ", ".join(f"[{row[1]}]" for row in rows)
+        return re.sub(r"BINARY_CHECKSUM\(\s*\*\s*\)", f"BINARY_CHECKSUM({columns})", sql,
+                      flags=re.IGNORECASE)
+
+
+class SQLiteBackend:
+    """
+    Motor embebido para pruebas y benchmarks locales
+    config["database"]: ruta del archivo o ":memory:"; cada esquema de
+    config["schemas"] (por defecto tigostar) se adjunta como base aparte
+    """
+
+    name = "sqlite"
+    Error = sqlite3.Error
+    supports_columnstore = False
+
+    _anchors = {}
+    _anchors_lock = threading.Lock()
+
+    def __init__(self):
+        sqlite3.register_adapter(datetime.datetime, lambda v: v.strftime("%Y-%m-%d %H:%M:%S"))
+        sqlite3.register_adapter(datetime.date, lambda v: v.isoformat())
+
+    @staticmethod
+    def binary_order(column: str, data_type: str) -> str:
+        """La intercalación BINARY por defecto ya ordena como Python"""
+        return column
+
+    @staticmethod
+    def exact_text(expression: str, data_type: str) -> Tuple[str, ...]:
+        """BINARY ya distingue mayúsculas y espacios finales como Python"""
+        return (expression,)
+
+    def connection_string(self, config, read_only=False) -> str:
+        database = config["database"]
+        schemas = ",".join(config.get("schemas", ["tigostar"]))
+        return f"sqlite:{database};schemas={schemas}"
+
+    def connect(self, connection_string: str, timeout: int = 10) -> SQLiteConnection:
+        database, schemas = self._parse(connection_string)
+        if database == ":memory:":
+            # Memoria compartida entre conexiones; un ancla la mantiene viva
+            with self._anchors_lock:
+                if connection_string not in self._anchors:
+                    self._anchors[connection_string] = self._open(
+                        self._memory_uri(connection_string, "main"), schemas, connection_string
+                    )
+            raw = self._open(self._memory_uri(connection_string, "main"), schemas,
+                             connection_string, timeout)
+        else:
+            raw = self._open(database, schemas, connection_string, timeout)
+        return SQLiteConnection(raw, schemas)
+
+    def _open(self, database, schemas, connection_string, timeout=10):
+        in_memory = database.startswith("file:")
+        raw = sqlite3.connect(database, uri=in_memory, timeout=timeout, check_same_thread=False)
+        if not in_memory:
+            raw.execute("PRAGMA journal_mode=WAL")
+        for schema in schemas:
+            if in_memory:
+                attached = self._memory_uri(connection_string, schema)
+            else:
+                root, ext = os.path.splitext(database)
+                attached = f"{root}.{schema}{ext or '.db'}"
+            raw.execute(f"ATTACH DATABASE ? AS [{schema}]", (attached,))
+        self._register_functions(raw)
+        self._create_catalog_views(raw, schemas)
+        return raw
+
+    @staticmethod
+    def _parse(connection_string: str):
+        body = connection_string[len("sqlite:"):]
+        database, _, schemas = body.rpartition(";schemas=")
+        return database, [s for s in schemas.split(",") if s]
+
+    @staticmethod
+    def _memory_uri(connection_string: str, schema: str) -> str:
+        key = zlib.crc32(connection_string.encode("utf-8"))
+        return f"file:unificacion_{key}_{schema}?mode=memory&cache=shared"
+
+    @staticmethod
+    def _register_functions(raw):
+        raw.create_function("BINARY_CHECKSUM", -1, _binary_checksum, deterministic=True)
+        raw.create_function("CHECKSUM", -1, _binary_checksum, deterministic=True)
+        raw.create_aggregate("CHECKSUM_AGG", 1, _ChecksumAgg)
+
+    @staticmethod
+    def _create_catalog_views(raw, schemas):
+        """Vistas temporales equivalentes a INFORMATION_SCHEMA.COLUMNS / TABLES"""
+        sources = [("dbo", "main")] + [(schema, schema) for schema in schemas]
+        type_name = (
+            "lower(CASE WHEN instr(p.type, '(') > 0 "
+            "THEN substr(p.type, 1, instr(p.type, '(') - 1) ELSE p.type END)"
+        )
+        type_size = (
+            "CASE WHEN instr(p.type, '(') > 0 "
+            "THEN CAST(substr(p.type, instr(p.type, '(') + 1) AS INTEGER) END"
+        )
+        columns = " UNION ALL ".join(
+            f"SELECT '{schema}' AS TABLE_SCHEMA, m.name AS TABLE_NAME, "
+            f"p.name AS COLUMN_NAME, p.cid + 1 AS ORDINAL_POSITION, "
+            f"{type_name} AS DATA_TYPE, "
+            f"CASE WHEN {type_name} LIKE '%char%' THEN {type_size} END AS CHARACTER_MAXIMUM_LENGTH, "
+            f"CASE WHEN {type_name} IN ('decimal', 'numeric') THEN {type_size} END AS NUMERIC_PRECISION, "
+            f"CASE WHEN {type_name} IN ('decimal', 'numeric') AND instr(p.type, ',') > 0 "
+            f"THEN CAST(substr(p.type, instr(p.type, ',') + 1) AS INTEGER) END AS NUMERIC_SCALE, "
+            f"CASE WHEN p.\"notnull\" THEN 'NO' ELSE 'YES' END AS IS_NULLABLE "
+            f"FROM [{database}].sqlite_master m, pragma_table_info(m.name, '{database}') p "
+            f"WHERE m.type IN ('table', 'view')"
+            for schema, database in sources
+        )
+        tables = " UNION ALL ".join(
+            f"SELECT '{schema}' AS TABLE_SCHEMA, name AS TABLE_NAME, "
+            f"CASE type WHEN 'view' THEN 'VIEW' ELSE 'BASE TABLE' END AS TABLE_TYPE "
+            f"FROM [{database}].sqlite_master WHERE type IN ('table', 'view')"
+            for schema, database in sources
+        )
+        raw.execute(f"CREATE TEMP VIEW IF NOT EXISTS INFORMATION_SCHEMA_COLUMNS AS {columns}")
+        raw.execute(f"CREATE TEMP VIEW IF NOT EXISTS INFORMATION_SCHEMA_TABLES AS {tables}")
+
+
+BACKENDS = {
+    "sqlserver": SqlServerBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def get_backend(config):
+    """Backend según config["backend"] (por defecto sqlserver)"""
+    name = config.get("backend", "sqlserver")
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend desconocido: {name}") from None
@@ -0,0 +1,145 @@
+"""
+Tamaño de lote adaptativo para inserciones
+Ajusta las filas por lote según la latencia medida de cada lote, en lugar
+de un PROCESSING_CONFIG["batch_size"] fijo para todas las tablas
+"""
+
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveBatchSizer:
+    """
+    Controlador del tamaño de lote hacia una latencia objetivo por lote
+    - Tras cada lote estima los segundos por fila (media móvil exponencial
+      con peso `smoothing` para el último lote) y propone
+      target_seconds / segundos_por_fila
+    - Cada ajuste crece o se achica como mucho `max_step` veces, para no
+      oscilar con un lote atípico
+    - Cambios menores a `tolerance` (fracción del tamaño actual) se ignoran
+    - El tamaño queda siempre entre min_size y max_size
+    """
+
+    def __init__(self, initial_size: int, min_size: int = 100, max_size: int = 50000,
+                 target_seconds: float = 0.5, smoothing: float = 0.5,
+                 max_step: float = 2.0, tolerance: float = 0.1, name: str = "insert"):
+        if min_size < 1 or min_size > max_size:
+            raise ValueError("Se requiere 1 <= min_size <= max_size")
+        if target_seconds <= 0 or max_step <= 1 or not 0 < smoothing <= 1:
+            raise ValueError("Parámetros del controlador de lotes inválidos")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.max_step = max_step
+        self.tolerance = tolerance
+        self.name = name
+
+        self.size = self._clamp(initial_size)
+        self.initial_size = self.size
+        self.sizes = [self.size]
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_latency = 0.0
+        self._seconds_per_row = None
+
+    def _clamp(self, size) -> int:
+        return int(min(max(size, self.min_size), self.max_size))
+
+    def record(self, rows: int, seconds: float) -> int:
+        """Registra un lote (filas, segundos) y retorna el tamaño del próximo"""
+        if rows <= 0:
+            return self.size
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+        self.max_latency = max(self.max_latency, seconds)
+
+        per_row = max(seconds, 1e-9) / rows
+        if self._seconds_per_row is None:
+            self._seconds_per_row = per_row
+        else:
+            self._seconds_per_row = (
+                self.smoothing * per_row + (1 - self.smoothing) * self._seconds_per_row
+            )
+
+        desired = self.target_seconds / self._seconds_per_row
+        desired = min(max(desired, self.size / self.max_step), self.size * self.max_step)
+        proposed = self._clamp(desired)
+        if abs(proposed - self.size) > self.size * self.tolerance:
+            logger.info(
+                f"Lote de {self.name}: {self.size} -> {proposed} filas "
+                f"(último lote {rows} filas en {seconds * 1000:.1f} ms, "
+                f"objetivo {self.target_seconds * 1000:.0f} ms)"
+            )
+            self.size = proposed
+            self.sizes.append(proposed)
+        return self.size
+
+    def stats(self) -> dict:
+        """Tamaños elegidos y latencias medidas"""
+        return {
+            "tamano_inicial": self.initial_size,
+            "tamano_final": self.size,
+            "tamanos": list(self.sizes),
+            "lotes": self.batches,
+            "latencia_objetivo_ms": round(self.target_seconds * 1000, 1),
+            "latencia_media_ms": (
+                round(self.seconds / self.batches * 1000, 1) if self.batches else 0.0
+            ),
+            "latencia_max_ms": round(self.max_latency * 1000, 1),
+            "minimo": self.min_size,
+            "maximo": self.max_size,
+        }
+
+
+class BatchSizeRegistry:
+    """
+    Tamaños de lote aprendidos y elegidos por sentencia INSERT
+    Compartido por hilos e instancias (escritores de inject_sharded /
+    inject_pipelined): cada carga parte del último tamaño aprendido para su
+    sentencia y deja sus tamaños elegidos bajo el lock
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def learned(self, query: str, default: int) -> int:
+        """Tamaño con el que termina la última carga de `query` (o `default`)"""
+        with self._lock:
+            entry = self._statements.get(query)
+            return entry["tamano_aprendido"] if entry else default
+
+    def record(self, query: str, label: str, sizer: AdaptiveBatchSizer):
+        """Guarda el resultado de una carga terminada"""
+        stats = sizer.stats()
+        with self._lock:
+            entry = self._statements.setdefault(query, {"etiqueta": label, "cargas": 0})
+            entry["cargas"] += 1
+            entry["tamano_aprendido"] = sizer.size
+            entry["ultima_carga"] = stats
+
+    def report(self) -> Dict[str, Dict]:
+        """{etiqueta: tamaño aprendido, cargas y tamaños elegidos en la última}"""
+        with self._lock:
+            return {
+                entry["etiqueta"]: {
+                    "cargas": entry["cargas"],
+                    "tamano_aprendido": entry["tamano_aprendido"],
+                    "ultima_carga": dict(entry["ultima_carga"]),
+                }
+                for entry in self._statements.values()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+
+# Registro compartido por todas las instancias de DatabaseManager
+BATCH_SIZES = BatchSizeRegistry()
@@ -4,121 +4,730 @@ Compara tabla1 con tabla2 e identifica diferencias
 """
 
 import logging
-from typing import List, Dict, Tuple
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Dict, Tuple, Iterator
 from src.database import DatabaseManager
-from config.credentials import TABLES_CONFIG
+from src.diff import (
+    ComparisonResult, compile_normalizers, external_hash_join, hash_join, iter_external_diff,
+    merge_diff,
+    normalization_plan, record_type, vector_diff, DATETIME_PRECISIONS,
+    ONLY_IN_SOURCE, ONLY_IN_COMPARISON, IDENTICAL, MODIFIED,
+)
+from src.schema import null_safe_equals
+from config.credentials import TABLES_CONFIG, PROCESSING_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Motores que sólo cuentan las filas idénticas (identical queda vacío)
+COUNT_ONLY_ENGINES = {"pushdown", "vector"}
+
+
+def iter_records(db_manager, query: str, columns: List[str], params=None,
+                 chunk_size=None, label=None):
+    """Filas de iter_query como registros compactos del esquema `columns`"""
+    record = record_type(tuple(columns))
+    return map(record._make, db_manager.iter_query(
+        query, params, chunk_size=chunk_size, label=label
+    ))
+
+
+def _compare_partition(db_config, columns, source_query, comparison_query, params,
+                       key_index, value_index, normalization=None):
+    """
+    Compara un rango de claves en un proceso del pool con su propia conexión
+    normalization: (tipos, opciones); los normalizadores se compilan en el proceso
+    Retorna (solo_origen, solo_comparacion, identicas, modificadas, segundos)
+    """
+    inicio = time.perf_counter()
+    db = DatabaseManager(db_config)
+    normalizers = compile_normalizers(columns, *normalization) if normalization else None
+    result = hash_join(
+        iter_records(db, source_query, columns, params, label="comparar_particion_origen"),
+        iter_records(db, comparison_query, columns, params,
+                     label="comparar_particion_comparacion"),
+        key_index, value_index, normalizers,
+    )
+    return result + (time.perf_counter() - inicio,)
+
 
 class TableComparator:
     """Compara dos tablas y prepara resultados para inyectar"""
 
-    def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.config = TABLES_CONFIG
+    def __init__(self, db_manager=None, config=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.config = config or TABLES_CONFIG
 
     def get_table_columns(self, table_name: str) -> List[str]:
-        """Obtiene las columnas de una tabla"""
-        # Separar esquema y nombre de tabla
-        if '.' in table_name:
-            schema, table = table_name.split('.')
-        else:
-            schema, table = 'dbo', table_name
-            
-        query = (
-            "SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS "
-            "WHERE TABLE_NAME = ? AND TABLE_SCHEMA = ? "
-            "ORDER BY ORDINAL_POSITION"
-        )
+        """Obtiene las columnas de una tabla (desde la caché de metadatos)"""
         try:
-            results = self.db_manager.execute_query(query, (table, schema))
-            columns = [row[0] for row in results]
+            columns = self.db_manager.schema.column_names(table_name)
             logger.info(f"Columnas de {table_name}: {columns}")
             return columns
         except Exception as e:
             logger.error(f"Error obteniendo columnas: {e}")
             return []
 
+    def iter_table_data(self, table_name: str, chunk_size=None) -> Iterator[Dict]:
+        """
+        Itera los datos de una tabla como diccionarios leyendo por bloques
+        La memoria usada queda acotada por chunk_size
+        """
+        columns = self.get_table_columns(table_name)
+        query = f"SELECT * FROM {table_name}"
+        for row in self.db_manager.iter_query(query, chunk_size=chunk_size):
+            yield dict(zip(columns, row))
+
     def get_table_data(self, table_name: str) -> List[Dict]:
         """Obtiene todos los datos de una tabla como diccionarios"""
         try:
-            columns = self.get_table_columns(table_name)
-            query = f"SELECT * FROM {table_name}"
-            
-            with self.db_manager.get_cursor() as cursor:
-                cursor.execute(query)
-                results = cursor.fetchall()
-                
-                # Convertir a diccionarios para comparación fácil
-                data = []
-                for row in results:
-                    data.append(dict(zip(columns, row)))
-                
-                logger.info(f"Obtenidos {len(data)} registros de {table_name}")
-                return data
+            data = list(self.iter_table_data(table_name))
+            logger.info(f"Obtenidos {len(data)} registros de {table_name}")
+            return data
 
         except Exception as e:
             logger.error(f"Error obteniendo datos: {e}")
             return []
 
-    def compare_tables(self) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+    def comparison_columns(self) -> Tuple[List[str], List[int], List[int]]:
         """
-        Compara tabla1 vs tabla2
-        Retorna:
-        - Registros solo en tabla1
-        - Registros solo en tabla2
-        - Registros coincidentes
+        Columnas a leer (en el orden del origen) y posiciones de las columnas
+        clave y de las comparadas
+        Sale de TABLES_CONFIG:
+        - key_columns: clave; sin ella se usa la fila comparada completa (no
+          hay modificadas, sólo coincidentes o exclusivas)
+        - compare_columns: columnas comparadas (por defecto todas las comunes)
+        - carry_columns: se leen y viajan al resultado pero no se comparan
+        - ignore_columns: no se leen (p. ej. Ultima_Actualizacion)
         """
-        source_data = self.get_table_data(self.config["source_table"])
-        comparison_data = self.get_table_data(self.config["comparison_table"])
+        source_table = self.config["source_table"]
+        comparison_table = self.config["comparison_table"]
+        # Metadatos de ambas tablas en un solo viaje a INFORMATION_SCHEMA
+        self.db_manager.schema.load(source_table, comparison_table)
+        comparison_columns = {
+            col.lower() for col in self.get_table_columns(comparison_table)
+        }
+        common = [
+            col for col in self.get_table_columns(source_table)
+            if col.lower() in comparison_columns
+        ]
+        lowered_common = {col.lower() for col in common}
 
-        logger.info(f"Comparando {len(source_data)} vs {len(comparison_data)} registros")
+        def resolve(setting: str, label: str) -> List[str]:
+            names = self.config.get(setting) or []
+            missing = [name for name in names if name.lower() not in lowered_common]
+            if missing:
+                raise ValueError(f"Columnas {label} inexistentes en ambas tablas: {missing}")
+            return [name.lower() for name in names]
 
-        # Convertir a sets para comparación rápida (usando representación en string)
-        source_set = {str(item) for item in source_data}
-        comparison_set = {str(item) for item in comparison_data}
+        key_columns = resolve("key_columns", "clave")
+        carry = set(resolve("carry_columns", "de arrastre"))
+        ignore = set(resolve("ignore_columns", "ignoradas"))
+        compared = set(resolve("compare_columns", "comparadas")) or (lowered_common - carry - ignore)
+        compared |= set(key_columns)
 
-        # Encontrar diferencias
-        only_in_source = [
-            item for item in source_data if str(item) not in comparison_set
+        columns = [col for col in common if col.lower() in compared | carry]
+        lowered = [col.lower() for col in columns]
+        key_columns = key_columns or [col for col in lowered if col in compared]
+        key_index = [lowered.index(key) for key in key_columns]
+        value_index = [
+            i for i, col in enumerate(lowered) if col in compared and i not in key_index
         ]
-        only_in_comparison = [
-            item for item in comparison_data if str(item) not in source_set
+        return columns, key_index, value_index
+
+    def column_types(self, table_name: str, columns: List[str]) -> List[str]:
+        """Tipos de datos de `columns` según la caché de esquema"""
+        types = {
+            col.name.lower(): col.data_type
+            for col in self.db_manager.schema.get_columns(table_name)
+        }
+        return [types.get(col.lower()) for col in columns]
+
+    def normalization_spec(self, columns: List[str]):
+        """(tipos, opciones) de TABLES_CONFIG["normalize"]; None si no hay normalización"""
+        options = self.config.get("normalize")
+        if not options:
+            return None
+        return self.column_types(self.config["source_table"], columns), options
+
+    def value_normalizers(self, columns: List[str]):
+        """
+        Normalizadores compilados una vez para el esquema `columns`
+        TABLES_CONFIG["normalize"] = {"*": {...}, "Columna": {...}} con trim,
+        empty_as_null, ignore_case y datetime_precision
+        """
+        spec = self.normalization_spec(columns)
+        if spec is None:
+            return None
+        return compile_normalizers(columns, *spec) or None
+
+    def key_condition(self, columns: List[str], key_index: List[int],
+                      left: str = "S", right: str = "C") -> str:
+        """
+        Condición left.clave = right.clave (pushdown, MERGE de la inyección)
+        Las claves que admiten NULL en alguna de las dos tablas comparan
+        NULL = NULL como coincidencia, igual que hash y merge; los textos se
+        igualan byte a byte (backend.exact_text)
+        """
+        nullable = set()
+        for table in (self.config["source_table"], self.config["comparison_table"]):
+            nullable.update(
+                col.name.lower() for col in self.db_manager.schema.get_columns(table)
+                if col.nullable
+            )
+        types = self.text_types(columns)
+        exact = self.db_manager.backend.exact_text
+        conditions = []
+        for i in key_index:
+            left_col, right_col = f"{left}.[{columns[i]}]", f"{right}.[{columns[i]}]"
+            equals = " AND ".join(
+                f"{a} = {b}"
+                for a, b in zip(exact(left_col, types[i]), exact(right_col, types[i]))
+            )
+            conditions.append(
+                null_safe_equals(left_col, right_col, columns[i].lower() in nullable, equals)
+            )
+        return " AND ".join(conditions)
+
+    def text_types(self, columns: List[str]) -> List[str]:
+        """
+        Tipo de las columnas de texto en ambas tablas (None en las demás), para
+        compararlas byte a byte en el servidor con backend.exact_text
+        """
+        source = self.column_types(self.config["source_table"], columns)
+        comparison = self.column_types(self.config["comparison_table"], columns)
+        return [
+            s if s and c and "char" in s.lower() and "char" in c.lower() else None
+            for s, c in zip(source, comparison)
         ]
-        coincident = [item for item in source_data if str(item) in comparison_set]
 
+    def injection_engine(self) -> str:
+        """
+        Motor de PROCESSING_CONFIG["compare_engine"] para cargar tabla3
+        Lanza ValueError con pushdown o vector: no devuelven las filas
+        idénticas, y tabla3 quedaría sin las COINCIDENTE
+        """
+        engine = PROCESSING_CONFIG.get("compare_engine", "hash")
+        if engine in COUNT_ONLY_ENGINES:
+            raise ValueError(
+                f"El motor de comparación '{engine}' sólo cuenta las filas idénticas "
+                f"y no sirve para inyectar en tabla3 (usar hash, merge, parallel o external)"
+            )
+        return engine
+
+    def select_columns(self, table_name: str, columns: List[str]) -> str:
+        """SELECT de las columnas indicadas (mismo orden en ambas tablas)"""
+        return f"SELECT {', '.join(f'[{col}]' for col in columns)} FROM {table_name}"
+
+    def ordered_select(self, table_name: str, columns: List[str],
+                       key_index: List[int]) -> str:
+        """SELECT ordenado por la clave con el mismo orden que compara Python"""
+        types = self.column_types(table_name, columns)
+        order = ", ".join(
+            self.db_manager.backend.binary_order(f"[{columns[i]}]", types[i])
+            for i in key_index
+        )
+        return f"{self.select_columns(table_name, columns)} ORDER BY {order}"
+
+    def iter_diff(self, include_identical: bool = False, chunk_size=None, engine: str = None):
+        """
+        Diferencias en streaming: (marca, fila_origen, fila_comparacion)
+        Lee ambas tablas ordenadas por la clave con cursores por bloques y
+        las mezcla en una pasada; la memoria queda acotada por chunk_size
+        Con engine="external" (por defecto si PROCESSING_CONFIG["compare_engine"]
+        es "external") delega en iter_external, sin ORDER BY en el servidor
+        """
+        if engine is None:
+            engine = "external" if PROCESSING_CONFIG.get("compare_engine") == "external" else "merge"
+        if engine == "external":
+            yield from self.iter_external(include_identical, chunk_size)
+            return
+        columns, key_index, value_index = self.comparison_columns()
+        source_query = self.ordered_select(self.config["source_table"], columns, key_index)
+        comparison_query = self.ordered_select(
+            self.config["comparison_table"], columns, key_index
+        )
+        yield from merge_diff(
+            iter_records(self.db_manager, source_query, columns, chunk_size=chunk_size,
+                         label="comparar_origen"),
+            iter_records(self.db_manager, comparison_query, columns, chunk_size=chunk_size,
+                         label="comparar_comparacion"),
+            key_index, value_index, include_identical=include_identical,
+            normalizers=self.value_normalizers(columns),
+        )
+
+    def pushdown_queries(self, columns: List[str], key_index: List[int],
+                         value_index: List[int]) -> Tuple[str, str]:
+        """
+        SQL de diferencias resuelto en el servidor
+        - Diferencias: anti-joins por clave para las exclusivas y JOIN por
+          clave para las modificadas, en una sola sentencia UNION ALL; sólo
+          viajan (marca, columnas origen, columnas comparación)
+        - Conteo de idénticas: JOIN por clave sin diferencias
+        Las columnas no clave se comparan con EXISTS (SELECT ... EXCEPT SELECT ...),
+        que trata NULL = NULL como iguales igual que los motores en Python; las
+        claves que admiten NULL también (ver key_condition)
+        Los textos se comparan con backend.exact_text (en SQL Server BIN2 +
+        DATALENGTH): la intercalación del servidor no iguala 'abc' con 'ABC '
+        La normalización se traduce a RTRIM / NULLIF / UPPER / CONVERT
+        """
+        source_table = self.config["source_table"]
+        comparison_table = self.config["comparison_table"]
+        spec = self.normalization_spec(columns)
+        plan = normalization_plan(columns, *spec) if spec else {}
+
+        types = self.text_types(columns)
+        exact = self.db_manager.backend.exact_text
+
+        def value(alias: str, i: int) -> str:
+            expression = f"{alias}.[{columns[i]}]"
+            data_type = types[i]
+            options = plan.get(i, {})
+            if options.get("trim"):
+                expression = f"RTRIM({expression})"
+            if options.get("empty_as_null"):
+                expression = f"NULLIF({expression}, '')"
+            if options.get("ignore_case"):
+                expression = f"UPPER({expression})"
+            if options.get("datetime_precision"):
+                length = DATETIME_PRECISIONS[options["datetime_precision"]]
+                expression = f"CONVERT(VARCHAR({length}), {expression}, 121)"
+                data_type = "varchar"
+            return ", ".join(exact(expression, data_type))
+
+        source_cols = ", ".join(f"S.[{col}]" for col in columns)
+        comparison_cols = ", ".join(f"C.[{col}]" for col in columns)
+        nulls = ", ".join("NULL" for _ in columns)
+        on = self.key_condition(columns, key_index)
+        if value_index:
+            differs = (
+                f"EXISTS (SELECT {', '.join(value('S', i) for i in value_index)} "
+                f"EXCEPT SELECT {', '.join(value('C', i) for i in value_index)})"
+            )
+        else:
+            differs = "1 = 0"
+
+        diff_query = (
+            f"SELECT '{ONLY_IN_SOURCE}', {source_cols}, {nulls} FROM {source_table} S "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {comparison_table} C WHERE {on}) "
+            f"UNION ALL "
+            f"SELECT '{ONLY_IN_COMPARISON}', {nulls}, {comparison_cols} FROM {comparison_table} C "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {source_table} S WHERE {on}) "
+            f"UNION ALL "
+            f"SELECT '{MODIFIED}', {source_cols}, {comparison_cols} FROM {source_table} S "
+            f"INNER JOIN {comparison_table} C ON {on} WHERE {differs}"
+        )
+        count_query = (
+            f"SELECT COUNT(*) FROM {source_table} S "
+            f"INNER JOIN {comparison_table} C ON {on} "
+            f"WHERE NOT ({differs})"
+        )
+        return diff_query, count_query
+
+    def partition_ranges(self, key_column: str, partitions: int) -> List[Tuple[str, tuple]]:
+        """
+        Divide el espacio de claves en rangos con NTILE sobre el origen
+        Retorna [(condición WHERE, parámetros)] que cubren ambas tablas sin
+        solaparse: el primero incluye las claves NULL y las menores al
+        segundo límite, el último no tiene tope
+        """
+        key = f"[{key_column}]"
+        bounds_query = (
+            f"SELECT MIN(k) FROM (SELECT {key} AS k, NTILE({int(partitions)}) "
+            f"OVER (ORDER BY {key}) AS p FROM {self.config['source_table']} "
+            f"WHERE {key} IS NOT NULL) T GROUP BY p ORDER BY 1"
+        )
+        bounds = []
+        for row in self.db_manager.execute_query(bounds_query, label="comparar_particiones"):
+            if not bounds or row[0] != bounds[-1]:
+                bounds.append(row[0])
+
+        if len(bounds) < 2:
+            return [("1 = 1", ())]
+        ranges = [(f"({key} IS NULL OR {key} < ?)", (bounds[1],))]
+        for lower, upper in zip(bounds[1:-1], bounds[2:]):
+            ranges.append((f"{key} >= ? AND {key} < ?", (lower, upper)))
+        ranges.append((f"{key} >= ?", (bounds[-1],)))
+        return ranges
+
+    def compare_parallel(self, columns: List[str], key_index: List[int],
+                         value_index: List[int], workers: int = None,
+                         partitions: int = None):
+        """
+        Compara por rangos de clave en paralelo, un proceso por rango
+        Cada proceso abre su propia conexión, lee su rango de ambas tablas y
+        hace el hash join; los parciales se unen en el orden de los rangos
+        workers: PROCESSING_CONFIG["compare_workers"] (por defecto núcleos)
+        partitions: PROCESSING_CONFIG["compare_partitions"] (por defecto 2 x workers)
+        """
+        workers = workers or PROCESSING_CONFIG.get("compare_workers") or os.cpu_count() or 1
+        partitions = partitions or PROCESSING_CONFIG.get("compare_partitions") or workers * 2
+        ranges = self.partition_ranges(columns[key_index[0]], partitions)
+
+        source_select = self.select_columns(self.config["source_table"], columns)
+        comparison_select = self.select_columns(self.config["comparison_table"], columns)
+        normalization = self.normalization_spec(columns)
+        only_source, only_comp, identical, modified = [], [], [], []
+        partition_seconds = []
+
+        # spawn: los procesos no heredan las conexiones abiertas del padre
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(ranges)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _compare_partition, self.db_manager.config, columns,
+                    f"{source_select} WHERE {condition}",
+                    f"{comparison_select} WHERE {condition}",
+                    params, key_index, value_index, normalization,
+                )
+                for condition, params in ranges
+            ]
+            for future in futures:
+                part_source, part_comp, part_identical, part_modified, seconds = future.result()
+                only_source += part_source
+                only_comp += part_comp
+                identical += part_identical
+                modified += part_modified
+                partition_seconds.append(round(seconds, 3))
+
+        info = {
+            "workers": min(workers, len(ranges)),
+            "particiones": len(ranges),
+            "segundos_por_particion": partition_seconds,
+        }
+        return (only_source, only_comp, identical, modified), info
+
+    def iter_external(self, include_identical: bool = False, chunk_size=None,
+                      memory_budget_mb: float = None, temp_dir: str = None):
+        """
+        Comparación con derrame a disco en streaming, para tablas más grandes
+        que la RAM: (marca, fila_origen, fila_comparacion) partición por
+        partición. Sólo el índice de la partición en curso queda en memoria
+        (compare_memory_budget_mb); el resultado no se acumula, así que
+        inject_pipelined / iter_injection_rows lo insertan a medida que sale
+        El detalle queda en self.last_external_stats al agotar el flujo
+        """
+        columns, key_index, value_index = self.comparison_columns()
+        memory_budget_mb = memory_budget_mb or PROCESSING_CONFIG.get(
+            "compare_memory_budget_mb", 512
+        )
+        source_query = self.select_columns(self.config["source_table"], columns)
+        comparison_query = self.select_columns(self.config["comparison_table"], columns)
+
+        inicio = time.perf_counter()
+        info = {}
+        yield from iter_external_diff(
+            self.db_manager.iter_query(source_query, chunk_size=chunk_size, chunks=True,
+                                       label="comparar_origen"),
+            self.db_manager.iter_query(comparison_query, chunk_size=chunk_size, chunks=True,
+                                       label="comparar_comparacion"),
+            key_index, value_index,
+            memory_budget=int(memory_budget_mb * 1024 * 1024),
+            temp_dir=temp_dir or PROCESSING_CONFIG.get("compare_temp_dir"),
+            make=record_type(tuple(columns))._make,
+            normalizers=self.value_normalizers(columns),
+            include_identical=include_identical, info=info,
+        )
+        self.last_external_stats = self._log_external(info, time.perf_counter() - inicio)
+
+    @staticmethod
+    def _log_external(info: dict, seconds: float) -> dict:
+        info["filas_por_segundo"] = round(info["filas"] / seconds) if seconds else info["filas"]
         logger.info(
-            f"Resultados - Solo en origen: {len(only_in_source)}, "
-            f"Solo en comparación: {len(only_in_comparison)}, "
-            f"Coincidentes: {len(coincident)}"
+            f"Comparación externa: {info['filas']} filas en {info['particiones']} particiones, "
+            f"{info['bytes_en_disco'] / 1048576:.1f} MB en disco, "
+            f"{info['filas_por_segundo']} filas/s"
         )
+        return info
 
-        return only_in_source, only_in_comparison, coincident
+    def compare_external(self, columns: List[str], key_index: List[int], value_index: List[int],
+                         memory_budget_mb: float = None, temp_dir: str = None):
+        """
+        Comparación con derrame a disco para tablas más grandes que la RAM
+        Presupuesto y directorio: PROCESSING_CONFIG["compare_memory_budget_mb"]
+        (512) y ["compare_temp_dir"] (directorio temporal del sistema)
+        El presupuesto acota el índice de cada partición, pero los cuatro
+        grupos del resultado quedan en memoria; para no retenerlos usar
+        iter_external (la inyección lo hace con compare_engine="external")
+        Retorna ((solo_origen, solo_comparacion, identicas, modificadas), info)
+        """
+        memory_budget_mb = memory_budget_mb or PROCESSING_CONFIG.get(
+            "compare_memory_budget_mb", 512
+        )
+        temp_dir = temp_dir or PROCESSING_CONFIG.get("compare_temp_dir")
+        source_query = self.select_columns(self.config["source_table"], columns)
+        comparison_query = self.select_columns(self.config["comparison_table"], columns)
 
-    def prepare_injection_data(self) -> List[Tuple]:
+        inicio = time.perf_counter()
+        *groups, info = external_hash_join(
+            self.db_manager.iter_query(source_query, chunks=True, label="comparar_origen"),
+            self.db_manager.iter_query(comparison_query, chunks=True,
+                                       label="comparar_comparacion"),
+            key_index, value_index,
+            memory_budget=int(memory_budget_mb * 1024 * 1024), temp_dir=temp_dir,
+            make=record_type(tuple(columns))._make,
+            normalizers=self.value_normalizers(columns),
+        )
+        return tuple(groups), self._log_external(info, time.perf_counter() - inicio)
+
+    def compare(self, engine: str = None) -> ComparisonResult:
         """
-        Prepara datos para inyectar en tabla3
-        Incluye marcas de qué tipo de comparación es
+        Compara origen vs comparación por columnas clave
+        Retorna cuatro grupos: solo en origen, solo en comparación,
+        idénticas y modificadas (misma clave, otros valores)
+        engine (por defecto PROCESSING_CONFIG["compare_engine"]):
+        - "hash": indexa la comparación en memoria, origen por bloques
+        - "merge": ambas tablas ordenadas por clave, mezcla en streaming
+        - "pushdown": el servidor calcula las diferencias; sólo viajan las
+          filas distintas y el conteo de idénticas (identical queda vacío)
+        - "parallel": rangos de clave comparados en procesos separados
+        - "vector": huellas de 64 bits por fila en arreglos NumPy; sólo se
+          materializan las diferencias (identical queda vacío)
+        - "external": particiones por hash en disco local, cada una comparada
+          en memoria dentro de compare_memory_budget_mb; mismo resultado que hash
+        pushdown y vector (COUNT_ONLY_ENGINES) no sirven para cargar tabla3:
+        ver injection_engine
+        """
+        engine = engine or PROCESSING_CONFIG.get("compare_engine", "hash")
+        inicio = time.perf_counter()
+        columns, key_index, value_index = self.comparison_columns()
+        extra_stats = {}
+
+        if engine == "hash":
+            source_query = self.select_columns(self.config["source_table"], columns)
+            comparison_query = self.select_columns(self.config["comparison_table"], columns)
+            # Se indexa la comparación y el origen se recorre por bloques
+            only_source, only_comp, identical, modified = hash_join(
+                iter_records(self.db_manager, source_query, columns, label="comparar_origen"),
+                iter_records(self.db_manager, comparison_query, columns,
+                             label="comparar_comparacion"),
+                key_index, value_index, self.value_normalizers(columns),
+            )
+        elif engine == "merge":
+            only_source, only_comp, identical, modified = [], [], [], []
+            for tag, source, comparison in self.iter_diff(include_identical=True):
+                if tag == ONLY_IN_SOURCE:
+                    only_source.append(source)
+                elif tag == ONLY_IN_COMPARISON:
+                    only_comp.append(comparison)
+                elif tag == IDENTICAL:
+                    identical.append(source)
+                else:
+                    modified.append((source, comparison))
+        elif engine == "pushdown":
+            diff_query, count_query = self.pushdown_queries(columns, key_index, value_index)
+            only_source, only_comp, identical, modified = [], [], [], []
+            make = record_type(tuple(columns))._make
+            n = len(columns)
+            for row in self.db_manager.iter_query(diff_query, label="comparar_pushdown"):
+                tag = row[0]
+                if tag == ONLY_IN_SOURCE:
+                    only_source.append(make(row[1:n + 1]))
+                elif tag == ONLY_IN_COMPARISON:
+                    only_comp.append(make(row[n + 1:]))
+                else:
+                    modified.append((make(row[1:n + 1]), make(row[n + 1:])))
+            extra_stats["identicos"] = self.db_manager.execute_query(
+                count_query, label="comparar_pushdown_conteo"
+            )[0][0]
+        elif engine == "vector":
+            source_query = self.select_columns(self.config["source_table"], columns)
+            comparison_query = self.select_columns(self.config["comparison_table"], columns)
+            identical = []
+            only_source, only_comp, modified, extra_stats["identicos"] = vector_diff(
+                self.db_manager.iter_query(source_query, chunks=True, label="comparar_origen"),
+                lambda: self.db_manager.iter_query(
+                    comparison_query, chunks=True, label="comparar_comparacion"
+                ),
+                key_index, value_index, make=record_type(tuple(columns))._make,
+                normalizers=self.value_normalizers(columns),
+            )
+        elif engine == "external":
+            (only_source, only_comp, identical, modified), extra_stats = self.compare_external(
+                columns, key_index, value_index
+            )
+        elif engine == "parallel":
+            (only_source, only_comp, identical, modified), extra_stats = self.compare_parallel(
+                columns, key_index, value_index
+            )
+        else:
+            raise ValueError(f"Motor de comparación desconocido: {engine}")
+
+        stats = {
+            "motor": engine,
+            "solo_origen": len(only_source),
+            "solo_comparacion": len(only_comp),
+            "identicos": len(identical),
+            "modificados": len(modified),
+            **extra_stats,
+            "segundos": round(time.perf_counter() - inicio, 3),
+        }
+        logger.info(
+            f"Resultados - Solo en origen: {stats['solo_origen']}, "
+            f"Solo en comparación: {stats['solo_comparacion']}, "
+            f"Idénticos: {stats['identicos']}, Modificados: {stats['modificados']}"
+        )
+        return ComparisonResult(columns, only_source, only_comp, identical, modified, stats)
+
+    def watermark_columns(self) -> Dict[str, str]:
         """
-        only_source, only_comp, coincident = self.compare_tables()
+        {tabla: columna de marca de agua} desde TABLES_CONFIG["watermark_column"]:
+        un nombre para ambas tablas o {"source": ..., "comparison": ...}
+        (rowversion o fecha de última actualización, idealmente indexada)
+        """
+        setting = self.config.get("watermark_column")
+        if not setting:
+            raise ValueError("TABLES_CONFIG no define watermark_column")
+        if isinstance(setting, str):
+            setting = {"source": setting, "comparison": setting}
+        return {
+            self.config["source_table"]: setting["source"],
+            self.config["comparison_table"]: setting["comparison"],
+        }
+
+    def current_watermarks(self) -> Dict[str, Any]:
+        """MAX de la columna de marca de agua de cada tabla"""
+        return {
+            table: self.db_manager.execute_query(
+                f"SELECT MAX([{column}]) FROM {table}", label="comparar_marca_agua"
+            )[0][0]
+            for table, column in self.watermark_columns().items()
+        }
 
-        injection_data = []
+    def key_batches(self, key_columns: List[str], keys: List[tuple]):
+        """
+        (condición WHERE, parámetros) por lote de claves, dentro del límite de parámetros
+        Una clave NULL se busca con IS NULL: IN y = nunca la encuentran
+        """
+        batch_size = max(1, 2000 // len(key_columns))
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            if len(key_columns) == 1:
+                values = [key[0] for key in batch if key[0] is not None]
+                conditions = []
+                if values:
+                    conditions.append(f"[{key_columns[0]}] IN ({', '.join('?' for _ in values)})")
+                if len(values) < len(batch):
+                    conditions.append(f"[{key_columns[0]}] IS NULL")
+                yield " OR ".join(conditions), tuple(values)
+            else:
+                condition = " OR ".join(
+                    "(" + " AND ".join(
+                        f"[{col}] IS NULL" if value is None else f"[{col}] = ?"
+                        for col, value in zip(key_columns, key)
+                    ) + ")"
+                    for key in batch
+                )
+                yield condition, tuple(value for key in batch for value in key
+                                       if value is not None)
 
-        # Agregar registro de origen no coincidente con marca
-        for item in only_source:
-            row_tuple = tuple(item.values()) + ("SOLO_ORIGEN",)
-            injection_data.append(row_tuple)
+    def rows_for_keys(self, table_name: str, columns: List[str], key_index: List[int],
+                      keys: List[tuple]) -> Iterator[tuple]:
+        """Registros de `table_name` cuyas claves están en `keys`, consultados por lotes"""
+        select = self.select_columns(table_name, columns)
+        key_columns = [columns[i] for i in key_index]
+        for condition, params in self.key_batches(key_columns, keys):
+            yield from iter_records(self.db_manager, f"{select} WHERE {condition}", columns,
+                                    params, label="comparar_por_clave")
+
+    def compare_changes(self, since: Dict[str, Any]):
+        """
+        Comparación incremental: sólo las claves con filas modificadas después
+        de `since` ({tabla: marca}) en cualquiera de las dos tablas
+        1. Claves y marca de las filas nuevas o actualizadas de cada tabla
+        2. Filas actuales de ambas tablas para esas claves, por lotes
+        3. hash_join sobre esas filas
+        Las bajas no dejan marca: se detectan con una reconciliación completa
+        Retorna (ComparisonResult, claves cambiadas, nuevas marcas)
+        """
+        inicio = time.perf_counter()
+        columns, key_index, value_index = self.comparison_columns()
+        if not self.config.get("key_columns"):
+            raise ValueError("La comparación incremental requiere key_columns")
+        key_columns = [columns[i] for i in key_index]
+        key_list = ", ".join(f"[{col}]" for col in key_columns)
 
-        # Agregar registro de comparación no coincidente
-        for item in only_comp:
-            row_tuple = tuple(item.values()) + ("SOLO_COMPARACION",)
-            injection_data.append(row_tuple)
+        changed, marks = {}, {}
+        for table, column in self.watermark_columns().items():
+            marks[table] = since[table]
+            query = f"SELECT {key_list}, [{column}] FROM {table} WHERE [{column}] > ?"
+            for row in self.db_manager.iter_query(query, (since[table],),
+                                                  label="comparar_cambios"):
+                changed[tuple(row[:-1])] = None
+                if marks[table] is None or row[-1] > marks[table]:
+                    marks[table] = row[-1]
+        keys = list(changed)
 
-        # Agregar registros coincidentes
-        for item in coincident:
-            row_tuple = tuple(item.values()) + ("COINCIDENTE",)
-            injection_data.append(row_tuple)
+        only_source, only_comp, identical, modified = hash_join(
+            self.rows_for_keys(self.config["source_table"], columns, key_index, keys),
+            self.rows_for_keys(self.config["comparison_table"], columns, key_index, keys),
+            key_index, value_index, self.value_normalizers(columns),
+        )
+        stats = {
+            "motor": "incremental",
+            "claves_cambiadas": len(keys),
+            "solo_origen": len(only_source),
+            "solo_comparacion": len(only_comp),
+            "identicos": len(identical),
+            "modificados": len(modified),
+            "segundos": round(time.perf_counter() - inicio, 3),
+        }
+        logger.info(f"Comparación incremental: {len(keys)} claves cambiadas ({stats})")
+        result = ComparisonResult(columns, only_source, only_comp, identical, modified, stats)
+        return result, keys, marks
 
+    def compare_tables(self) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """
+        Compara tabla1 vs tabla2
+        Retorna:
+        - Registros solo en tabla1
+        - Registros solo en tabla2
+        - Registros coincidentes
+        Las filas modificadas cuentan como exclusivas de cada lado; usar
+        compare() para distinguirlas
+        """
+        result = self.compare(self.injection_engine())
+        columns = result.columns
+
+        only_in_source = [dict(zip(columns, row)) for row in result.only_in_source]
+        only_in_source += [dict(zip(columns, source)) for source, _ in result.modified]
+        only_in_comparison = [dict(zip(columns, row)) for row in result.only_in_comparison]
+        only_in_comparison += [dict(zip(columns, comp)) for _, comp in result.modified]
+        coincident = [dict(zip(columns, row)) for row in result.identical]
+
+        return only_in_source, only_in_comparison, coincident
+
+    def iter_injection_rows(self, result: ComparisonResult = None) -> Iterator[Tuple]:
+        """
+        Filas para tabla3 (columnas comparadas + TIPO_COMPARACION), generadas
+        a medida que se insertan; las modificadas van con valores del origen
+        Sin `result` y con compare_engine="external" salen de iter_external
+        """
+        if result is None and self.injection_engine() == "external":
+            # Partición por partición, sin retener el resultado en memoria
+            for tag, source, comparison in self.iter_external(include_identical=True):
+                yield (source if source is not None else comparison) + (tag,)
+            return
+        result = result or self.compare(self.injection_engine())
+        for row in result.only_in_source:
+            yield row + (ONLY_IN_SOURCE,)
+        for row in result.only_in_comparison:
+            yield row + (ONLY_IN_COMPARISON,)
+        for row in result.identical:
+            yield row + (IDENTICAL,)
+        for source, _ in result.modified:
+            yield source + (MODIFIED,)
+
+    def prepare_injection_data(self) -> List[Tuple]:
+        """
+        Prepara datos para inyectar en tabla3
+        Incluye marcas de qué tipo de comparación es; las modificadas se
+        inyectan con los valores del origen
+        """
+        injection_data = list(self.iter_injection_rows())
         logger.info(f"Datos preparados para inyección: {len(injection_data)} registros")
         return injection_data
@@ -1,110 +1,584 @@
 """
 Módulo de conexión a SQL Server
 Maneja la conexión, consultas y cierre de conexiones de forma eficiente
+El motor se elige con DB_CONFIG["backend"] (ver src/backends.py)
 """
 
-import pyodbc
 import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
 from contextlib import contextmanager
 from config.credentials import DB_CONFIG, PROCESSING_CONFIG
+from src.backends import get_backend
+from src.batching import BATCH_SIZES, AdaptiveBatchSizer
+from src.metrics import QUERY_METRICS, label_for
+from src.schema import SchemaCache
+from src.resilience import (
+    CircuitBreaker, is_connection_failure, is_retryable_connect, is_retryable_read,
+    retry_call, sqlstate,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class PoolTimeoutError(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones acotado y thread-safe
+    - min_size: conexiones que la evicción por inactividad mantiene abiertas
+    - max_size: límite de conexiones abiertas (prestadas + libres)
+    - idle_timeout: segundos que una conexión libre puede quedar sin uso
+    - acquire_timeout: espera máxima por conexión al pedir prestado
+    - validate_after: segundos de inactividad tras los que se verifica
+      la conexión (SELECT 1) antes de entregarla
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300.0,
+                 acquire_timeout=30.0, validate_after=1.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Tamaños de pool inválidos")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self.validate_after = validate_after
+
+        self._idle = deque()  # (conexión, último uso); la más reciente a la derecha
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {"creadas": 0, "descartadas": 0, "timeouts": 0}
+
+    def acquire(self, timeout=None):
+        """Presta una conexión viva; bloquea hasta `timeout` si el pool está lleno"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("El pool de conexiones está cerrado")
+                expired = self._pop_expired()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Sin conexiones libres tras {timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+
+            for old in expired:
+                self._close_quietly(old)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+                with self._cond:
+                    self._stats["creadas"] += 1
+                return conn
+
+            if time.monotonic() - last_used < self.validate_after or self._is_alive(conn):
+                return conn
+
+            logger.warning("Conexión del pool no responde, se descarta")
+            self._close_quietly(conn)
+            self._forget()
+
+    def release(self, conn):
+        """Devuelve una conexión al pool descartando la transacción pendiente"""
+        try:
+            conn.rollback()
+        except Exception as e:
+            logger.warning(f"Conexión descartada al devolverla al pool: {e}")
+            self._close_quietly(conn)
+            self._forget()
+            return
+
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+
+        self._close_quietly(conn)
+        self._forget()
+
+    def close(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+
+        for conn in idle:
+            self._close_quietly(conn)
+            self._forget()
+
+    def stats(self) -> dict:
+        """Estado actual del pool"""
+        with self._cond:
+            return {
+                "abiertas": self._size,
+                "libres": len(self._idle),
+                "prestadas": self._size - len(self._idle),
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+    def _pop_expired(self) -> list:
+        """Retira las conexiones libres que superaron idle_timeout (con el lock tomado)"""
+        expired = []
+        now = time.monotonic()
+        while (
+            self._idle
+            and self._size - len(expired) > self.min_size
+            and now - self._idle[0][1] > self.idle_timeout
+        ):
+            expired.append(self._idle.popleft()[0])
+        self._size -= len(expired)
+        self._stats["descartadas"] += len(expired)
+        return expired
+
+    def _forget(self):
+        """Libera el cupo de una conexión que ya no pertenece al pool"""
+        with self._cond:
+            self._size -= 1
+            self._stats["descartadas"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# Un pool, un circuit breaker y una caché de esquema por cadena de conexión,
+# compartidos por todas las instancias
+_pools = {}
+_breakers = {}
+_schema_caches = {}
+_pools_lock = threading.Lock()
+
+
+def close_all_pools():
+    """
+    Cierra todos los pools abiertos (útil al finalizar el proceso)
+    También descarta los circuit breakers y las cachés de esquema: una caché
+    queda ligada al DatabaseManager que la creó y a su pool ya cerrado
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _breakers.clear()
+        _schema_caches.clear()
+    for pool in pools:
+        pool.close()
+
+
 class DatabaseManager:
-    """Gestor de conexiones a SQL Server con context manager"""
-
-    def __init__(self):
-        self.config = DB_CONFIG
-        self.connection_string = self._build_connection_string()
-
-    def _build_connection_string(self) -> str:
-        """Construye la cadena de conexión correcta para SQL Server"""
-        return (
-            f"DRIVER={{{self.config['driver']}}};"
-            f"SERVER={self.config['server']},{self.config['port']};"
-            f"DATABASE={self.config['database']};"
-            f"UID={self.config['username']};"
-            f"PWD={self.config['password']};"
-            "Encrypt=yes;"
-            "TrustServerCertificate=yes;"
+    """
+    Gestor de conexiones a SQL Server con context manager
+    Con una réplica de lectura configurada (DB_CONFIG["read_replica"] o
+    read_config) las llamadas con route="read" usan su propio pool; si no
+    hay réplica, o su circuito está abierto, van al primario
+    """
+
+    def __init__(self, config=None, read_config=None):
+        self.config = config or DB_CONFIG
+        self.backend = get_backend(self.config)
+        self.connection_string = self.backend.connection_string(self.config)
+        self.pool = self._get_pool(self.connection_string)
+        self.breaker = self._get_breaker(self.connection_string, self._server_name(self.config))
+
+        if read_config is None:
+            read_config = self.config.get("read_replica")
+        if read_config:
+            self.read_config = {**self.config, **read_config}
+            self.read_connection_string = self.backend.connection_string(
+                self.read_config, read_only=True
+            )
+            self.read_pool = self._get_pool(self.read_connection_string)
+            self.read_breaker = self._get_breaker(
+                self.read_connection_string, f"{self._server_name(self.read_config)} (lectura)"
+            )
+        else:
+            self.read_config = self.config
+            self.read_connection_string = self.connection_string
+            self.read_pool = self.pool
+            self.read_breaker = self.breaker
+
+        self.schema = self._get_schema_cache()
+        self._insert_stats = threading.local()
+        self.metrics = QUERY_METRICS
+        # Tamaño de lote adaptativo aprendido por sentencia INSERT (punto de
+        # partida de la próxima carga), compartido entre hilos e instancias
+        self.batch_sizes = BATCH_SIZES
+
+    @property
+    def last_insert_stats(self) -> dict:
+        """Estadísticas del último execute_insert de este hilo"""
+        return getattr(self._insert_stats, "value", {})
+
+    @staticmethod
+    def _server_name(config) -> str:
+        return config.get("server", config.get("database", "db"))
+
+    def _get_pool(self, connection_string: str) -> ConnectionPool:
+        """Obtiene (o crea) el pool compartido para esta cadena de conexión"""
+        with _pools_lock:
+            pool = _pools.get(connection_string)
+            if pool is None:
+                connect_timeout = PROCESSING_CONFIG.get("connect_timeout", 10)
+                backend = self.backend
+                # Sólo se reintentan fallos rápidos (p.ej. 08S01); un timeout de
+                # conexión se informa de inmediato y cuenta para el circuit breaker
+                pool = ConnectionPool(
+                    lambda: self._retry(
+                        lambda: backend.connect(connection_string, timeout=connect_timeout),
+                        should_retry=is_retryable_connect,
+                    ),
+                    min_size=PROCESSING_CONFIG.get("pool_min_size", 1),
+                    max_size=PROCESSING_CONFIG.get("pool_max_size", 10),
+                    idle_timeout=PROCESSING_CONFIG.get("pool_idle_timeout", 300),
+                    acquire_timeout=PROCESSING_CONFIG.get("pool_acquire_timeout", 30),
+                    validate_after=PROCESSING_CONFIG.get("pool_validate_after", 1.0),
+                )
+                _pools[connection_string] = pool
+            return pool
+
+    def _get_breaker(self, connection_string: str, name: str) -> CircuitBreaker:
+        """Obtiene (o crea) el circuit breaker compartido para esta cadena de conexión"""
+        with _pools_lock:
+            breaker = _breakers.get(connection_string)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    failure_threshold=PROCESSING_CONFIG.get("breaker_failure_threshold", 5),
+                    open_interval=PROCESSING_CONFIG.get("breaker_open_interval", 30),
+                    half_open_probes=PROCESSING_CONFIG.get("breaker_half_open_probes", 1),
+                    name=name,
+                )
+                _breakers[connection_string] = breaker
+            return breaker
+
+    def _route(self, route):
+        """(pool, breaker) según la ruta: "read" -> réplica si está disponible"""
+        if (
+            route == "read"
+            and self.read_pool is not self.pool
+            and self.read_breaker.state != CircuitBreaker.OPEN
+        ):
+            return self.read_pool, self.read_breaker
+        return self.pool, self.breaker
+
+    def _get_schema_cache(self) -> SchemaCache:
+        """Obtiene (o crea) la caché de metadatos compartida para esta cadena de conexión"""
+        with _pools_lock:
+            cache = _schema_caches.get(self.connection_string)
+            if cache is None:
+                cache = SchemaCache(self, ttl=PROCESSING_CONFIG.get("schema_cache_ttl", 300))
+                _schema_caches[self.connection_string] = cache
+            return cache
+
+    @staticmethod
+    def _retry(func, should_retry=None):
+        """Reintenta func() ante errores transitorios con backoff y jitter"""
+        kwargs = {"should_retry": should_retry} if should_retry else {}
+        return retry_call(
+            func,
+            attempts=PROCESSING_CONFIG.get("retry_attempts", 3),
+            base_delay=PROCESSING_CONFIG.get("retry_base_delay", 0.2),
+            max_delay=PROCESSING_CONFIG.get("retry_max_delay", 2.0),
+            **kwargs,
         )
 
     @contextmanager
-    def get_connection(self):
-        """Context manager para conexión segura"""
+    def get_connection(self, timeout=None, route=None):
+        """
+        Context manager que presta una conexión del pool
+        route="read" usa la réplica de lectura si existe
+        Con el circuito abierto falla al instante con CircuitOpenError
+        """
+        pool, breaker = self._route(route)
+        breaker.before_call()
         conn = None
         try:
-            conn = pyodbc.connect(self.connection_string, timeout=10)
+            conn = pool.acquire(timeout)
+            breaker.record_success()
             yield conn
-        except pyodbc.Error as e:
+        except self.backend.Error as e:
             logger.error(f"Error de conexión: {e}")
+            if is_connection_failure(e):
+                breaker.record_failure()
+            elif conn is None:
+                breaker.release()
+            raise
+        except Exception:
+            if conn is None:
+                breaker.release()
             raise
         finally:
-            if conn:
-                conn.close()
+            if conn is not None:
+                pool.release(conn)
 
     @contextmanager
-    def get_cursor(self):
+    def get_cursor(self, timeout=None, route=None):
         """Context manager para cursor con conexión automática"""
-        with self.get_connection() as conn:
+        with self.get_connection(timeout, route) as conn:
             cursor = conn.cursor()
             try:
                 yield cursor
             finally:
                 cursor.close()
 
-    def execute_query(self, query: str, params=None):
-        """Ejecuta una consulta SELECT y retorna resultados"""
+    def execute_query(self, query: str, params=None, label=None, route=None):
+        """
+        Ejecuta una consulta SELECT y retorna resultados
+        Los errores transitorios se reintentan (una lectura es idempotente)
+        """
         try:
-            with self.get_cursor() as cursor:
+            return self._retry(
+                lambda: self._fetch_all(query, params, label, route),
+                should_retry=is_retryable_read,
+            )
+        except self.backend.Error as e:
+            logger.error(f"Error ejecutando query: {e}")
+            raise
+
+    def _fetch_all(self, query, params, label, route):
+        inicio = time.perf_counter()
+        with self.get_cursor(route=route) as cursor:
+            adquirida = time.perf_counter()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            ejecutada = time.perf_counter()
+            rows = cursor.fetchall()
+        self._record(label, query, inicio, adquirida, ejecutada,
+                     time.perf_counter(), len(rows))
+        return rows
+
+    def execute_non_query(self, query: str, params=None, label=None) -> int:
+        """
+        Ejecuta UPDATE/MERGE/INSERT/DDL, confirma y retorna filas afectadas
+        Sólo se reintenta si fue víctima de deadlock (la sentencia ya se revirtió)
+        """
+        try:
+            return self._retry(
+                lambda: self._execute_commit(query, params, label),
+                should_retry=lambda e: sqlstate(e) == "40001",
+            )
+        except self.backend.Error as e:
+            logger.error(f"Error ejecutando sentencia: {e}")
+            raise
+
+    def _execute_commit(self, query, params, label):
+        inicio = time.perf_counter()
+        with self.get_cursor() as cursor:
+            adquirida = time.perf_counter()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            rowcount = cursor.rowcount
+            cursor.commit()
+        fin = time.perf_counter()
+        self._record(label, query, inicio, adquirida, fin, fin, rowcount)
+        return rowcount
+
+    def iter_query(self, query: str, params=None, chunk_size=None, chunks=False,
+                   label=None, route=None):
+        """
+        Itera el resultado de un SELECT sin cargarlo completo en memoria
+        Lee con fetchmany de a `chunk_size` filas y mantiene la conexión
+        prestada sólo mientras se consume el generador
+        Con chunks=True entrega listas de filas en lugar de filas sueltas
+        """
+        chunk_size = chunk_size or PROCESSING_CONFIG.get(
+            "fetch_size", PROCESSING_CONFIG["batch_size"]
+        )
+        try:
+            inicio = time.perf_counter()
+            with self.get_cursor(route=route) as cursor:
+                adquirida = time.perf_counter()
                 if params:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                return cursor.fetchall()
-        except pyodbc.Error as e:
-            logger.error(f"Error ejecutando query: {e}")
+                ejecutada = time.perf_counter()
+                # Sólo se mide el tiempo en fetchmany, no el del consumidor
+                fetch_time = 0.0
+                total_rows = 0
+                try:
+                    while True:
+                        t0 = time.perf_counter()
+                        rows = cursor.fetchmany(chunk_size)
+                        fetch_time += time.perf_counter() - t0
+                        if not rows:
+                            break
+                        total_rows += len(rows)
+                        if chunks:
+                            yield rows
+                        else:
+                            yield from rows
+                finally:
+                    self._record(label, query, inicio, adquirida, ejecutada,
+                                 ejecutada + fetch_time, total_rows)
+        except self.backend.Error as e:
+            logger.error(f"Error iterando query: {e}")
             raise
 
-    def execute_insert(self, query: str, data, batch_size=None):
-        """Inserta datos en lotes para mayor eficiencia"""
+    def execute_insert(self, query: str, data, batch_size=None, bulk=False,
+                       commit_interval=None, label=None, adaptive=None):
+        """
+        Inserta datos en lotes para mayor eficiencia
+        `data` puede ser una lista o cualquier iterable (p.ej. un generador):
+        sólo se materializa un lote a la vez
+        Con bulk=True los parámetros de cada lote viajan como arreglo en un
+        solo envío (fast_executemany) y sólo se confirma cada
+        `commit_interval` registros en lugar de en cada lote
+        Con adaptive=True (por defecto PROCESSING_CONFIG["adaptive_batch"]) el
+        tamaño de lote lo ajusta un AdaptiveBatchSizer hacia
+        PROCESSING_CONFIG["batch_target_seconds"] por lote (executemany +
+        commit), partiendo del tamaño aprendido en la carga anterior de la
+        misma sentencia (en bulk cada lote suma su parte del commit que lo
+        confirma); los tamaños elegidos quedan en last_insert_stats["lotes"]
+        (por hilo) y en self.batch_sizes (compartido, ver get_optimization_stats)
+        """
         batch_size = batch_size or PROCESSING_CONFIG["batch_size"]
+        if adaptive is None:
+            adaptive = PROCESSING_CONFIG.get("adaptive_batch", False)
+        if bulk:
+            commit_interval = commit_interval or PROCESSING_CONFIG.get(
+                "bulk_commit_interval", 50000
+            )
+        sizer = None
+        if adaptive:
+            sizer = AdaptiveBatchSizer(
+                self.batch_sizes.learned(query, batch_size),
+                min_size=PROCESSING_CONFIG.get("batch_size_min", 100),
+                max_size=PROCESSING_CONFIG.get("batch_size_max", 50000),
+                target_seconds=PROCESSING_CONFIG.get("batch_target_seconds", 0.5),
+                name=label or label_for(query),
+            )
         inserted_count = 0
+        pending_commit = 0
+        inicio = time.perf_counter()
 
         try:
             with self.get_connection() as conn:
+                adquirida = time.perf_counter()
                 cursor = conn.cursor()
+                cursor.fast_executemany = bulk
 
-                for i in range(0, len(data), batch_size):
-                    batch = data[i : i + batch_size]
-                    cursor.executemany(query, batch)
+                # Lotes completos desde el último commit: (filas, segundos de executemany)
+                unconfirmed = []
+
+                def commit():
+                    # El costo del commit (donde SQL Server paga buena parte de la
+                    # carga masiva) se reparte entre los lotes que confirma, según
+                    # sus filas, antes de informarlos al controlador
+                    t0 = time.perf_counter()
                     conn.commit()
+                    per_row = (time.perf_counter() - t0) / pending_commit
+                    for rows_in_batch, seconds in unconfirmed:
+                        sizer.record(rows_in_batch, seconds + rows_in_batch * per_row)
+                    unconfirmed.clear()
+
+                rows = iter(data)
+                while True:
+                    size = sizer.size if sizer else batch_size
+                    batch = list(islice(rows, size))
+                    if not batch:
+                        break
+                    lote = time.perf_counter()
+                    cursor.executemany(query, batch)
                     inserted_count += len(batch)
-                    logger.info(f"Insertados {inserted_count} registros")
+                    pending_commit += len(batch)
+                    # El último lote (incompleto) no representa al tamaño pedido
+                    if sizer and len(batch) == size:
+                        unconfirmed.append((len(batch), time.perf_counter() - lote))
+                    # Sin bulk se confirma cada lote
+                    if not bulk or pending_commit >= commit_interval:
+                        commit()
+                        pending_commit = 0
+                        logger.info(f"Insertados {inserted_count} registros")
 
-                logger.info(f"Total insertados: {inserted_count}")
+                if pending_commit:
+                    commit()
+
+                fin = time.perf_counter()
+                self._record(label, query, inicio, adquirida, fin, fin, inserted_count)
+                elapsed = fin - inicio
+                stats = {
+                    "registros": inserted_count,
+                    "segundos": round(elapsed, 3),
+                    "registros_por_segundo": round(inserted_count / elapsed, 1) if elapsed else 0.0,
+                    "bulk": bulk,
+                }
+                if sizer:
+                    self.batch_sizes.record(query, sizer.name, sizer)
+                    stats["lotes"] = sizer.stats()
+                self._insert_stats.value = stats
+                logger.info(
+                    f"Total insertados: {inserted_count} "
+                    f"({stats['registros_por_segundo']} registros/s"
+                    + (f", lote final {sizer.size}" if sizer else "") + ")"
+                )
                 return inserted_count
 
-        except pyodbc.Error as e:
+        except self.backend.Error as e:
             logger.error(f"Error en inserción: {e}")
             raise
 
+    def _record(self, label, query, inicio, adquirida, ejecutada, leida, rows):
+        """Registra tiempos de adquisición, ejecución y lectura de una llamada"""
+        if self.metrics.enabled:
+            self.metrics.record(
+                label or label_for(query),
+                adquirida - inicio,
+                ejecutada - adquirida,
+                leida - ejecutada,
+                rows,
+            )
+
     def table_exists(self, table_name: str) -> bool:
-        """Verifica si una tabla existe"""
-        # Separar esquema y nombre de tabla
-        if '.' in table_name:
-            schema, table = table_name.split('.')
-        else:
-            schema, table = 'dbo', table_name
-            
-        query = (
-            "SELECT 1 FROM information_schema.TABLES "
-            "WHERE TABLE_NAME = ? AND TABLE_SCHEMA = ?"
-        )
+        """Verifica si una tabla existe (vía caché de metadatos)"""
         try:
-            result = self.execute_query(query, (table, schema))
-            return len(result) > 0
+            return self.schema.table_exists(table_name)
         except Exception as e:
             logger.error(f"Error verificando tabla: {e}")
             return False
@@ -0,0 +1,562 @@
+"""
+Motores de diferencias entre tablas
+Funciones puras sobre filas (tuplas) alineadas por columna; la lectura de
+datos queda en TableComparator
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# Memoria estimada por byte serializado al cargar una partición (índice + tuplas)
+SPILL_MEMORY_FACTOR = 4
+MAX_SPILL_DEPTH = 4
+
+try:
+    import numpy as np
+except ImportError:  # sólo lo necesita el motor "vector"
+    np = None
+
+# Marcas de TIPO_COMPARACION en la tabla de resultados
+ONLY_IN_SOURCE = "SOLO_ORIGEN"
+ONLY_IN_COMPARISON = "SOLO_COMPARACION"
+IDENTICAL = "COINCIDENTE"
+MODIFIED = "MODIFICADO"
+
+
+class ComparisonResult(NamedTuple):
+    """Resultado de comparar origen vs comparación por columnas clave"""
+    columns: List[str]
+    only_in_source: List[tuple]
+    only_in_comparison: List[tuple]
+    identical: List[tuple]
+    modified: List[Tuple[tuple, tuple]]  # (fila origen, fila comparación)
+    stats: Dict[str, Any]
+
+
+def _rebuild_record(columns, values):
+    return record_type(columns)._make(values)
+
+
+@lru_cache(maxsize=128)
+def record_type(columns: Tuple[str, ...]):
+    """
+    Tipo de fila compacto para un esquema
+    Tupla con nombre (sin __dict__ por fila); los nombres de columna viven
+    una sola vez en la clase (`columns`). Las columnas que no son
+    identificadores válidos se exponen como _0, _1... (acceso por posición)
+    """
+    base = namedtuple("Fila", columns, rename=True)
+
+    def __reduce__(self):
+        # Picklable aunque la clase sea dinámica (procesos del motor parallel)
+        return _rebuild_record, (columns, tuple(self))
+
+    return type("Fila", (base,), {
+        "__slots__": (),
+        "columns": columns,
+        "__reduce__": __reduce__,
+    })
+
+
+def getter(indexes: Sequence[int],
+           normalizers: Dict[int, Callable] = None) -> Callable[[Sequence], Any]:
+    """
+    Extractor de columnas por posición (valor suelto si es una sola)
+    normalizers: {posición: función} ya compilados; las demás columnas se
+    leen tal cual
+    """
+    if not indexes:
+        return lambda row: ()
+    get = itemgetter(*indexes)
+    funcs = [(normalizers or {}).get(i) for i in indexes]
+    if not any(funcs):
+        return get
+    if len(indexes) == 1:
+        func, index = funcs[0], indexes[0]
+        return lambda row: func(row[index])
+    funcs = [func or _identity for func in funcs]
+    return lambda row: tuple(func(value) for func, value in zip(funcs, get(row)))
+
+
+def _identity(value):
+    return value
+
+
+def digest64(value) -> int:
+    """
+    Huella blake2b de 64 bits (con signo) de repr(value)
+    A diferencia de hash() no colisiona por construcción (hash(-1) == hash(-2))
+    """
+    digest = hashlib.blake2b(repr(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def row_hash(row: Sequence) -> int:
+    """
+    Huella de 64 bits (con signo, cabe en BIGINT) de una fila de tabla3
+    Estable entre procesos: no depende de hash() ni de PYTHONHASHSEED
+    """
+    return digest64(tuple(row))
+
+
+# Normalización de valores antes de comparar (TABLES_CONFIG["normalize"])
+TEXT_TYPES = {"char", "varchar", "nchar", "nvarchar", "text", "ntext"}
+DATETIME_TYPES = {"datetime", "datetime2", "smalldatetime", "datetimeoffset"}
+# Largo del texto 'AAAA-MM-DD HH:MM:SS.fff' que conserva cada precisión
+DATETIME_PRECISIONS = {"minutes": 16, "seconds": 19, "milliseconds": 23}
+NORMALIZE_OPTIONS = ("trim", "empty_as_null", "ignore_case", "datetime_precision")
+
+
+def normalization_plan(columns: Sequence[str], data_types: Sequence[str],
+                       options: Dict[str, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    Opciones efectivas por posición de columna
+    options: {"*": {...}, "Columna": {...}}; las de la columna se suman a
+    las de "*". trim / empty_as_null / ignore_case sólo aplican a columnas
+    de texto y datetime_precision a fechas
+    """
+    defaults = options.get("*", {})
+    by_name = {name.lower(): value for name, value in options.items() if name != "*"}
+    plan = {}
+    for index, (column, data_type) in enumerate(zip(columns, data_types)):
+        merged = {**defaults, **by_name.get(column.lower(), {})}
+        unknown = set(merged) - set(NORMALIZE_OPTIONS)
+        if unknown:
+            raise ValueError(f"Opciones de normalización desconocidas: {sorted(unknown)}")
+        precision = merged.get("datetime_precision")
+        if precision and precision not in DATETIME_PRECISIONS:
+            raise ValueError(f"datetime_precision inválida: {precision}")
+        data_type = (data_type or "").lower()
+        allowed = (
+            ("trim", "empty_as_null", "ignore_case") if data_type in TEXT_TYPES
+            else ("datetime_precision",) if data_type in DATETIME_TYPES
+            else ()
+        )
+        effective = {name: merged[name] for name in allowed if merged.get(name)}
+        if effective:
+            plan[index] = effective
+    return plan
+
+
+def _truncate_datetime(precision: str) -> Callable:
+    length = DATETIME_PRECISIONS[precision]
+    fields = {"minutes": {"second": 0, "microsecond": 0},
+              "seconds": {"microsecond": 0}}.get(precision)
+
+    def truncate(value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value[:length]
+        if fields:
+            return value.replace(**fields)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return truncate
+
+
+def compile_normalizers(columns: Sequence[str], data_types: Sequence[str],
+                        options: Dict[str, Dict[str, Any]]) -> Dict[int, Callable]:
+    """
+    Una función por columna a normalizar, armada una sola vez por esquema
+    (los motores no deciden nada por valor)
+    """
+    normalizers = {}
+    for index, effective in normalization_plan(columns, data_types, options).items():
+        steps = []
+        if effective.get("trim"):
+            steps.append(lambda v: v.rstrip() if isinstance(v, str) else v)
+        if effective.get("empty_as_null"):
+            steps.append(lambda v: None if v == "" else v)
+        if effective.get("ignore_case"):
+            steps.append(lambda v: v.casefold() if isinstance(v, str) else v)
+        if effective.get("datetime_precision"):
+            steps.append(_truncate_datetime(effective["datetime_precision"]))
+
+        if len(steps) == 1:
+            normalizers[index] = steps[0]
+        else:
+            def chained(value, steps=tuple(steps)):
+                for step in steps:
+                    value = step(value)
+                return value
+            normalizers[index] = chained
+    return normalizers
+
+
+def hash_join(source_rows: Iterable[Sequence], comparison_rows: Iterable[Sequence],
+              key_index: Sequence[int], value_index: Sequence[int],
+              normalizers: Dict[int, Callable] = None):
+    """
+    Compara en una pasada lineal por lado
+    Indexa la comparación como clave -> (hash de columnas no clave, fila) y
+    recorre el origen consultando el índice; no construye cadenas por fila
+    Claves repetidas: cada fila se empareja a lo sumo una vez y las sobrantes
+    quedan como exclusivas de su lado
+    normalizers (compile_normalizers) se aplican a las columnas no clave; las
+    filas del resultado conservan los valores originales
+    Retorna (solo_origen, solo_comparacion, identicas, modificadas)
+    """
+    key_of = getter(key_index)
+    values_of = getter(value_index, normalizers)
+
+    index = {}
+    only_in_comparison = []
+    for row in comparison_rows:
+        key = key_of(row)
+        if key in index:
+            only_in_comparison.append(row)
+        else:
+            index[key] = (hash(values_of(row)), row)
+
+    only_in_source, identical, modified = [], [], []
+    for row in source_rows:
+        match = index.pop(key_of(row), None)
+        if match is None:
+            only_in_source.append(row)
+            continue
+        values = values_of(row)
+        # El hash descarta rápido las modificadas; la igualdad evita colisiones
+        if match[0] == hash(values) and values_of(match[1]) == values:
+            identical.append(row)
+        else:
+            modified.append((row, match[1]))
+
+    only_in_comparison.extend(row for _, row in index.values())
+    return only_in_source, only_in_comparison, identical, modified
+
+
+def _sort_key(key):
+    """Orden de clave compatible con ORDER BY: NULL primero"""
+    if isinstance(key, tuple):
+        return tuple((value is not None, value) for value in key)
+    return (key is not None, key)
+
+
+def key_range_shards(rows: Iterable[Sequence], key_index: Sequence[int],
+                     shards: int) -> List[List[Sequence]]:
+    """
+    Reparte filas en hasta `shards` rangos de clave contiguos, disjuntos y de
+    tamaño parejo, cada uno ordenado por la clave; una misma clave nunca
+    queda en dos rangos
+    """
+    key_of = getter(key_index)
+    ordered = sorted(rows, key=lambda row: _sort_key(key_of(row)))
+    ranges, start = [], 0
+    for i in range(1, shards + 1):
+        end = max(len(ordered) * i // shards, start)
+        while 0 < end < len(ordered) and key_of(ordered[end]) == key_of(ordered[end - 1]):
+            end += 1
+        if end > start:
+            ranges.append(ordered[start:end])
+            start = end
+    return ranges
+
+
+def merge_diff(source_rows: Iterable[Sequence], comparison_rows: Iterable[Sequence],
+               key_index: Sequence[int], value_index: Sequence[int],
+               include_identical: bool = False, normalizers: Dict[int, Callable] = None):
+    """
+    Recorre dos flujos ordenados por clave en una sola pasada de mezcla
+    Genera (marca, fila_origen, fila_comparacion) a medida que encuentra
+    diferencias; la fila del lado ausente es None. La memoria no depende
+    del tamaño de las tablas
+    Lanza ValueError si algún flujo no llega ordenado por la clave
+    """
+    key_of = getter(key_index)
+    values_of = getter(value_index, normalizers)
+
+    def ordered(rows, side):
+        previous = None
+        for row in rows:
+            current = _sort_key(key_of(row))
+            if previous is not None and current < previous:
+                raise ValueError(f"Las filas de {side} no están ordenadas por la clave")
+            previous = current
+            yield current, row
+
+    source = ordered(source_rows, "origen")
+    comparison = ordered(comparison_rows, "comparación")
+    done = (None, None)
+    s_key, s_row = next(source, done)
+    c_key, c_row = next(comparison, done)
+
+    while s_row is not None and c_row is not None:
+        if s_key < c_key:
+            yield ONLY_IN_SOURCE, s_row, None
+            s_key, s_row = next(source, done)
+        elif c_key < s_key:
+            yield ONLY_IN_COMPARISON, None, c_row
+            c_key, c_row = next(comparison, done)
+        else:
+            if values_of(s_row) != values_of(c_row):
+                yield MODIFIED, s_row, c_row
+            elif include_identical:
+                yield IDENTICAL, s_row, c_row
+            s_key, s_row = next(source, done)
+            c_key, c_row = next(comparison, done)
+
+    while s_row is not None:
+        yield ONLY_IN_SOURCE, s_row, None
+        s_key, s_row = next(source, done)
+    while c_row is not None:
+        yield ONLY_IN_COMPARISON, None, c_row
+        c_key, c_row = next(comparison, done)
+
+
+def fingerprints(rows: Sequence[Sequence], key_index: Sequence[int],
+                 value_index: Sequence[int], normalizers: Dict[int, Callable] = None):
+    """
+    Huellas de 64 bits por fila de un bloque: (claves, valores) como int64
+    Se derivan de digest64 (blake2b); hash() de Python colisiona en valores
+    comunes (hash(-1) == hash(-2)) y confundiría filas distintas
+    """
+    key_of = getter(key_index)
+    values_of = getter(value_index, normalizers)
+    count = len(rows)
+    keys = np.fromiter((digest64(key_of(row)) for row in rows), dtype=np.int64, count=count)
+    values = np.fromiter((digest64(values_of(row)) for row in rows), dtype=np.int64,
+                         count=count)
+    return keys, values
+
+
+def vector_diff(source_chunks: Iterable[Sequence], comparison_chunks: Callable[[], Iterable],
+                key_index: Sequence[int], value_index: Sequence[int], make=tuple,
+                normalizers: Dict[int, Callable] = None):
+    """
+    Comparación por huellas en arreglos NumPy
+    1. Huellas (clave, valores) de toda la comparación, ordenadas por clave
+    2. Por cada bloque del origen: searchsorted contra las claves de la
+       comparación; sólo se materializan las filas sin pareja o modificadas
+    3. Segunda lectura de la comparación (comparison_chunks se llama dos
+       veces): isin recupera sólo las filas sin pareja o modificadas
+    Requiere claves únicas en la comparación: una huella de clave repetida
+    (clave duplicada o colisión) lanza ValueError en lugar de emparejar
+    filas que no corresponden. Una clave repetida en el origen se empareja
+    una sola vez, como en hash_join. Las idénticas sólo se cuentan
+    make: constructor de fila para las filas materializadas
+    Retorna (solo_origen, solo_comparacion, modificadas, cantidad_identicas)
+    """
+    if np is None:
+        raise ImportError("numpy no está instalado (requerido por el motor vector)")
+
+    key_parts, value_parts = [], []
+    for chunk in comparison_chunks():
+        keys, values = fingerprints(chunk, key_index, value_index, normalizers)
+        key_parts.append(keys)
+        value_parts.append(values)
+    comparison_keys = np.concatenate(key_parts) if key_parts else np.empty(0, np.int64)
+    comparison_values = np.concatenate(value_parts) if value_parts else np.empty(0, np.int64)
+    order = np.argsort(comparison_keys, kind="stable")
+    comparison_keys = comparison_keys[order]
+    comparison_values = comparison_values[order]
+    if len(comparison_keys) > 1 and bool((comparison_keys[1:] == comparison_keys[:-1]).any()):
+        raise ValueError("Huellas de clave repetidas en la comparación (claves duplicadas)")
+    matched = np.zeros(len(comparison_keys), dtype=bool)
+
+    only_in_source, modified_source = [], {}
+    identical_count = 0
+    for chunk in source_chunks:
+        keys, values = fingerprints(chunk, key_index, value_index, normalizers)
+        if len(comparison_keys):
+            pos = np.minimum(np.searchsorted(comparison_keys, keys), len(comparison_keys) - 1)
+            found = comparison_keys[pos] == keys
+            # Clave repetida en el origen: sólo la primera fila se empareja y
+            # las demás quedan como exclusivas del origen, como en hash_join
+            candidates = np.flatnonzero(found)
+            _, first = np.unique(pos[candidates], return_index=True)
+            found = np.zeros(len(keys), dtype=bool)
+            found[candidates[first]] = True
+            found &= ~matched[pos]
+            same = found & (comparison_values[pos] == values)
+            matched[pos[found]] = True
+        else:
+            found = same = np.zeros(len(keys), dtype=bool)
+        identical_count += int(same.sum())
+        for i in np.flatnonzero(~found):
+            only_in_source.append(make(chunk[i]))
+        for i in np.flatnonzero(found & ~same):
+            modified_source[int(keys[i])] = make(chunk[i])
+
+    missing_keys = comparison_keys[~matched]
+    modified_keys = np.fromiter(modified_source, dtype=np.int64, count=len(modified_source))
+    only_in_comparison, modified_comparison = [], {}
+    if len(missing_keys) or len(modified_keys):
+        for chunk in comparison_chunks():
+            keys, _ = fingerprints(chunk, key_index, ())
+            for i in np.flatnonzero(np.isin(keys, missing_keys)):
+                only_in_comparison.append(make(chunk[i]))
+            for i in np.flatnonzero(np.isin(keys, modified_keys)):
+                modified_comparison[int(keys[i])] = make(chunk[i])
+
+    modified = [(row, modified_comparison[key]) for key, row in modified_source.items()]
+    return only_in_source, only_in_comparison, modified, identical_count
+
+
+def _spill(blocks: Iterable[Sequence], key_of, level: int, files, numbered: bool) -> int:
+    """
+    Reparte bloques de filas en archivos por hash de la clave
+    numbered: agrega la posición global al final de cada fila (para
+    devolver el resultado en el orden de lectura)
+    """
+    partitions = len(files)
+    position = 0
+    for block in blocks:
+        groups = {}
+        for row in block:
+            if numbered:
+                row = (*row, position)
+            groups.setdefault(hash((level, key_of(row))) % partitions, []).append(row)
+            position += 1
+        for partition, rows in groups.items():
+            pickle.dump(rows, files[partition], pickle.HIGHEST_PROTOCOL)
+    return position
+
+
+def _read_spill(path: str):
+    """Bloques de un archivo de partición en el orden en que se escribieron"""
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _chained(path: str):
+    for block in _read_spill(path):
+        yield from block
+
+
+def _iter_join(source_rows, comparison_rows, key_index, value_index, normalizers,
+               include_identical: bool):
+    """
+    hash_join de una partición como flujo de (marca, fila_origen, fila_comparacion)
+    Sólo el índice de la comparación queda en memoria; el origen se recorre
+    y cada fila sale apenas se clasifica
+    """
+    key_of = getter(key_index)
+    values_of = getter(value_index, normalizers)
+    index = {}
+    for row in comparison_rows:
+        key = key_of(row)
+        if key in index:
+            yield ONLY_IN_COMPARISON, None, row
+        else:
+            index[key] = row
+    for row in source_rows:
+        match = index.pop(key_of(row), None)
+        if match is None:
+            yield ONLY_IN_SOURCE, row, None
+        elif values_of(row) != values_of(match):
+            yield MODIFIED, row, match
+        elif include_identical:
+            yield IDENTICAL, row, match
+    for row in index.values():
+        yield ONLY_IN_COMPARISON, None, row
+
+
+def _spill_join(source_blocks, comparison_blocks, key_index, value_index, budget: int,
+                directory: str, partitions: int, level: int, info: dict,
+                normalizers=None, numbered: bool = False, include_identical: bool = True):
+    """Reparte ambos lados en disco y entrega las diferencias partición por partición"""
+    key_of = getter(key_index)
+    workdir = tempfile.mkdtemp(prefix=f"nivel{level}_", dir=directory)
+    try:
+        paths = [(os.path.join(workdir, f"{p}.origen"), os.path.join(workdir, f"{p}.comparacion"))
+                 for p in range(partitions)]
+        for side, blocks in ((0, source_blocks), (1, comparison_blocks)):
+            files = [open(pair[side], "wb") for pair in paths]
+            try:
+                rows = _spill(blocks, key_of, level, files, numbered and level == 0)
+                if level == 0:
+                    info["filas"] += rows
+            finally:
+                for f in files:
+                    f.close()
+        info["bytes_en_disco"] += sum(os.path.getsize(path) for pair in paths for path in pair)
+        info["profundidad"] = max(info["profundidad"], level + 1)
+
+        for source_path, comparison_path in paths:
+            info["particiones"] += 1
+            if (os.path.getsize(comparison_path) * SPILL_MEMORY_FACTOR > budget
+                    and level + 1 < MAX_SPILL_DEPTH):
+                # La partición no entra en el presupuesto: se vuelve a repartir
+                yield from _spill_join(_read_spill(source_path), _read_spill(comparison_path),
+                                       key_index, value_index, budget, workdir, partitions,
+                                       level + 1, info, normalizers, numbered,
+                                       include_identical)
+                continue
+            yield from _iter_join(_chained(source_path), _chained(comparison_path),
+                                  key_index, value_index, normalizers, include_identical)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def iter_external_diff(source_blocks: Iterable[Sequence], comparison_blocks: Iterable[Sequence],
+                       key_index: Sequence[int], value_index: Sequence[int],
+                       memory_budget: int, temp_dir: str = None, partitions: int = 32,
+                       make=tuple, normalizers: Dict[int, Callable] = None,
+                       include_identical: bool = False, info: dict = None):
+    """
+    external_hash_join en streaming: (marca, fila_origen, fila_comparacion)
+    partición por partición, en el orden de las particiones y no en el de
+    lectura. En memoria queda sólo el índice de la partición en curso
+    (acotado por memory_budget) y el bloque que se reparte; nada del
+    resultado se acumula. `info` (dict opcional) recibe particiones, filas y
+    bytes en disco
+    """
+    info = info if info is not None else {}
+    info.update(particiones=0, profundidad=0, filas=0, bytes_en_disco=0)
+    with tempfile.TemporaryDirectory(prefix="comparacion_", dir=temp_dir) as directory:
+        for tag, source, comparison in _spill_join(
+            source_blocks, comparison_blocks, key_index, value_index, memory_budget,
+            directory, partitions, 0, info, normalizers,
+            include_identical=include_identical,
+        ):
+            yield (tag, None if source is None else make(source),
+                   None if comparison is None else make(comparison))
+
+
+def external_hash_join(source_blocks: Iterable[Sequence], comparison_blocks: Iterable[Sequence],
+                       key_index: Sequence[int], value_index: Sequence[int],
+                       memory_budget: int, temp_dir: str = None, partitions: int = 32,
+                       make=tuple, normalizers: Dict[int, Callable] = None):
+    """
+    hash_join para tablas que no entran en memoria (Grace hash join)
+    Reparte ambos lados por hash de la clave en archivos temporales de
+    temp_dir y compara cada partición en memoria. Una partición cuya
+    comparación supera memory_budget (bytes) se vuelve a repartir, hasta
+    MAX_SPILL_DEPTH niveles. Los archivos se borran al terminar, también
+    ante errores
+    Devuelve los mismos grupos y en el mismo orden que hash_join (con claves
+    únicas), más info de particiones, filas leídas y bytes escritos
+    Los cuatro grupos quedan en memoria: para no retener el resultado usar
+    iter_external_diff
+    """
+    result = {ONLY_IN_SOURCE: [], ONLY_IN_COMPARISON: [], IDENTICAL: [], MODIFIED: []}
+    info = {"particiones": 0, "profundidad": 0, "filas": 0, "bytes_en_disco": 0}
+    with tempfile.TemporaryDirectory(prefix="comparacion_", dir=temp_dir) as directory:
+        for tag, source, comparison in _spill_join(
+            source_blocks, comparison_blocks, key_index, value_index, memory_budget,
+            directory, partitions, 0, info, normalizers, numbered=True,
+        ):
+            if tag == MODIFIED:
+                result[tag].append((source, comparison))
+            else:
+                result[tag].append(source if source is not None else comparison)
+
+    only_in_source, only_in_comparison, identical, modified = result.values()
+    position = itemgetter(-1)
+    for bucket in (only_in_source, only_in_comparison, identical):
+        bucket.sort(key=position)
+        bucket[:] = [make(row[:-1]) for row in bucket]
+    modified.sort(key=lambda pair: pair[0][-1])
+    modified[:] = [(make(source[:-1]), make(comparison[:-1])) for source, comparison in modified]
+    return only_in_source, only_in_comparison, identical, modified, info
@@ -4,8 +4,14 @@ Inserta los datos comparados en tabla3 de forma eficiente
 """
 
 import logging
+import queue
+import threading
+import time
 from src.database import DatabaseManager
+from src.schema import common_sql_type, indexable_type, split_table_name
 from src.comparison import TableComparator
+from src.diff import getter, key_range_shards, row_hash
+from src.watermark import WatermarkStore
 from config.credentials import TABLES_CONFIG, PROCESSING_CONFIG
 
 logger = logging.getLogger(__name__)
@@ -14,93 +20,776 @@ logger = logging.getLogger(__name__)
 class DataInjector:
     """Inyecta los datos comparados en tabla3"""
 
-    def __init__(self):
-        self.db_manager = DatabaseManager()
-        self.comparator = TableComparator()
-        self.config = TABLES_CONFIG
+    def __init__(self, db_manager=None, config=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.config = config or TABLES_CONFIG
+        self.comparator = TableComparator(self.db_manager, self.config)
 
     def prepare_result_table(self) -> bool:
         """
         Verifica o crea la tabla de resultados
+        Las columnas comparadas toman el tipo del origen (INFORMATION_SCHEMA,
+        NVARCHAR(MAX) si la comparación tiene otro tipo),
+        con índices por las columnas clave y por TIPO_COMPARACION; con
+        PROCESSING_CONFIG["result_columnstore"] se guarda como columnstore
         """
         result_table = self.config["result_table"]
+        self.db_manager.schema.load(result_table, self.config["source_table"])
 
         if self.db_manager.table_exists(result_table):
             logger.info(f"Tabla {result_table} ya existe")
             return True
 
         logger.info(f"Creando tabla {result_table}")
-        
-        # Obtener estructura de tabla origen
-        source_columns = self.comparator.get_table_columns(
-            self.config["source_table"]
-        )
 
-        if not source_columns:
+        try:
+            # Columnas que se insertan y sus tipos en el origen
+            columns, key_index, _ = self.comparator.comparison_columns()
+        except Exception as e:
+            logger.error(f"No se pudieron obtener columnas de tabla origen: {e}")
+            return False
+
+        if not columns:
             logger.error("No se pudieron obtener columnas de tabla origen")
             return False
 
-        # Construir CREATE TABLE
-        columns_def = ", ".join([f"[{col}] NVARCHAR(MAX)" for col in source_columns])
-        create_query = (
-            f"CREATE TABLE {result_table} ("
-            f"ID INT PRIMARY KEY IDENTITY(1,1), "
-            f"{columns_def}, "
-            f"[TIPO_COMPARACION] NVARCHAR(50)"
-            f")"
-        )
+        create, indexes = self.result_table_statements(result_table, columns, key_index)
+        statements = [create] + [statement for _, statement in indexes]
 
         try:
             with self.db_manager.get_cursor() as cursor:
-                cursor.execute(create_query)
+                for statement in statements:
+                    cursor.execute(statement)
                 cursor.commit()
+            self.db_manager.schema.invalidate(result_table)
             logger.info(f"Tabla {result_table} creada exitosamente")
             return True
         except Exception as e:
             logger.error(f"Error creando tabla: {e}")
             return False
 
-    def inject_data(self) -> bool:
+    def result_table_statements(self, table: str, columns, key_index):
+        """
+        DDL de una tabla de resultados con las columnas comparadas
+        Retorna (CREATE TABLE, [(nombre del índice, CREATE INDEX)]); los
+        índices van aparte para poder crearlos después de la carga
+        """
+        types = self.result_column_types(columns)
+        columnstore = (
+            PROCESSING_CONFIG.get("result_columnstore", False)
+            and self.db_manager.backend.supports_columnstore
+        )
+
+        # Construir CREATE TABLE
+        columns_def = ", ".join(f"[{col}] {types[col]} NULL" for col in columns)
+        identity = (
+            "ID INT IDENTITY(1,1) PRIMARY KEY NONCLUSTERED" if columnstore
+            else "ID INT PRIMARY KEY IDENTITY(1,1)"
+        )
+        create = (
+            f"CREATE TABLE {table} ("
+            f"{identity}, "
+            f"{columns_def}, "
+            f"[TIPO_COMPARACION] VARCHAR(20) NOT NULL, "
+            f"[ROW_HASH] BIGINT NULL"
+            f")"
+        )
+
+        _, name = split_table_name(table)
+        indexes = []
+        if columnstore:
+            indexes.append((
+                f"cci_{name}", f"CREATE CLUSTERED COLUMNSTORE INDEX [cci_{name}] ON {table}"
+            ))
+        key_columns = [columns[i] for i in key_index] if self.config.get("key_columns") else []
+        if key_columns and all(indexable_type(types[col]) for col in key_columns):
+            indexes.append((
+                f"ix_{name}_clave",
+                f"CREATE NONCLUSTERED INDEX [ix_{name}_clave] ON {table} "
+                f"({', '.join(f'[{col}]' for col in key_columns)})",
+            ))
+        elif key_columns:
+            logger.warning(
+                f"Clave de {table} con columnas no indexables ((MAX), TEXT, XML...): "
+                f"se crea sin índice por clave"
+            )
+        indexes.append((
+            f"ix_{name}_tipo",
+            f"CREATE NONCLUSTERED INDEX [ix_{name}_tipo] ON {table} ([TIPO_COMPARACION])",
+        ))
+        return create, indexes
+
+    def result_column_types(self, columns) -> dict:
+        """
+        {columna: tipo SQL} de las columnas comparadas según el origen
+        Si la comparación tiene otro tipo, uno que admita ambos (ver
+        common_sql_type): tabla3 también guarda las filas SOLO_COMPARACION
+        """
+        schema = self.db_manager.schema
+        source_table, comparison_table = (
+            self.config["source_table"], self.config["comparison_table"]
+        )
+        schema.load(source_table, comparison_table)
+        source_columns = {col.name.lower(): col for col in schema.get_columns(source_table)}
+        comparison_columns = {
+            col.name.lower(): col for col in schema.get_columns(comparison_table)
+        }
+        return {
+            col: common_sql_type(source_columns.get(col.lower()),
+                                 comparison_columns.get(col.lower()))
+            for col in columns
+        }
+
+    def injection_rows(self, engine: str):
+        """
+        (columnas, filas para tabla3) con el motor `engine`
+        Con "external" las filas salen partición por partición sin retener el
+        resultado en memoria; con los demás se compara primero (compare)
+        """
+        if engine == "external":
+            columns, _, _ = self.comparator.comparison_columns()
+            return columns, self.comparator.iter_injection_rows()
+        result = self.comparator.compare(engine)
+        return result.columns, self.comparator.iter_injection_rows(result)
+
+    def insert_query(self, columns, table: str = None) -> str:
+        """INSERT de las columnas comparadas + TIPO_COMPARACION en tabla3 (u otra tabla)"""
+        columns_str = ", ".join(f"[{col}]" for col in columns)
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        return (
+            f"INSERT INTO {table or self.config['result_table']} "
+            f"({columns_str}, [TIPO_COMPARACION]) "
+            f"VALUES ({placeholders})"
+        )
+
+    def inject_data(self, bulk=None, pipelined=None, differential=None,
+                    staged=None) -> bool:
         """
         Inyecta los datos comparados en tabla3
+        Con bulk=True usa la carga masiva de DatabaseManager.execute_insert
+        (por defecto PROCESSING_CONFIG["bulk_insert"])
+        Con pipelined=True delega en inject_pipelined (por defecto
+        PROCESSING_CONFIG["pipeline_injection"])
+        Con differential=True delega en inject_differential (por defecto
+        PROCESSING_CONFIG["differential_injection"]) y con staged=True en
+        inject_staged (por defecto PROCESSING_CONFIG["staged_injection"])
+        Con PROCESSING_CONFIG["injection_writers"] > 1 delega en inject_sharded
+        Salvo en tubería, lanza ValueError si compare_engine es pushdown o vector
         """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        if pipelined is None:
+            pipelined = PROCESSING_CONFIG.get("pipeline_injection", False)
+        if differential is None:
+            differential = PROCESSING_CONFIG.get("differential_injection", False)
+        if staged is None:
+            staged = PROCESSING_CONFIG.get("staged_injection", False)
+        if differential:
+            return self.inject_differential(bulk=bulk)
+        if staged:
+            return self.inject_staged(bulk=bulk)
+        if pipelined:
+            return self.inject_pipelined(bulk=bulk)
+        if PROCESSING_CONFIG.get("injection_writers", 1) > 1:
+            return self.inject_sharded(bulk=bulk)
+
+        # Con pushdown / vector tabla3 quedaría sin las COINCIDENTE: se rechaza
+        # antes de tocar tabla3
+        engine = self.comparator.injection_engine()
         try:
             # Preparar tabla de resultados
             if not self.prepare_result_table():
                 logger.error("No se pudo preparar tabla de resultados")
                 return False
 
-            # Obtener datos preparados
-            injection_data = self.comparator.prepare_injection_data()
+            # Comparación en registros compactos; las filas a insertar se
+            # generan lote a lote sin copiar los resultados a otra lista
+            columns, rows = self.injection_rows(engine)
 
-            if not injection_data:
+            # Inyectar en lotes (columnas comparadas + TIPO_COMPARACION)
+            inserted = self.db_manager.execute_insert(
+                self.insert_query(columns), rows,
+                PROCESSING_CONFIG["batch_size"],
+                bulk=bulk,
+            )
+            if not inserted:
                 logger.warning("No hay datos para inyectar")
                 return True
 
-            # Obtener columnas
-            source_columns = self.comparator.get_table_columns(
-                self.config["source_table"]
+            rate = self.db_manager.last_insert_stats.get("registros_por_segundo", 0)
+            logger.info(
+                f"Inyección completada: {inserted} registros insertados "
+                f"({rate} registros/s)"
             )
-            columns_str = ", ".join([f"[{col}]" for col in source_columns])
-
-            # Construir INSERT query
-            placeholders = ", ".join(["?" for _ in source_columns + ["TIPO_COMPARACION"]])
-            insert_query = (
-                f"INSERT INTO {self.config['result_table']} "
-                f"({columns_str}, [TIPO_COMPARACION]) "
-                f"VALUES ({placeholders})"
+            return True
+
+        except Exception as e:
+            logger.error(f"Error durante inyección: {e}")
+            return False
+
+    def inject_pipelined(self, writers: int = None, queue_batches: int = None,
+                         bulk=None) -> bool:
+        """
+        Inyección en tubería: comparar e insertar se solapan
+        - Productor (este hilo): iter_diff lee ambas tablas ordenadas por la
+          clave y entrega filas marcadas en lotes de batch_size
+        - Cola acotada de `queue_batches` lotes: si los escritores se atrasan,
+          el productor espera (la memoria queda plana)
+        - `writers` hilos escritores, cada uno con su conexión, vacían la cola
+          en tabla3 con execute_insert
+        writers / queue_batches: PROCESSING_CONFIG["pipeline_writers"] (1) y
+        ["pipeline_queue_batches"] (8)
+        Si falla la comparación o un escritor, se borran de tabla3 las filas
+        de esta corrida (ID mayor al máximo previo), como en inject_sharded
+        El rendimiento de cada etapa queda en self.last_pipeline_stats
+        """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        writers = writers or PROCESSING_CONFIG.get("pipeline_writers", 1)
+        queue_batches = queue_batches or PROCESSING_CONFIG.get("pipeline_queue_batches", 8)
+        batch_size = PROCESSING_CONFIG["batch_size"]
+
+        if not self.prepare_result_table():
+            logger.error("No se pudo preparar tabla de resultados")
+            return False
+        try:
+            base_id = self.last_result_id()
+        except Exception as e:
+            logger.error(f"Error preparando la inyección en tubería: {e}")
+            return False
+
+        batches = queue.Queue(maxsize=queue_batches)
+        failed = threading.Event()
+        done = object()
+        writer_stats = []
+
+        def put(item):
+            # Espera acotada para no quedar bloqueado si todos los escritores fallaron
+            while not failed.is_set():
+                try:
+                    batches.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def drain():
+            while True:
+                try:
+                    batch = batches.get(timeout=0.5)
+                except queue.Empty:
+                    if failed.is_set():
+                        return
+                    continue
+                if batch is done:
+                    return
+                yield from batch
+
+        def write(insert_query):
+            inicio = time.perf_counter()
+            try:
+                inserted = self.db_manager.execute_insert(
+                    insert_query, drain(), batch_size, bulk=bulk, label="inyeccion_pipeline"
+                )
+            except Exception as e:
+                logger.error(f"Error en escritor de la tubería: {e}")
+                failed.set()
+                return
+            seconds = time.perf_counter() - inicio
+            writer_stats.append({
+                "registros": inserted,
+                "segundos": round(seconds, 3),
+                "registros_por_segundo": round(inserted / seconds, 1) if seconds else 0.0,
+            })
+
+        columns, _, _ = self.comparator.comparison_columns()
+        threads = [
+            threading.Thread(target=write, args=(self.insert_query(columns),),
+                             name=f"inyeccion-{i}", daemon=True)
+            for i in range(writers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        inicio = time.perf_counter()
+        produced, waited, batch = 0, 0.0, []
+        try:
+            for tag, source, comparison in self.comparator.iter_diff(include_identical=True):
+                batch.append((source if source is not None else comparison) + (tag,))
+                if len(batch) >= batch_size:
+                    t0 = time.perf_counter()
+                    if not put(batch):
+                        break
+                    waited += time.perf_counter() - t0
+                    produced += len(batch)
+                    batch = []
+            if batch and put(batch):
+                produced += len(batch)
+        except Exception as e:
+            logger.error(f"Error en la comparación de la tubería: {e}")
+            failed.set()
+        finally:
+            producer_seconds = time.perf_counter() - inicio
+            for _ in threads:
+                put(done)
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - inicio
+        inserted = sum(stats["registros"] for stats in writer_stats)
+        self.last_pipeline_stats = {
+            "comparacion": {
+                "registros": produced,
+                "segundos": round(producer_seconds, 3),
+                "registros_por_segundo": (
+                    round(produced / producer_seconds, 1) if producer_seconds else 0.0
+                ),
+                "segundos_esperando_cola": round(waited, 3),
+            },
+            "escritores": writer_stats,
+            "registros": inserted,
+            "segundos": round(elapsed, 3),
+            "registros_por_segundo": round(inserted / elapsed, 1) if elapsed else 0.0,
+            "revertidas": 0,
+        }
+        if failed.is_set() or len(writer_stats) != len(threads):
+            logger.error("La inyección en tubería terminó con errores")
+            self.last_pipeline_stats["revertidas"] = self.revert_injection(
+                base_id, "inyeccion_pipeline_reversion"
             )
+            return False
+        logger.info(f"Inyección en tubería completada: {self.last_pipeline_stats}")
+        return True
+
+    def inject_staged(self, bulk=None) -> bool:
+        """
+        Carga tabla3 completa en una tabla de staging y la intercambia con la vigente
+        - {tabla3}_staging se crea sólo con la clave primaria y se carga con
+          WITH (TABLOCK) (carga mínimamente registrada en SQL Server)
+        - Los índices se construyen sobre staging, ya cargada
+        - sp_rename cambia {tabla3} por {tabla3}_old y staging por {tabla3} en
+          una sola transacción: los lectores ven la tabla anterior completa
+          hasta el commit y la nueva completa después
+        - Luego se borra {tabla3}_old y los índices recuperan sus nombres
+        Si algo falla antes del intercambio, la tabla vigente no se toca
+        El detalle queda en self.last_staged_stats
+        """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        result_table = self.config["result_table"]
+        schema, name = split_table_name(result_table)
+        staging_name, retired_name = f"{name}_staging", f"{name}_old"
+        staging = f"[{schema}].[{staging_name}]"
+        retired = f"[{schema}].[{retired_name}]"
+        engine = self.comparator.injection_engine()
+        inicio = time.perf_counter()
 
-            # Inyectar en lotes
+        try:
+            columns, key_index, _ = self.comparator.comparison_columns()
+            create, indexes = self.result_table_statements(staging, columns, key_index)
+            with self.db_manager.get_cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+                cursor.execute(f"DROP TABLE IF EXISTS {retired}")
+                cursor.execute(create)
+                cursor.commit()
+
+            # Carga sin índices secundarios; TABLOCK habilita el registro mínimo
+            columns, rows = self.injection_rows(engine)
             inserted = self.db_manager.execute_insert(
-                insert_query, injection_data, PROCESSING_CONFIG["batch_size"]
+                self.insert_query(columns, f"{staging} WITH (TABLOCK)"),
+                rows,
+                PROCESSING_CONFIG["batch_size"],
+                bulk=bulk,
+                label="inyeccion_staging",
+            )
+            cargada = time.perf_counter()
+
+            for _, statement in indexes:
+                self.db_manager.execute_non_query(statement, label="inyeccion_staging_indices")
+            indexada = time.perf_counter()
+
+            # Intercambio atómico: ambos renombres se confirman juntos
+            live_exists = self.db_manager.table_exists(result_table)
+            with self.db_manager.get_cursor() as cursor:
+                if live_exists:
+                    cursor.execute(f"EXEC sp_rename '{schema}.{name}', '{retired_name}'")
+                cursor.execute(f"EXEC sp_rename '{schema}.{staging_name}', '{name}'")
+                cursor.commit()
+            intercambiada = time.perf_counter()
+            self.db_manager.schema.invalidate(result_table)
+            self.db_manager.schema.invalidate(staging)
+
+            # Fuera de la transacción: la tabla anterior y los nombres de índices
+            self.db_manager.execute_non_query(f"DROP TABLE IF EXISTS {retired}")
+            for index, _ in indexes:
+                self.db_manager.execute_non_query(
+                    f"EXEC sp_rename '{schema}.{name}.{index}', "
+                    f"'{index.replace(staging_name, name, 1)}', 'INDEX'"
+                )
+
+            elapsed = time.perf_counter() - inicio
+            self.last_staged_stats = {
+                "registros": inserted,
+                "carga_segundos": round(cargada - inicio, 3),
+                "indices_segundos": round(indexada - cargada, 3),
+                "intercambio_segundos": round(intercambiada - indexada, 3),
+                "segundos": round(elapsed, 3),
+            }
+            logger.info(f"Inyección con staging completada: {self.last_staged_stats}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error durante inyección con staging: {e}")
+            return False
+
+    def ensure_row_hash(self):
+        """Agrega [ROW_HASH] a una tabla3 creada antes de la inyección diferencial"""
+        result_table = self.config["result_table"]
+        columns = {col.lower() for col in self.comparator.get_table_columns(result_table)}
+        if "row_hash" not in columns:
+            logger.info(f"Agregando columna ROW_HASH a {result_table}")
+            self.db_manager.execute_non_query(
+                f"ALTER TABLE {result_table} ADD [ROW_HASH] BIGINT NULL"
             )
+            self.db_manager.schema.invalidate(result_table)
+
+    def inject_differential(self, bulk=None) -> bool:
+        """
+        Actualiza tabla3 escribiendo sólo lo que cambió desde la última inyección
+        - Cada fila de tabla3 guarda [ROW_HASH], huella de sus valores + TIPO_COMPARACION
+        - Se leen de tabla3 sólo la clave y ROW_HASH, y se comparan con las
+          huellas del resultado nuevo
+        - Las filas nuevas o con otra huella (ACCION = 'U') y las claves que ya
+          no aparecen (ACCION = 'D') se cargan en {tabla3}_delta
+        - Un único MERGE aplica inserciones, actualizaciones y borrados
+        Las filas sin ROW_HASH (cargadas con inject_data) cuentan como
+        cambiadas y se reescriben una vez. Requiere claves únicas en tabla3;
+        una clave NULL coincide con NULL (ver TableComparator.key_condition)
+        El detalle queda en self.last_differential_stats
+        """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        result_table = self.config["result_table"]
+        # Sin las COINCIDENTE en el resultado se borrarían de tabla3
+        engine = self.comparator.injection_engine()
+        inicio = time.perf_counter()
+
+        try:
+            if not self.prepare_result_table():
+                logger.error("No se pudo preparar tabla de resultados")
+                return False
+            self.ensure_row_hash()
 
-            logger.info(f"Inyección completada: {inserted} registros insertados")
+            columns, injection_rows = self.injection_rows(engine)
+            columns = list(columns)
+            _, key_index, _ = self.comparator.comparison_columns()
+            key_columns = [columns[i] for i in key_index]
+            key_of = getter(key_index)
+
+            # Estado actual de tabla3: clave -> huella
+            keys_str = ", ".join(f"[{col}]" for col in key_columns)
+            stored_key = getter(range(len(key_columns)))
+            current = {
+                stored_key(row): row[-1]
+                for row in self.db_manager.iter_query(
+                    f"SELECT {keys_str}, [ROW_HASH] FROM {result_table}",
+                    label="inyeccion_diferencial_huellas",
+                )
+            }
+            missing, seen = object(), object()
+            counts = {"insertadas": 0, "actualizadas": 0, "sin_cambios": 0, "borradas": 0}
+
+            def delta_rows():
+                for row in injection_rows:
+                    key = key_of(row)
+                    previous = current.get(key, missing)
+                    if previous is seen:
+                        raise ValueError(f"Clave duplicada en el resultado: {key}")
+                    current[key] = seen
+                    digest = row_hash(row)
+                    if previous is missing:
+                        counts["insertadas"] += 1
+                    elif previous == digest:
+                        counts["sin_cambios"] += 1
+                        continue
+                    else:
+                        counts["actualizadas"] += 1
+                    yield row + (digest, "U")
+                # Claves que ya no están en el resultado
+                width = len(columns) + 1
+                for key, previous in current.items():
+                    if previous is seen:
+                        continue
+                    values = [None] * width
+                    for i, value in zip(key_index, key if len(key_index) > 1 else (key,)):
+                        values[i] = value
+                    counts["borradas"] += 1
+                    yield tuple(values) + (None, "D")
+
+            schema, name = split_table_name(result_table)
+            delta_table = f"[{schema}].[{name}_delta]"
+            types = self.result_column_types(columns)
+            columns_def = ", ".join(f"[{col}] {types[col]} NULL" for col in columns)
+            with self.db_manager.get_cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {delta_table}")
+                cursor.execute(
+                    f"CREATE TABLE {delta_table} ({columns_def}, "
+                    f"[TIPO_COMPARACION] VARCHAR(20) NULL, [ROW_HASH] BIGINT NULL, "
+                    f"[ACCION] CHAR(1) NOT NULL)"
+                )
+                cursor.commit()
+
+            all_columns = columns + ["TIPO_COMPARACION", "ROW_HASH", "ACCION"]
+            delta = self.db_manager.execute_insert(
+                f"INSERT INTO {delta_table} ({', '.join(f'[{col}]' for col in all_columns)}) "
+                f"VALUES ({', '.join('?' for _ in all_columns)})",
+                delta_rows(), PROCESSING_CONFIG["batch_size"], bulk=bulk,
+                label="inyeccion_diferencial_delta",
+            )
+
+            written = 0
+            if delta:
+                # Sólo columnas admitidas como clave de índice, como en result_table_statements
+                indexed = [col for col in key_columns if indexable_type(types[col])]
+                if delta > 1 and indexed:
+                    self.db_manager.execute_non_query(
+                        f"CREATE NONCLUSTERED INDEX [ix_{name}_delta_clave] "
+                        f"ON {delta_table} ({', '.join(f'[{col}]' for col in indexed)})"
+                    )
+                elif delta > 1:
+                    logger.warning(
+                        f"Clave de {delta_table} con columnas no indexables ((MAX), TEXT, "
+                        f"XML...): se crea sin índice por clave"
+                    )
+                # Una clave NULL debe encontrar su fila: con T.k = S.k se
+                # insertaría de nuevo en cada corrida y nunca se borraría
+                on = self.comparator.key_condition(columns, key_index, "T", "S")
+                target_columns = columns + ["TIPO_COMPARACION", "ROW_HASH"]
+                updates = ", ".join(
+                    f"T.[{col}] = S.[{col}]" for col in target_columns if col not in key_columns
+                )
+                written = self.db_manager.execute_non_query(
+                    f"MERGE {result_table} AS T "
+                    f"USING {delta_table} AS S "
+                    f"ON ({on}) "
+                    f"WHEN MATCHED AND S.[ACCION] = 'D' THEN DELETE "
+                    f"WHEN MATCHED THEN UPDATE SET {updates} "
+                    f"WHEN NOT MATCHED BY TARGET AND S.[ACCION] = 'U' THEN "
+                    f"INSERT ({', '.join(f'[{col}]' for col in target_columns)}) "
+                    f"VALUES ({', '.join(f'S.[{col}]' for col in target_columns)});",
+                    label="inyeccion_diferencial_merge",
+                )
+            self.db_manager.execute_non_query(f"DROP TABLE IF EXISTS {delta_table}")
+
+            elapsed = time.perf_counter() - inicio
+            self.last_differential_stats = dict(
+                counts, filas_escritas=written, segundos=round(elapsed, 3)
+            )
+            logger.info(f"Inyección diferencial completada: {self.last_differential_stats}")
             return True
 
         except Exception as e:
-            logger.error(f"Error durante inyección: {e}")
+            logger.error(f"Error durante inyección diferencial: {e}")
+            return False
+
+    def inject_sharded(self, writers: int = None, bulk=None) -> bool:
+        """
+        Inserta en tabla3 con varias conexiones en paralelo
+        - Las filas del resultado se reparten en `writers` rangos de clave
+          contiguos y disjuntos (cada escritor inserta su rango ordenado);
+          el reparto retiene todas las filas, también con el motor "external"
+        - Cada escritor es un hilo con su propia conexión del pool y confirma
+          cada bulk_commit_interval registros (modo bulk) o cada lote
+        - Si un escritor falla, los demás se detienen al terminar su lote en
+          curso y se borran de tabla3 todas las filas de esta corrida
+          (ID mayor al máximo previo): tabla3 queda como estaba
+        writers: PROCESSING_CONFIG["injection_writers"], acotado por pool_max_size
+        El rendimiento y estado de cada escritor queda en self.last_sharded_stats
+        """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        writers = writers or PROCESSING_CONFIG.get("injection_writers", 1)
+        writers = max(1, min(writers, PROCESSING_CONFIG.get("pool_max_size", 10)))
+        batch_size = PROCESSING_CONFIG["batch_size"]
+        result_table = self.config["result_table"]
+        engine = self.comparator.injection_engine()
+
+        try:
+            if not self.prepare_result_table():
+                logger.error("No se pudo preparar tabla de resultados")
+                return False
+
+            columns, rows = self.injection_rows(engine)
+            _, key_index, _ = self.comparator.comparison_columns()
+            shards = key_range_shards(rows, key_index, writers)
+            base_id = self.last_result_id()
+        except Exception as e:
+            logger.error(f"Error preparando la inyección en paralelo: {e}")
+            return False
+
+        insert_query = self.insert_query(columns)
+        key_of = getter(key_index)
+        failed = threading.Event()
+        writer_stats = [None] * len(shards)
+
+        def rows_until_failure(shard):
+            # Se corta entre lotes si otro escritor falló
+            for start in range(0, len(shard), batch_size):
+                if failed.is_set():
+                    return
+                yield from shard[start:start + batch_size]
+
+        def write(number, shard):
+            stats = {
+                "escritor": number,
+                "rango": (key_of(shard[0]), key_of(shard[-1])),
+                "filas_asignadas": len(shard),
+            }
+            writer_stats[number] = stats
+            inicio = time.perf_counter()
+            try:
+                inserted = self.db_manager.execute_insert(
+                    insert_query, rows_until_failure(shard), batch_size, bulk=bulk,
+                    label="inyeccion_paralela",
+                )
+                stats["estado"] = "ok" if inserted == len(shard) else "cancelado"
+            except Exception as e:
+                logger.error(f"Error en escritor {number}: {e}")
+                failed.set()
+                inserted = 0
+                stats["estado"] = "error"
+                stats["error"] = str(e)
+            seconds = time.perf_counter() - inicio
+            stats.update({
+                "registros": inserted,
+                "segundos": round(seconds, 3),
+                "registros_por_segundo": round(inserted / seconds, 1) if seconds else 0.0,
+            })
+
+        inicio = time.perf_counter()
+        threads = [
+            threading.Thread(target=write, args=(number, shard),
+                             name=f"inyeccion-paralela-{number}", daemon=True)
+            for number, shard in enumerate(shards)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - inicio
+
+        inserted = sum(stats["registros"] for stats in writer_stats)
+        self.last_sharded_stats = {
+            "escritores": writer_stats,
+            "registros": inserted,
+            "segundos": round(elapsed, 3),
+            "registros_por_segundo": round(inserted / elapsed, 1) if elapsed else 0.0,
+            "revertidas": 0,
+        }
+        if not failed.is_set():
+            logger.info(
+                f"Inyección en paralelo completada: {inserted} registros con "
+                f"{len(shards)} escritores ({self.last_sharded_stats['registros_por_segundo']} "
+                f"registros/s)"
+            )
+            return True
+
+        self.last_sharded_stats["revertidas"] = self.revert_injection(
+            base_id, "inyeccion_paralela_reversion"
+        )
+        return False
+
+    def last_result_id(self) -> int:
+        """Máximo ID de tabla3 antes de una carga (0 si está vacía)"""
+        return self.db_manager.execute_query(
+            f"SELECT MAX(ID) FROM {self.config['result_table']}"
+        )[0][0] or 0
+
+    def revert_injection(self, base_id: int, label: str) -> int:
+        """
+        Borra de tabla3 las filas de una carga fallida (ID mayor a base_id),
+        confirmadas por escritores que sí terminaron sus lotes
+        Retorna las filas borradas (0 si no se pudo revertir)
+        """
+        try:
+            deleted = self.db_manager.execute_non_query(
+                f"DELETE FROM {self.config['result_table']} WHERE ID > ?", (base_id,),
+                label=label,
+            )
+            logger.error(f"Inyección fallida: se revirtieron {deleted} registros")
+            return deleted
+        except Exception as e:
+            logger.error(f"Inyección fallida y sin revertir (ID > {base_id}): {e}")
+            return 0
+
+    def inject_incremental(self, full: bool = False, bulk=None) -> bool:
+        """
+        Actualiza tabla3 sólo con las claves que cambiaron desde la última corrida
+        Usa las marcas de agua de TABLES_CONFIG["watermark_column"]. Hace una
+        reconciliación completa si full=True, si no hay marcas guardadas o si
+        tabla3 no existe: vaciar tabla3 + inject_data (con
+        PROCESSING_CONFIG["differential_injection"] o ["staged_injection"]
+        tabla3 no se vacía)
+        En modo incremental borra de tabla3 las filas de las claves cambiadas y
+        vuelve a insertarlas con su nuevo resultado; las marcas se guardan al
+        final, así que una corrida fallida se repite completa la próxima vez
+        """
+        if bulk is None:
+            bulk = PROCESSING_CONFIG.get("bulk_insert", False)
+        result_table = self.config["result_table"]
+
+        try:
+            columns_by_table = self.comparator.watermark_columns()
+            store = WatermarkStore(self.db_manager)
+            since = {
+                table: store.get(table, column) for table, column in columns_by_table.items()
+            }
+
+            if full or None in since.values() or not self.db_manager.table_exists(result_table):
+                logger.info("Reconciliación completa de tabla3")
+                self.comparator.injection_engine()
+                # Marca tomada antes de leer: lo que cambie durante la corrida
+                # se vuelve a procesar en la próxima
+                marks = self.comparator.current_watermarks()
+                # Los modos diferencial y staging no vacían tabla3: los lectores
+                # nunca la ven vacía ni a medio cargar
+                keeps_table = (
+                    PROCESSING_CONFIG.get("differential_injection", False)
+                    or PROCESSING_CONFIG.get("staged_injection", False)
+                )
+                if not ((keeps_table or self.clear_result_table())
+                        and self.inject_data(bulk=bulk)):
+                    return False
+            else:
+                result, keys, marks = self.comparator.compare_changes(since)
+                if keys:
+                    key_columns = self.config["key_columns"]
+                    deleted = sum(
+                        self.db_manager.execute_non_query(
+                            f"DELETE FROM {result_table} WHERE {condition}", params,
+                            label="inyeccion_incremental_borrado",
+                        )
+                        for condition, params in self.comparator.key_batches(key_columns, keys)
+                    )
+                    inserted = self.db_manager.execute_insert(
+                        self.insert_query(result.columns),
+                        self.comparator.iter_injection_rows(result),
+                        PROCESSING_CONFIG["batch_size"],
+                        bulk=bulk,
+                    )
+                    logger.info(
+                        f"Inyección incremental: {len(keys)} claves, {deleted} filas "
+                        f"reemplazadas por {inserted}"
+                    )
+                else:
+                    logger.info("Inyección incremental: sin cambios")
+
+            for table, column in columns_by_table.items():
+                store.set(table, column, marks[table])
+            return True
+
+        except Exception as e:
+            logger.error(f"Error durante inyección incremental: {e}")
             return False
 
     def clear_result_table(self) -> bool:
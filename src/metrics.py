@@ -0,0 +1,127 @@
+"""
+Métricas por consulta
+Histogramas en memoria (p50/p95/p99) de los tiempos de cada llamada a la BD
+Pensado para quedar activo en producción: registrar cuesta un bisect y un lock
+"""
+
+import bisect
+import re
+import threading
+from functools import lru_cache
+from typing import Dict
+from config.credentials import PROCESSING_CONFIG
+
+# Límites superiores de los buckets en segundos: de 0.1 ms a ~100 s, factor 2^(1/4)
+_BOUNDS = tuple(0.0001 * 2 ** (i / 4) for i in range(81))
+
+_TARGET_RE = re.compile(
+    r"^\s*(MERGE|INSERT|DELETE|TRUNCATE)\s+(?:INTO\s+|FROM\s+|TABLE\s+)?([\[\]\w.]+)",
+    re.IGNORECASE,
+)
+_FROM_RE = re.compile(r"^\s*(\w+).*?\bFROM\s+([\[\]\w.]+)", re.IGNORECASE | re.DOTALL)
+
+
+class Histogram:
+    """Histograma de latencias con buckets logarítmicos fijos"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Cota superior del bucket que contiene el percentil q (0-1)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acumulado = 0
+        for i, n in enumerate(self.counts):
+            acumulado += n
+            if acumulado >= target:
+                return min(_BOUNDS[i], self.max) if i < len(_BOUNDS) else self.max
+        return self.max
+
+    def summary_ms(self) -> Dict[str, float]:
+        return {
+            "p50": round(self.percentile(0.50) * 1000, 2),
+            "p95": round(self.percentile(0.95) * 1000, 2),
+            "p99": round(self.percentile(0.99) * 1000, 2),
+            "max": round(self.max * 1000, 2),
+            "total": round(self.total * 1000, 2),
+        }
+
+
+class QueryMetrics:
+    """Registro de tiempos y filas por etiqueta de consulta"""
+
+    PHASES = ("adquirir", "ejecutar", "leer")
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def record(self, label: str, acquire: float, execute: float,
+               fetch: float, rows: int):
+        """Registra una llamada (tiempos en segundos)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._labels.get(label)
+            if entry is None:
+                entry = self._labels[label] = {
+                    "llamadas": 0,
+                    "filas": 0,
+                    **{phase: Histogram() for phase in self.PHASES},
+                }
+            entry["llamadas"] += 1
+            entry["filas"] += rows if rows and rows > 0 else 0
+            entry["adquirir"].add(acquire)
+            entry["ejecutar"].add(execute)
+            entry["leer"].add(fetch)
+
+    def report(self) -> Dict[str, Dict]:
+        """Percentiles en milisegundos por etiqueta, ordenado por tiempo total"""
+        with self._lock:
+            report = {
+                label: {
+                    "llamadas": entry["llamadas"],
+                    "filas": entry["filas"],
+                    **{f"{phase}_ms": entry[phase].summary_ms() for phase in self.PHASES},
+                }
+                for label, entry in self._labels.items()
+            }
+        return dict(
+            sorted(
+                report.items(),
+                key=lambda item: -(item[1]["ejecutar_ms"]["total"] + item[1]["leer_ms"]["total"]),
+            )
+        )
+
+    def reset(self):
+        with self._lock:
+            self._labels.clear()
+
+
+@lru_cache(maxsize=512)
+def label_for(query: str) -> str:
+    """Etiqueta por defecto: verbo SQL + primera tabla (p.ej. 'SELECT homeb2c_tck')"""
+    match = _TARGET_RE.match(query) or _FROM_RE.match(query)
+    if not match:
+        return query.strip().split(None, 1)[0].upper() if query.strip() else "?"
+    table = match.group(2).replace("[", "").replace("]", "").split(".")[-1]
+    return f"{match.group(1).upper()} {table}"
+
+
+# Registro compartido por todas las instancias de DatabaseManager
+QUERY_METRICS = QueryMetrics(PROCESSING_CONFIG.get("query_metrics", True))
@@ -5,12 +5,20 @@ Evita re-procesar datos ya comparados usando checksums
 
 import hashlib
 import json
+import os
+import re
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Any, Optional
 import logging
 
+from config.credentials import PROCESSING_CONFIG
+
 logger = logging.getLogger(__name__)
 
+# Niveles del índice de checksums: 64 rangos x 64 subrangos por hash de la clave
+RANGOS = 64
+SUBRANGOS = 64 * RANGOS
+
 
 class SyncCache:
     """
@@ -138,6 +146,83 @@ class SyncCache:
             logger.warning(f"Error limpiando caché: {e}")
 
 
+class IndiceChecksum:
+    """
+    Índice jerárquico de checksums por nodo/tabla, guardado en disco local
+    - Nivel 1: CHECKSUM_AGG por rango (hash de la clave & 4095) / 64
+    - Nivel 2: CHECKSUM_AGG por subrango (hash de la clave & 4095)
+    - Nivel 3: las filas de los subrangos que cambiaron
+    Sólo se consultan los subrangos de los rangos que cambiaron
+    """
+
+    def __init__(self, db_manager, directorio: str = None):
+        self.db_manager = db_manager
+        self.directorio = directorio or PROCESSING_CONFIG.get("checksum_index_dir", "cache")
+
+    @staticmethod
+    def expresion_subrango(columna: str) -> str:
+        """Subrango de la clave; CHECKSUM & 4095 evita el desborde de ABS()"""
+        return f"(CHECKSUM({columna}) & {SUBRANGOS - 1})"
+
+    def ruta(self, nodo: str, tabla: str) -> str:
+        nombre = re.sub(r"[^\w.-]", "_", f"{tabla}__{nodo}")
+        return os.path.join(self.directorio, f"checksums_{nombre}.json")
+
+    def cargar(self, nodo: str, tabla: str) -> Optional[Dict]:
+        """Índice de la ejecución anterior (None si no existe o está dañado)"""
+        try:
+            with open(self.ruta(nodo, tabla), encoding="utf-8") as f:
+                datos = json.load(f)
+            return {
+                "rangos": {int(k): v for k, v in datos["rangos"].items()},
+                "subrangos": {int(k): v for k, v in datos["subrangos"].items()},
+            }
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, OSError) as e:
+            logger.warning(f"Índice de checksums ilegible para {nodo}/{tabla}: {e}")
+            return None
+
+    def guardar(self, nodo: str, tabla: str, indice: Dict):
+        """Escritura atómica (archivo temporal + reemplazo)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(nodo, tabla)
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(indice, f)
+        os.replace(ruta + ".tmp", ruta)
+
+    def _agrupar(self, nodo: str, tabla: str, grupo: str, filtro: str = "") -> Dict[int, list]:
+        """[CHECKSUM_AGG(BINARY_CHECKSUM(*)), filas] por grupo en una sola consulta"""
+        query = f"""
+            SELECT {grupo} AS grupo, CHECKSUM_AGG(BINARY_CHECKSUM(*)), COUNT(*)
+            FROM [tigostar].[{tabla}]
+            WHERE Nodo = ? {filtro}
+            GROUP BY {grupo}
+        """
+        filas = self.db_manager.execute_query(query, (nodo,))
+        return {int(g): [checksum, cantidad] for g, checksum, cantidad in filas}
+
+    def checksums_rangos(self, nodo: str, tabla: str, clave: str) -> Dict[int, list]:
+        """Nivel 1: un checksum por rango"""
+        return self._agrupar(nodo, tabla, f"{self.expresion_subrango(f'[{clave}]')} / {RANGOS}")
+
+    def checksums_subrangos(self, nodo: str, tabla: str, clave: str,
+                            rangos: Optional[List[int]] = None) -> Dict[int, list]:
+        """Nivel 2: un checksum por subrango de `rangos` (todos si es None)"""
+        subrango = self.expresion_subrango(f"[{clave}]")
+        filtro = ""
+        if rangos is not None:
+            if not rangos:
+                return {}
+            filtro = f"AND {subrango} / {RANGOS} IN ({', '.join(str(int(r)) for r in rangos)})"
+        return self._agrupar(nodo, tabla, subrango, filtro)
+
+    @staticmethod
+    def distintos(anterior: Dict[int, Any], actual: Dict[int, Any]) -> List[int]:
+        """Grupos nuevos, borrados o con checksum distinto"""
+        return sorted(g for g in set(anterior) | set(actual) if anterior.get(g) != actual.get(g))
+
+
 class ComparadorOptimizado:
     """
     Comparador de tablas OPTIMIZADO con:
@@ -146,9 +231,10 @@ class ComparadorOptimizado:
     - Batch processing inteligente
     """
     
-    def __init__(self, db_manager, cache_manager):
+    def __init__(self, db_manager, cache_manager, indice: IndiceChecksum = None):
         self.db_manager = db_manager
         self.cache = cache_manager
+        self.indice = indice or IndiceChecksum(db_manager)
     
     def necesita_reprocesar(self, nodo: str, tabla_origen: str, 
                            checksum_actual: str) -> Tuple[bool, str]:
@@ -184,21 +270,23 @@ class ComparadorOptimizado:
         
         return ""
     
-    def comparar_optimizado(self, nodo: str, tabla_a: str, tabla_b: str) -> Dict[str, Any]:
+    def comparar_optimizado(self, nodo: str, tabla_a: str, tabla_b: str,
+                            clave_a: str = "Ticket", clave_b: str = "Incident") -> Dict[str, Any]:
         """
         Comparación INTELIGENTE y RÁPIDA
-        1. Calcula checksums
+        1. Calcula checksums por rango de clave de ambas tablas
         2. Si no cambió, retorna desde caché
-        3. Si cambió, procesa sólo lo necesario
+        3. Si cambió, baja sólo a los subrangos de los rangos distintos y
+           trae únicamente las filas de los subrangos distintos
         """
         logger.info(f"Iniciando comparación optimizada: {nodo}")
-        
-        # Paso 1: Calcular checksums RÁPIDOS
-        checksum_a = self.obtener_checksum_tabla(nodo, tabla_a)
-        checksum_b = self.obtener_checksum_tabla(nodo, tabla_b)
-        checksum_combinado = hashlib.sha256(
-            f"{checksum_a}_{checksum_b}".encode()
-        ).hexdigest()
+        tablas = ((tabla_a, clave_a), (tabla_b, clave_b))
+
+        # Paso 1: Checksums de nivel 1 (una consulta agrupada por tabla)
+        rangos = {tabla: self.indice.checksums_rangos(nodo, tabla, clave) for tabla, clave in tablas}
+        checksum_combinado = hashlib.sha256(json.dumps(
+            [sorted(rangos[tabla_a].items()), sorted(rangos[tabla_b].items())], default=str
+        ).encode()).hexdigest()
         
         # Paso 2: Verificar si necesita reprocesar
         necesita_reprocesar, razon = self.necesita_reprocesar(
@@ -217,36 +305,91 @@ class ComparadorOptimizado:
                 'nodo': nodo
             }
         
-        # Paso 3: Si necesita reprocesar, procesar cambios (JOIN por Ticket = Incident)
         logger.info(f"⚠ Reprocesando {nodo} - Cambios detectados")
         
-        query = f"""
-            SELECT A.*, B.*
-            FROM [tigostar].[{tabla_a}] A
-            FULL OUTER JOIN [tigostar].[{tabla_b}] B
-                ON A.Ticket = B.Incident
-            WHERE 
-                (A.Nodo = ?)
-                OR 
-                (B.Nodo = ?)
-        """
-        
         try:
-            result = self.db_manager.execute_query(query, (nodo, nodo))
+            # Paso 3: Bajar a los subrangos sólo en los rangos distintos
+            indices, subrangos_distintos, rangos_distintos = {}, {}, 0
+            for tabla, clave in tablas:
+                anterior = self.indice.cargar(nodo, tabla)
+                if anterior is None:
+                    subrangos = self.indice.checksums_subrangos(nodo, tabla, clave)
+                    subrangos_distintos[tabla] = None
+                    rangos_distintos += len(rangos[tabla])
+                else:
+                    distintos = set(self.indice.distintos(anterior["rangos"], rangos[tabla]))
+                    actuales = self.indice.checksums_subrangos(nodo, tabla, clave, sorted(distintos))
+                    previos = {g: v for g, v in anterior["subrangos"].items()
+                               if g // RANGOS in distintos}
+                    subrangos = {g: v for g, v in anterior["subrangos"].items()
+                                 if g // RANGOS not in distintos}
+                    subrangos.update(actuales)
+                    subrangos_distintos[tabla] = self.indice.distintos(previos, actuales)
+                    rangos_distintos += len(distintos)
+                indices[tabla] = {"rangos": rangos[tabla], "subrangos": subrangos}
+
+            # Paso 4: Traer sólo las filas de los subrangos distintos (JOIN por Ticket = Incident)
+            registros = self.contar_filas_subrangos(
+                nodo, tabla_a, tabla_b, clave_a, clave_b,
+                subrangos_distintos[tabla_a], subrangos_distintos[tabla_b]
+            )
             
-            # Actualizar caché: guardamos checksum combinado y cantidad de filas procesadas
-            self.cache.actualizar_cache(nodo, tabla_a, checksum_combinado, len(result) if result else 0)
+            # Actualizar caché: checksum combinado e índice local para la próxima ejecución
+            self.cache.actualizar_cache(nodo, tabla_a, checksum_combinado, registros)
+            for tabla, indice in indices.items():
+                self.indice.guardar(nodo, tabla, indice)
             
             return {
                 'success': True,
                 'desde_cache': False,
-                'registros_procesados': len(result) if result else 0,
+                'registros_procesados': registros,
+                'rangos_modificados': rangos_distintos,
+                'subrangos_modificados': sum(
+                    len(indices[t]["subrangos"]) if d is None else len(d)
+                    for t, d in subrangos_distintos.items()
+                ),
                 'razon': razon,
                 'nodo': nodo
             }
         except Exception as e:
             logger.error(f"Error en comparación optimizada: {e}")
             return {'success': False, 'error': str(e)}
+
+    def contar_filas_subrangos(self, nodo: str, tabla_a: str, tabla_b: str,
+                               clave_a: str, clave_b: str,
+                               subrangos_a: Optional[List[int]],
+                               subrangos_b: Optional[List[int]]) -> int:
+        """
+        Recorre el JOIN de ambas tablas limitado a los subrangos indicados
+        None en cualquiera de los lados = sin índice previo, se recorre el nodo completo
+        """
+        filtro = ""
+        if subrangos_a is not None and subrangos_b is not None:
+            condiciones = [
+                f"{self.indice.expresion_subrango(columna)} IN ({', '.join(str(int(g)) for g in grupos)})"
+                for columna, grupos in ((f"A.[{clave_a}]", subrangos_a), (f"B.[{clave_b}]", subrangos_b))
+                if grupos
+            ]
+            if not condiciones:
+                return 0
+            filtro = f"AND ({' OR '.join(condiciones)})"
+
+        query = f"""
+            SELECT A.*, B.*
+            FROM [tigostar].[{tabla_a}] A
+            FULL OUTER JOIN [tigostar].[{tabla_b}] B
+                ON A.[{clave_a}] = B.[{clave_b}]
+            WHERE 
+                ((A.Nodo = ?)
+                OR 
+                (B.Nodo = ?))
+                {filtro}
+        """
+        # Se recorre por bloques: sólo interesa la cantidad, no retener el JOIN completo
+        return sum(
+            len(bloque)
+            for bloque in self.db_manager.iter_query(query, (nodo, nodo), chunks=True)
+        )
     
     def comparar_por_lotes(self, nodo: str, tabla_a: str, tabla_b: str,
                           batch_size: int = 1000) -> List[Dict]:
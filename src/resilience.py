@@ -0,0 +1,175 @@
+"""
+Resiliencia ante caídas de SQL Server
+Circuit breaker para fallar rápido y reintentos con backoff y jitter
+"""
+
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE de errores de comunicación / conexión con el servidor
+CONNECTION_SQLSTATES = {"08001", "08003", "08004", "08007", "08S01", "HYT00", "HYT01"}
+
+# Errores en los que reintentar es seguro: caídas de conexión y víctima de
+# deadlock (SQL Server 1205 -> 40001, la sentencia ya fue revertida)
+TRANSIENT_SQLSTATES = CONNECTION_SQLSTATES | {"40001"}
+
+# Al reintentar una lectura completa: enlace caído en una conexión del pool o
+# deadlock. Los fallos al conectar ya se reintentaron al abrir la conexión
+READ_RETRY_SQLSTATES = {"08S01", "40001"}
+
+# Al abrir una conexión: servidor inalcanzable (08001) o timeout de login
+# (HYT00/HYT01) ya esperaron el connect_timeout completo; reintentarlos
+# multiplicaría lo que cuesta cada llamada durante una caída
+CONNECT_TIMEOUT_SQLSTATES = {"08001", "HYT00", "HYT01"}
+
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la base de datos se considera caída"""
+
+
+def sqlstate(exc: Exception) -> str:
+    """SQLSTATE de un error de pyodbc (primer argumento), o cadena vacía"""
+    if exc.args and isinstance(exc.args[0], str) and len(exc.args[0]) == 5:
+        return exc.args[0]
+    return ""
+
+
+def is_connection_failure(exc: Exception) -> bool:
+    return sqlstate(exc) in CONNECTION_SQLSTATES
+
+
+def is_transient(exc: Exception) -> bool:
+    return sqlstate(exc) in TRANSIENT_SQLSTATES
+
+
+def is_retryable_read(exc: Exception) -> bool:
+    return sqlstate(exc) in READ_RETRY_SQLSTATES
+
+
+def is_retryable_connect(exc: Exception) -> bool:
+    state = sqlstate(exc)
+    return state in TRANSIENT_SQLSTATES and state not in CONNECT_TIMEOUT_SQLSTATES
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados
+    - CERRADO: las llamadas pasan; `failure_threshold` fallos seguidos lo abren
+    - ABIERTO: las llamadas fallan al instante durante `open_interval` segundos
+    - SEMIABIERTO: se dejan pasar `half_open_probes` llamadas de prueba;
+      un éxito lo cierra y un fallo lo vuelve a abrir
+    """
+
+    CLOSED = "CERRADO"
+    OPEN = "ABIERTO"
+    HALF_OPEN = "SEMIABIERTO"
+
+    def __init__(self, failure_threshold=5, open_interval=30.0, half_open_probes=1,
+                 name="db"):
+        self.failure_threshold = failure_threshold
+        self.open_interval = open_interval
+        self.half_open_probes = half_open_probes
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def before_call(self):
+        """Lanza CircuitOpenError si la llamada no debe intentarse"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self._rejected += 1
+            remaining = max(0.0, self.open_interval - (time.monotonic() - self._opened_at))
+        raise CircuitOpenError(
+            f"Circuito '{self.name}' abierto: base de datos no disponible "
+            f"(reintento en {remaining:.1f}s)"
+        )
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuito '{self.name}' cerrado: base de datos disponible")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.error(
+                        f"Circuito '{self.name}' abierto tras {self._failures} fallos; "
+                        f"fallo rápido durante {self.open_interval}s"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+    def release(self):
+        """Libera una llamada sin veredicto (p.ej. timeout del pool)"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._maybe_half_open()
+            return {
+                "estado": self._state,
+                "fallos_consecutivos": self._failures,
+                "rechazadas": self._rejected,
+            }
+
+    def _maybe_half_open(self):
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.open_interval
+        ):
+            self._state = self.HALF_OPEN
+            self._probes = 0
+
+
+def retry_call(func, should_retry=is_transient, attempts=3, base_delay=0.2,
+               max_delay=2.0):
+    """
+    Ejecuta func() reintentando los errores transitorios
+    Espera con backoff exponencial y jitter completo entre intentos
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if attempt >= attempts or not should_retry(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            logger.warning(
+                f"Error transitorio ({sqlstate(e) or type(e).__name__}), "
+                f"reintento {attempt}/{attempts - 1} en {delay:.2f}s"
+            )
+            time.sleep(delay)
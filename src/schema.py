@@ -0,0 +1,194 @@
+"""
+Caché de metadatos de esquema
+Columnas, posiciones y tipos de INFORMATION_SCHEMA con TTL e invalidación
+explícita, cargando todas las tablas pedidas en una sola consulta
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnInfo(NamedTuple):
+    """Metadatos de una columna según INFORMATION_SCHEMA.COLUMNS"""
+    name: str
+    ordinal: int
+    data_type: str
+    max_length: Optional[int] = None
+    precision: Optional[int] = None
+    scale: Optional[int] = None
+    nullable: bool = True
+
+
+# Tipos con largo / precisión en la definición de columna
+SIZED_TYPES = {"char", "varchar", "nchar", "nvarchar", "binary", "varbinary"}
+DECIMAL_TYPES = {"decimal", "numeric"}
+# Tipos que no pueden ser columna clave de un índice
+NON_INDEXABLE_TYPES = {"TEXT", "NTEXT", "IMAGE", "XML"}
+
+
+def sql_type(column: Optional[ColumnInfo]) -> str:
+    """
+    Definición de tipo para CREATE TABLE a partir de INFORMATION_SCHEMA
+    Largo -1 o desconocido = (MAX); rowversion no admite INSERT y pasa a BINARY(8)
+    """
+    if column is None or not column.data_type:
+        return "NVARCHAR(MAX)"
+    data_type = column.data_type.lower()
+    if data_type in SIZED_TYPES:
+        size = column.max_length
+        return f"{data_type.upper()}({'MAX' if not size or size < 0 else size})"
+    if data_type in DECIMAL_TYPES and column.precision:
+        return f"{data_type.upper()}({column.precision}, {column.scale or 0})"
+    if data_type in ("timestamp", "rowversion"):
+        return "BINARY(8)"
+    return data_type.upper()
+
+
+def common_sql_type(source: Optional[ColumnInfo], comparison: Optional[ColumnInfo]) -> str:
+    """
+    Tipo de columna que admite los valores de ambas tablas
+    - Mismo tipo con distinto largo: el mayor ((MAX) si alguno lo es)
+    - Tipos distintos (p.ej. INT vs NVARCHAR): NVARCHAR(MAX), como la
+      tabla3 sin tipos
+    """
+    source_type = sql_type(source)
+    if comparison is None:
+        return source_type
+    comparison_type = sql_type(comparison)
+    if source_type == comparison_type:
+        return source_type
+    if (source is not None and source.data_type and comparison.data_type
+            and source.data_type.lower() == comparison.data_type.lower()
+            and source.data_type.lower() in SIZED_TYPES):
+        sizes = [source.max_length, comparison.max_length]
+        size = None if any(not size or size < 0 for size in sizes) else max(sizes)
+        return sql_type(source._replace(max_length=size))
+    return "NVARCHAR(MAX)"
+
+
+def indexable_type(definition: str) -> bool:
+    """SQL Server no admite (MAX), TEXT, NTEXT, IMAGE ni XML como clave de índice"""
+    definition = definition.upper()
+    return "(MAX)" not in definition and definition not in NON_INDEXABLE_TYPES
+
+
+def null_safe_equals(left: str, right: str, nullable: bool = True,
+                     equals: str = None) -> str:
+    """
+    Igualdad SQL de dos columnas clave donde NULL coincide con NULL, como en
+    los motores en Python; sin nullable queda la igualdad simple (sargable)
+    equals: condición de igualdad a usar en lugar de left = right
+    """
+    equals = equals or f"{left} = {right}"
+    if " AND " in equals:
+        equals = f"({equals})"
+    if not nullable:
+        return equals
+    return f"({equals} OR ({left} IS NULL AND {right} IS NULL))"
+
+
+def split_table_name(table_name: str) -> Tuple[str, str]:
+    """'[schema].[tabla]', 'schema.tabla' o 'tabla' -> (schema, tabla)"""
+    parts = [p.strip().strip("[]") for p in table_name.split(".")]
+    if len(parts) == 1:
+        return "dbo", parts[0]
+    return parts[-2], parts[-1]
+
+
+class SchemaCache:
+    """Caché thread-safe de columnas por tabla"""
+
+    def __init__(self, db_manager, ttl: float = 300.0):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables: Dict[Tuple[str, str], Tuple[float, List[ColumnInfo]]] = {}
+
+    def load(self, *table_names: str) -> Dict[str, List[ColumnInfo]]:
+        """
+        Asegura en caché las tablas pedidas; las ausentes o vencidas se
+        consultan juntas en un único viaje a INFORMATION_SCHEMA
+        """
+        keys = {name: self._key(name) for name in table_names}
+        now = time.monotonic()
+        with self._lock:
+            missing = {
+                key: split_table_name(name) for name, key in keys.items()
+                if key not in self._tables or now - self._tables[key][0] > self.ttl
+            }
+
+        fetched = self._fetch(list(missing.values())) if missing else {}
+
+        with self._lock:
+            return {
+                name: self._tables[key][1] if key in self._tables else fetched.get(key, [])
+                for name, key in keys.items()
+            }
+
+    def get_columns(self, table_name: str) -> List[ColumnInfo]:
+        """Columnas de la tabla ordenadas por posición (vacío si no existe)"""
+        return self.load(table_name)[table_name]
+
+    def column_names(self, table_name: str) -> List[str]:
+        return [col.name for col in self.get_columns(table_name)]
+
+    def table_exists(self, table_name: str) -> bool:
+        return bool(self.get_columns(table_name))
+
+    def invalidate(self, table_name: str = None):
+        """Descarta una tabla (o todo) tras DDL como CREATE/ALTER/DROP"""
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(self._key(table_name), None)
+
+    def _fetch(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[ColumnInfo]]:
+        """
+        Consulta las tablas pedidas; sólo las que existen quedan en caché,
+        para que una tabla creada por otro proceso se vea en la próxima consulta
+        """
+        conditions = " OR ".join(["(TABLE_SCHEMA = ? AND TABLE_NAME = ?)"] * len(keys))
+        query = (
+            "SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, "
+            "DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, "
+            "NUMERIC_SCALE, IS_NULLABLE "
+            "FROM INFORMATION_SCHEMA.COLUMNS "
+            f"WHERE {conditions} "
+            "ORDER BY TABLE_SCHEMA, TABLE_NAME, ORDINAL_POSITION"
+        )
+        params = tuple(value for key in keys for value in key)
+        rows = self.db_manager.execute_query(query, params, label="schema_columns")
+
+        found = {(schema.lower(), table.lower()): [] for schema, table in keys}
+        for row in rows:
+            key = (row[0].lower(), row[1].lower())
+            if key in found:
+                found[key].append(ColumnInfo(
+                    name=row[2],
+                    ordinal=row[3],
+                    data_type=row[4],
+                    max_length=row[5],
+                    precision=row[6],
+                    scale=row[7],
+                    nullable=str(row[8]).upper() != "NO",
+                ))
+
+        loaded_at = time.monotonic()
+        with self._lock:
+            for key, columns in found.items():
+                if columns:
+                    self._tables[key] = (loaded_at, columns)
+                else:
+                    self._tables.pop(key, None)
+        logger.debug(f"Metadatos cargados para {len(keys)} tabla(s) en una consulta")
+        return found
+
+    @staticmethod
+    def _key(table_name: str) -> Tuple[str, str]:
+        schema, table = split_table_name(table_name)
+        return schema.lower(), table.lower()
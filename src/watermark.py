@@ -0,0 +1,107 @@
+"""
+Marcas de agua (high-water marks) por tabla
+Guardan hasta qué valor de rowversion / fecha de actualización se comparó
+cada tabla, para que la siguiente corrida lea sólo lo que cambió después
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def encode_watermark(value: Any) -> Tuple[str, str]:
+    """Valor de la columna -> (tipo, texto) para guardarlo en NVARCHAR"""
+    if isinstance(value, (bytes, bytearray)):
+        return "bytes", bytes(value).hex()
+    if isinstance(value, datetime):
+        return "datetime", value.isoformat()
+    if isinstance(value, int):
+        return "int", str(value)
+    return "str", str(value)
+
+
+def decode_watermark(kind: str, text: str) -> Any:
+    """(tipo, texto) -> valor con el tipo que espera el parámetro de la consulta"""
+    if kind == "bytes":
+        return bytes.fromhex(text)
+    if kind == "datetime":
+        return datetime.fromisoformat(text)
+    if kind == "int":
+        return int(text)
+    return text
+
+
+class WatermarkStore:
+    """
+    Marcas de agua en [dbo].[sync_watermark], una fila por tabla
+    Se actualizan después de escribir los resultados: si la corrida falla a
+    mitad de camino, la siguiente vuelve a leer los mismos cambios
+    """
+
+    def __init__(self, db_manager, table: str = "[dbo].[sync_watermark]"):
+        self.db_manager = db_manager
+        self.table = table
+        self.ensure_table()
+
+    def ensure_table(self):
+        """Crea la tabla de marcas si no existe"""
+        create = f"""
+            IF NOT EXISTS (
+                SELECT *
+                FROM INFORMATION_SCHEMA.TABLES
+                WHERE TABLE_NAME = 'sync_watermark'
+            )
+            CREATE TABLE {self.table} (
+                tabla NVARCHAR(256) NOT NULL PRIMARY KEY,
+                columna NVARCHAR(128) NOT NULL,
+                tipo NVARCHAR(16) NOT NULL,
+                valor NVARCHAR(64) NOT NULL,
+                fecha_actualizacion DATETIME DEFAULT GETDATE()
+            )
+        """
+        try:
+            self.db_manager.execute_non_query(create)
+        except Exception as e:
+            logger.warning(f"Error al crear/verificar tabla de marcas de agua: {e}")
+
+    def get(self, table: str, column: str) -> Optional[Any]:
+        """
+        Última marca de `table`; None si no hay o se guardó con otra columna
+        (en ese caso corresponde una reconciliación completa)
+        """
+        rows = self.db_manager.execute_query(
+            f"SELECT columna, tipo, valor FROM {self.table} WHERE tabla = ?", (table,)
+        )
+        if not rows or rows[0][0].lower() != column.lower():
+            return None
+        return decode_watermark(rows[0][1], rows[0][2])
+
+    def set(self, table: str, column: str, value: Any):
+        """Guarda la marca de `table` (UPDATE y, si no existía, INSERT)"""
+        if value is None:
+            return
+        kind, text = encode_watermark(value)
+        with self.db_manager.get_cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self.table} SET columna = ?, tipo = ?, valor = ?, "
+                f"fecha_actualizacion = GETDATE() WHERE tabla = ?",
+                (column, kind, text, table),
+            )
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    f"INSERT INTO {self.table} (tabla, columna, tipo, valor) VALUES (?, ?, ?, ?)",
+                    (table, column, kind, text),
+                )
+            cursor.commit()
+        logger.info(f"Marca de agua de {table}: {column} = {text}")
+
+    def reset(self, table: str = None):
+        """Descarta la marca de una tabla (o todas): fuerza reconciliación completa"""
+        if table is None:
+            self.db_manager.execute_non_query(f"DELETE FROM {self.table}")
+        else:
+            self.db_manager.execute_non_query(
+                f"DELETE FROM {self.table} WHERE tabla = ?", (table,)
+            )
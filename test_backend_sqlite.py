@@ -0,0 +1,183 @@
+"""
+Test del Backend SQLite
+Valida la emulación del dialecto T-SQL (TOP, MERGE, DATEADD/GETDATE,
+CHECKSUM_AGG, OFFSET/FETCH, UPDATE ... FROM) y los metadatos de esquema
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from src import backends
+from src.backends import SQLiteDialect
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestSQLiteDialect(unittest.TestCase):
+    """Tests para la traducción de sentencias"""
+
+    def traducir(self, sql):
+        (sentencia, _), = SQLiteDialect.translate(sql)
+        return " ".join(sentencia.split())
+
+    def test_top_y_nombres(self):
+        """Test: TOP pasa a LIMIT y se quitan base de datos y dbo"""
+        self.assertEqual(
+            self.traducir("SELECT TOP 5 a FROM [TStest].[tigostar].[t] WHERE b = 1"),
+            "SELECT a FROM [tigostar].[t] WHERE b = 1 LIMIT 5",
+        )
+        self.assertEqual(self.traducir("SELECT * FROM [dbo].[tabla1]"),
+                         "SELECT * FROM [tabla1]")
+
+    def test_dateadd_y_offset(self):
+        """Test: DATEADD/GETDATE y OFFSET/FETCH se traducen"""
+        sql = self.traducir(
+            "SELECT a FROM t WHERE f > DATEADD(MINUTE, -10, GETDATE()) "
+            "ORDER BY a OFFSET ? ROWS FETCH NEXT ? ROWS ONLY"
+        )
+        self.assertIn("datetime(datetime('now', 'localtime'), (-10) || ' minutes')", sql)
+        self.assertTrue(sql.endswith("LIMIT ?, ?"))
+
+    def test_indice_con_esquema(self):
+        """Test: CREATE NONCLUSTERED INDEX sobre [schema].[tabla] usa la sintaxis de SQLite"""
+        self.assertEqual(
+            self.traducir("CREATE NONCLUSTERED INDEX [ix_t] ON [tigostar].[t] ([a], [b])"),
+            "CREATE INDEX [tigostar].[ix_t] ON [t] ([a], [b])",
+        )
+
+    def test_sp_rename(self):
+        """Test: sp_rename de una tabla pasa a ALTER TABLE ... RENAME TO"""
+        self.assertEqual(self.traducir("EXEC sp_rename 'tigostar.tabla3_staging', 'tabla3'"),
+                         "ALTER TABLE [tigostar].[tabla3_staging] RENAME TO [tabla3]")
+        self.assertEqual(self.traducir("EXEC sp_rename 'dbo.tabla3', 'tabla3_old'"),
+                         "ALTER TABLE [tabla3] RENAME TO [tabla3_old]")
+
+    def test_convert_a_texto(self):
+        """Test: CONVERT(VARCHAR(n), x, estilo) conserva los primeros n caracteres"""
+        self.assertEqual(self.traducir("SELECT CONVERT(VARCHAR(19), S.[f], 121) FROM t"),
+                         "SELECT SUBSTR(CAST(S.[f] AS TEXT), 1, 19) FROM t")
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """Tests de ejecución contra el backend embebido"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "prueba.db"),
+        })
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[destino] (Id NVARCHAR(10), Estado NVARCHAR(20), Nodo NVARCHAR(10))"
+        )
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[origen] (Id NVARCHAR(10), Estado NVARCHAR(20), Nodo NVARCHAR(10))"
+        )
+        self.db.execute_insert("INSERT INTO [tigostar].[destino] VALUES (?, ?, ?)",
+                               [("1", "OPEN", "N1"), ("2", "OPEN", "N1"), ("3", "OPEN", "N2")])
+        self.db.execute_insert("INSERT INTO [tigostar].[origen] VALUES (?, ?, ?)",
+                               [("1", "CLOSED", "N1"), ("4", "OPEN", "N2")])
+
+    def filas(self):
+        return self.db.execute_query(
+            "SELECT Id, Estado FROM [tigostar].[destino] ORDER BY Id"
+        )
+
+    def test_merge(self):
+        """Test: MERGE actualiza, inserta y borra como en SQL Server"""
+        afectadas = self.db.execute_non_query("""
+            MERGE [tigostar].[destino] AS T
+            USING [tigostar].[origen] AS S
+            ON (T.Id = S.Id)
+            WHEN MATCHED THEN UPDATE SET T.Estado = S.Estado
+            WHEN NOT MATCHED THEN INSERT (Id, Estado, Nodo) VALUES (S.Id, S.Estado, S.Nodo)
+            WHEN NOT MATCHED BY SOURCE AND T.Nodo = 'N2' THEN DELETE;
+        """)
+
+        self.assertEqual(afectadas, 3)
+        self.assertEqual(self.filas(), [("1", "CLOSED"), ("2", "OPEN"), ("4", "OPEN")])
+
+    def test_update_from_join(self):
+        """Test: UPDATE alias SET ... FROM ... INNER JOIN"""
+        afectadas = self.db.execute_non_query("""
+            UPDATE D SET D.Estado = O.Estado
+            FROM [tigostar].[destino] D
+            INNER JOIN [tigostar].[origen] O ON D.Id = O.Id
+            WHERE D.Nodo = 'N1'
+        """)
+
+        self.assertEqual(afectadas, 1)
+        self.assertEqual(self.filas()[0], ("1", "CLOSED"))
+
+    def test_checksum_agg(self):
+        """Test: CHECKSUM_AGG(BINARY_CHECKSUM(*)) cambia al cambiar los datos"""
+        consulta = ("SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM [tigostar].[destino] "
+                    "WHERE Nodo = ?")
+        antes = self.db.execute_query(consulta, ("N1",))[0][0]
+        self.db.execute_non_query("UPDATE [tigostar].[destino] SET Estado = 'X' WHERE Id = '2'")
+
+        self.assertIsNotNone(antes)
+        self.assertNotEqual(self.db.execute_query(consulta, ("N1",))[0][0], antes)
+        self.assertIsNone(self.db.execute_query(consulta, ("N9",))[0][0])
+
+    def test_information_schema(self):
+        """Test: La caché de esquema lee columnas y tipos del catálogo emulado"""
+        columnas = self.db.schema.get_columns("tigostar.destino")
+
+        self.assertEqual([c.name for c in columnas], ["Id", "Estado", "Nodo"])
+        self.assertEqual(columnas[0].data_type, "nvarchar")
+        self.assertEqual(columnas[0].max_length, 10)
+        self.assertFalse(self.db.table_exists("tigostar.no_existe"))
+
+    def test_insert_desde_generador(self):
+        """Test: execute_insert acepta un iterable y lo consume por lotes"""
+        filas = ((str(i), "OPEN", "N3") for i in range(10, 35))
+        insertadas = self.db.execute_insert(
+            "INSERT INTO [tigostar].[destino] VALUES (?, ?, ?)", filas, batch_size=10
+        )
+
+        self.assertEqual(insertadas, 25)
+        self.assertEqual(self.db.execute_query(
+            "SELECT COUNT(*) FROM [tigostar].[destino] WHERE Nodo = 'N3'"
+        ), [(25,)])
+
+    def test_if_not_exists_create(self):
+        """Test: IF NOT EXISTS (...) CREATE TABLE con IDENTITY y GETDATE()"""
+        ddl = """
+            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'cache')
+            CREATE TABLE [dbo].[cache] (
+                id INT PRIMARY KEY IDENTITY(1,1),
+                nodo NVARCHAR(MAX),
+                fecha DATETIME DEFAULT GETDATE()
+            )
+        """
+        self.db.execute_non_query(ddl)
+        self.db.execute_non_query(ddl)
+        self.db.execute_non_query("INSERT INTO [dbo].[cache] (nodo) VALUES (?)", ("N1",))
+
+        fila = self.db.execute_query("SELECT TOP 1 id, nodo, fecha FROM [dbo].[cache]")[0]
+        self.assertEqual(fila[:2], (1, "N1"))
+        self.assertIsNotNone(fila[2])
+
+
+@unittest.skipIf(backends.pyodbc is None, "pyodbc no instalado")
+class TestSqlServerBackend(unittest.TestCase):
+    """Tests para la cadena de conexión de SQL Server"""
+
+    def test_cadena_de_lectura(self):
+        """Test: La conexión de solo lectura declara ApplicationIntent"""
+        config = {"driver": "ODBC Driver 17 for SQL Server", "server": "srv", "port": "1433",
+                  "database": "TStest", "username": "u", "password": "p"}
+        backend = backends.SqlServerBackend()
+
+        self.assertIn("SERVER=srv,1433;", backend.connection_string(config))
+        self.assertIn("ApplicationIntent=ReadOnly;",
+                      backend.connection_string(config, read_only=True))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+"""
+Test de la Fachada Asíncrona
+Valida AsyncDatabaseManager: consultas, sentencias, transacciones con commit
+y rollback, y que más transacciones que conexiones no se bloqueen entre sí
+(backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from config.credentials import PROCESSING_CONFIG
+from src.async_database import AsyncDatabaseManager
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestAsyncDatabaseManager(unittest.TestCase):
+    """Tests para AsyncDatabaseManager y AsyncTransaction"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        # Pool chico y espera corta: un bloqueo se notaría como PoolTimeoutError
+        configuracion = patch.dict(PROCESSING_CONFIG,
+                                   {"pool_max_size": 2, "pool_acquire_timeout": 3})
+        configuracion.start()
+        self.addCleanup(configuracion.stop)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "asincrona.db"),
+            "schemas": [],
+        })
+        self.db.execute_non_query("CREATE TABLE nodos (nombre TEXT, estado TEXT)")
+        self.db.execute_insert("INSERT INTO nodos VALUES (?, ?)",
+                               [("N1", "OPEN"), ("N2", "OPEN")])
+        self.adb = AsyncDatabaseManager(self.db)
+        self.addCleanup(self.adb.close)
+
+    def ejecutar(self, corrutina):
+        return asyncio.run(corrutina)
+
+    def test_fetch_y_execute(self):
+        """Test: fetch retorna filas y execute confirma y retorna filas afectadas"""
+        afectadas = self.ejecutar(
+            self.adb.execute("UPDATE nodos SET estado = 'CLOSED' WHERE nombre = ?", ("N1",))
+        )
+
+        self.assertEqual(afectadas, 1)
+        self.assertEqual(
+            self.ejecutar(self.adb.fetch("SELECT nombre, estado FROM nodos ORDER BY nombre")),
+            [("N1", "CLOSED"), ("N2", "OPEN")],
+        )
+
+    def test_transaccion_confirma(self):
+        """Test: Lo escrito en la transacción se confirma al salir y fetch trae columnas"""
+        async def transaccion():
+            async with self.adb.transaction() as tx:
+                await tx.execute("INSERT INTO nodos VALUES ('N3', 'OPEN')")
+                return await tx.fetch("SELECT nombre AS Nodo FROM nodos WHERE nombre = 'N3'")
+
+        columnas, filas = self.ejecutar(transaccion())
+
+        self.assertEqual((columnas, filas), (["Nodo"], [("N3",)]))
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM nodos"), [(3,)])
+
+    def test_transaccion_revierte(self):
+        """Test: Una excepción dentro del bloque descarta lo pendiente"""
+        async def transaccion():
+            async with self.adb.transaction() as tx:
+                await tx.execute("INSERT INTO nodos VALUES ('N3', 'OPEN')")
+                raise RuntimeError("falla a mitad de camino")
+
+        with self.assertRaises(RuntimeError):
+            self.ejecutar(transaccion())
+
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM nodos"), [(2,)])
+        self.assertEqual(self.db.pool.stats()["prestadas"], 0)
+
+    def test_mas_transacciones_que_conexiones(self):
+        """Test: 6 transacciones de 3 pasos con 2 conexiones terminan sin esperar el timeout"""
+        async def transaccion(i):
+            async with self.adb.transaction() as tx:
+                for _ in range(3):
+                    await tx.fetch("SELECT COUNT(*) FROM nodos")
+                    await asyncio.sleep(0.01)
+                return i
+
+        async def todas():
+            return await asyncio.gather(*(transaccion(i) for i in range(6)))
+
+        inicio = time.perf_counter()
+        self.assertEqual(self.ejecutar(todas()), list(range(6)))
+        self.assertLess(time.perf_counter() - inicio, 2)
+        self.assertEqual(self.db.pool.stats()["timeouts"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
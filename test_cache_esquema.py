@@ -0,0 +1,105 @@
+"""
+Test de la Caché de Esquema
+Valida carga en lote, TTL e invalidación de metadatos de INFORMATION_SCHEMA
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from src.database import DatabaseManager, close_all_pools
+from src.schema import SchemaCache, split_table_name
+
+FILAS_COLUMNS = [
+    ('dbo', 'tabla1', 'Ticket', 1, 'nvarchar', 50, None, None, 'NO'),
+    ('dbo', 'tabla1', 'Nodo', 2, 'nvarchar', 50, None, None, 'YES'),
+    ('dbo', 'tabla2', 'Ticket', 1, 'nvarchar', 50, None, None, 'NO'),
+]
+
+
+class TestSchemaCache(unittest.TestCase):
+    """Tests para SchemaCache"""
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.db.execute_query.return_value = FILAS_COLUMNS
+        self.cache = SchemaCache(self.db, ttl=300)
+
+    def test_carga_en_una_consulta(self):
+        """Test: Varias tablas se consultan en un único viaje"""
+        resultado = self.cache.load('dbo.tabla1', '[dbo].[tabla2]', 'dbo.tabla3')
+
+        self.assertEqual(self.db.execute_query.call_count, 1)
+        params = self.db.execute_query.call_args.args[1]
+        self.assertEqual(len(params), 6)
+        self.assertEqual([c.name for c in resultado['dbo.tabla1']], ['Ticket', 'Nodo'])
+        self.assertEqual(resultado['dbo.tabla1'][0].data_type, 'nvarchar')
+        self.assertFalse(resultado['dbo.tabla1'][0].nullable)
+        self.assertEqual(resultado['dbo.tabla3'], [])
+
+    def test_reutiliza_cache(self):
+        """Test: Consultas repetidas no vuelven al catálogo"""
+        self.cache.load('dbo.tabla1', 'dbo.tabla2')
+        self.cache.column_names('dbo.tabla1')
+        self.assertTrue(self.cache.table_exists('tabla2'))
+        self.assertEqual(self.db.execute_query.call_count, 1)
+
+    def test_tabla_inexistente_no_se_cachea(self):
+        """Test: Una tabla inexistente se reconsulta y se ve apenas otro proceso la crea"""
+        self.assertFalse(self.cache.table_exists('dbo.tabla3'))
+        self.assertEqual(self.db.execute_query.call_count, 1)
+
+        self.db.execute_query.return_value = FILAS_COLUMNS + [
+            ('dbo', 'tabla3', 'Ticket', 1, 'nvarchar', 50, None, None, 'NO'),
+        ]
+        self.assertTrue(self.cache.table_exists('dbo.tabla3'))
+        self.assertTrue(self.cache.table_exists('dbo.tabla3'))
+        self.assertEqual(self.db.execute_query.call_count, 2)
+
+    def test_invalidacion(self):
+        """Test: Tras invalidar se vuelve a consultar"""
+        self.cache.load('dbo.tabla1')
+        self.cache.invalidate('dbo.tabla1')
+        self.cache.load('dbo.tabla1')
+        self.assertEqual(self.db.execute_query.call_count, 2)
+
+    def test_ttl_vencido(self):
+        """Test: Con TTL vencido se recarga"""
+        cache = SchemaCache(self.db, ttl=0)
+        cache.load('dbo.tabla1')
+        cache.load('dbo.tabla1')
+        self.assertEqual(self.db.execute_query.call_count, 2)
+
+    def test_split_table_name(self):
+        """Test: Separa esquema y tabla con o sin corchetes"""
+        self.assertEqual(split_table_name('[tigostar].[homeb2c_tck]'), ('tigostar', 'homeb2c_tck'))
+        self.assertEqual(split_table_name('tabla'), ('dbo', 'tabla'))
+
+
+class TestCacheTrasCerrarPools(unittest.TestCase):
+    """Tests de la caché compartida por cadena de conexión"""
+
+    def test_nuevo_gestor_tras_close_all_pools(self):
+        """Test: Tras cerrar los pools un gestor nuevo no usa la caché del anterior"""
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        config = {"backend": "sqlite", "schemas": [],
+                  "database": os.path.join(directorio.name, "esquema.db")}
+        db = DatabaseManager(config=config)
+        db.execute_non_query("CREATE TABLE tabla1 (Codigo TEXT)")
+        self.assertTrue(db.table_exists("dbo.tabla1"))
+
+        close_all_pools()
+        db2 = DatabaseManager(config=config)
+
+        self.assertIs(db2.schema.db_manager, db2)
+        self.assertTrue(db2.table_exists("dbo.tabla1"))
+        self.assertEqual(db2.schema.column_names("dbo.tabla1"), ["Codigo"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
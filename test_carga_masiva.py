@@ -0,0 +1,114 @@
+"""
+Test de la Carga Masiva
+Valida execute_insert(bulk=True): envío en arreglo (fast_executemany),
+commits cada commit_interval registros y estadísticas de rendimiento
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from src.batching import BATCH_SIZES, AdaptiveBatchSizer
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestCargaMasiva(unittest.TestCase):
+    """Tests para DatabaseManager.execute_insert en modo bulk"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "masiva.db"),
+            "schemas": [],
+        })
+        self.conn = MagicMock()
+
+        @contextmanager
+        def conexion_falsa(*args, **kwargs):
+            yield self.conn
+
+        self.conexion_falsa = conexion_falsa
+
+    def insertar(self, **kwargs):
+        filas = ((i, f"fila {i}") for i in range(1000))
+        with patch.object(self.db, "get_connection", self.conexion_falsa):
+            return self.db.execute_insert("INSERT INTO t VALUES (?, ?)", filas,
+                                          batch_size=100, adaptive=False, **kwargs)
+
+    def test_bulk_usa_fast_executemany(self):
+        """Test: Con bulk=True el cursor envía los parámetros en arreglo"""
+        self.insertar(bulk=True, commit_interval=250)
+
+        cursor = self.conn.cursor.return_value
+        self.assertTrue(cursor.fast_executemany)
+        self.assertEqual(cursor.executemany.call_count, 10)
+        self.assertEqual(len(cursor.executemany.call_args_list[0][0][1]), 100)
+
+    def test_commit_cada_intervalo(self):
+        """Test: En bulk se confirma cada commit_interval registros y al final"""
+        self.assertEqual(self.insertar(bulk=True, commit_interval=250), 1000)
+
+        # 300, 600 y 900 registros pendientes + el resto al terminar
+        self.assertEqual(self.conn.commit.call_count, 4)
+
+    def test_adaptativo_incluye_el_commit(self):
+        """Test: Cada lote informa al controlador su parte del commit que lo confirma"""
+        self.addCleanup(BATCH_SIZES.reset)
+        self.conn.commit.side_effect = lambda: time.sleep(0.06)
+        registrar = AdaptiveBatchSizer.record
+        latencias = []
+
+        def medir(sizer, filas, segundos):
+            latencias.append((filas, segundos))
+            return registrar(sizer, filas, segundos)
+
+        filas = ((i, f"fila {i}") for i in range(600))
+        with patch.object(self.db, "get_connection", self.conexion_falsa), \
+                patch.object(AdaptiveBatchSizer, "record", autospec=True, side_effect=medir):
+            self.db.execute_insert("INSERT INTO t VALUES (?, ?)", filas, batch_size=100,
+                                   bulk=True, commit_interval=300, adaptive=True)
+
+        # 3 lotes de 100 por commit de 60 ms: al menos 20 ms por lote
+        self.assertEqual([filas for filas, _ in latencias[:3]], [100, 100, 100])
+        for filas, segundos in latencias:
+            self.assertGreaterEqual(segundos, 0.06 * filas / 300 * 0.9)
+
+    def test_sin_bulk_commit_por_lote(self):
+        """Test: Sin bulk se confirma cada lote y no se activa fast_executemany"""
+        self.insertar(bulk=False)
+
+        self.assertFalse(self.conn.cursor.return_value.fast_executemany)
+        self.assertEqual(self.conn.commit.call_count, 10)
+
+    def test_estadisticas(self):
+        """Test: last_insert_stats informa registros, segundos, registros/s y modo"""
+        self.insertar(bulk=True)
+
+        estadisticas = self.db.last_insert_stats
+        self.assertEqual(estadisticas["registros"], 1000)
+        self.assertTrue(estadisticas["bulk"])
+        self.assertGreater(estadisticas["registros_por_segundo"], 0)
+        self.assertGreaterEqual(estadisticas["segundos"], 0)
+
+    def test_bulk_en_sqlite(self):
+        """Test: La carga masiva inserta todas las filas en una base real"""
+        self.db.execute_non_query("CREATE TABLE t (Id INTEGER, Nombre TEXT)")
+        insertadas = self.db.execute_insert(
+            "INSERT INTO t VALUES (?, ?)", [(i, "x") for i in range(2500)],
+            batch_size=300, bulk=True, commit_interval=1000, adaptive=False,
+        )
+
+        self.assertEqual(insertadas, 2500)
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM t"), [(2500,)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
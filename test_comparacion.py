@@ -0,0 +1,512 @@
+"""
+Test de Comparación de Tablas
+Valida los motores de diferencias por clave y TableComparator sobre el
+backend SQLite
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import tracemalloc
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from config.credentials import PROCESSING_CONFIG
+from src.backends import SqlServerBackend
+from src.comparison import TableComparator
+from src.database import DatabaseManager, close_all_pools
+from src import diff
+from src.diff import compile_normalizers, external_hash_join, hash_join, merge_diff, vector_diff
+from src.injection import DataInjector
+
+ORIGEN = [("1", "A", 10), ("2", "B", 20), ("3", "C", 30), ("5", "E", 50)]
+COMPARACION = [("2", "B", 20), ("3", "C", 31), ("4", "D", 40), ("5", "E", 50)]
+
+
+class TestHashJoin(unittest.TestCase):
+    """Tests para diff.hash_join"""
+
+    def test_cuatro_grupos(self):
+        """Test: Separa exclusivas, idénticas y modificadas por clave"""
+        solo_o, solo_c, identicas, modificadas = hash_join(ORIGEN, COMPARACION, [0], [1, 2])
+
+        self.assertEqual(solo_o, [("1", "A", 10)])
+        self.assertEqual(solo_c, [("4", "D", 40)])
+        self.assertEqual(identicas, [("2", "B", 20), ("5", "E", 50)])
+        self.assertEqual(modificadas, [(("3", "C", 30), ("3", "C", 31))])
+
+    def test_claves_repetidas(self):
+        """Test: Cada fila se empareja a lo sumo una vez"""
+        solo_o, solo_c, identicas, _ = hash_join(
+            [("1", "A"), ("1", "A")], [("1", "A"), ("1", "A"), ("1", "A")], [0], [1]
+        )
+
+        self.assertEqual(len(identicas), 1)
+        self.assertEqual(len(solo_o), 1)
+        self.assertEqual(len(solo_c), 2)
+
+    def test_sin_columnas_no_clave(self):
+        """Test: Con la fila completa como clave no hay modificadas"""
+        _, _, identicas, modificadas = hash_join(ORIGEN, COMPARACION, [0, 1, 2], [])
+
+        self.assertEqual(len(identicas), 2)
+        self.assertEqual(modificadas, [])
+
+
+class TestNormalizacion(unittest.TestCase):
+    """Tests para diff.compile_normalizers"""
+
+    def test_texto_y_fechas(self):
+        """Test: Cada columna recibe sólo las normalizaciones de su tipo"""
+        normalizadores = compile_normalizers(
+            ["Nombre", "Fecha", "Monto"], ["nvarchar", "datetime", "int"],
+            {"*": {"trim": True, "empty_as_null": True},
+             "nombre": {"ignore_case": True},
+             "Fecha": {"datetime_precision": "seconds"}},
+        )
+
+        self.assertEqual(sorted(normalizadores), [0, 1])
+        self.assertEqual(normalizadores[0]("Ábc  "), "ábc")
+        self.assertIsNone(normalizadores[0]("   "))
+        self.assertEqual(normalizadores[1](datetime(2024, 1, 2, 3, 4, 5, 678000)),
+                         datetime(2024, 1, 2, 3, 4, 5))
+        self.assertEqual(normalizadores[1]("2024-01-02 03:04:05.678"), "2024-01-02 03:04:05")
+
+    def test_opcion_desconocida(self):
+        """Test: Una opción mal escrita es un error de configuración"""
+        with self.assertRaises(ValueError):
+            compile_normalizers(["Nombre"], ["nvarchar"], {"*": {"trimm": True}})
+
+    def test_hash_join_normalizado(self):
+        """Test: Se compara normalizado pero el resultado conserva los valores originales"""
+        normalizadores = compile_normalizers(["Codigo", "Nombre"], ["nvarchar", "nvarchar"],
+                                             {"Nombre": {"trim": True, "ignore_case": True}})
+        _, _, identicas, modificadas = hash_join(
+            [("1", "Abc "), ("2", "x")], [("1", "abc"), ("2", "y")], [0], [1], normalizadores
+        )
+
+        self.assertEqual(identicas, [("1", "Abc ")])
+        self.assertEqual(len(modificadas), 1)
+
+
+class TestMergeDiff(unittest.TestCase):
+    """Tests para diff.merge_diff"""
+
+    def test_diferencias_en_orden(self):
+        """Test: Genera las diferencias en una pasada sobre flujos ordenados"""
+        diferencias = list(merge_diff(iter(ORIGEN), iter(COMPARACION), [0], [1, 2]))
+
+        self.assertEqual(diferencias, [
+            ("SOLO_ORIGEN", ("1", "A", 10), None),
+            ("MODIFICADO", ("3", "C", 30), ("3", "C", 31)),
+            ("SOLO_COMPARACION", None, ("4", "D", 40)),
+        ])
+
+    def test_claves_nulas_primero(self):
+        """Test: Las claves NULL se ordenan primero como en ORDER BY"""
+        diferencias = list(merge_diff([(None, 1), ("a", 1)], [("a", 1)], [0], [1]))
+
+        self.assertEqual(diferencias, [("SOLO_ORIGEN", (None, 1), None)])
+
+    def test_flujo_desordenado(self):
+        """Test: Un flujo sin ordenar por la clave es un error"""
+        with self.assertRaises(ValueError):
+            list(merge_diff([("2", 1), ("1", 1)], [], [0], [1]))
+
+
+class TestExternalHashJoin(unittest.TestCase):
+    """Tests para diff.external_hash_join"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.temporal = directorio.name
+
+    def test_igual_a_hash_join(self):
+        """Test: Mismos grupos y mismo orden que hash_join, sin dejar archivos"""
+        origen = [(str(i), "A", i % 7) for i in range(500)]
+        comparacion = [(str(i), "A", i % 5) for i in range(250, 800)]
+        bloques = lambda filas: [filas[i:i + 64] for i in range(0, len(filas), 64)]
+
+        *grupos, info = external_hash_join(bloques(origen), bloques(comparacion), [0], [1, 2],
+                                           memory_budget=1, temp_dir=self.temporal,
+                                           partitions=4)
+
+        self.assertEqual(tuple(grupos), hash_join(origen, comparacion, [0], [1, 2]))
+        self.assertEqual(info["filas"], 1050)
+        self.assertGreater(info["profundidad"], 1)
+        self.assertEqual(os.listdir(self.temporal), [])
+
+    def test_limpieza_ante_error(self):
+        """Test: Un error durante la lectura no deja archivos temporales"""
+        def bloques():
+            yield [("1", "A")]
+            raise RuntimeError("conexión perdida")
+
+        with self.assertRaises(RuntimeError):
+            external_hash_join(bloques(), [], [0], [1], memory_budget=1 << 20,
+                               temp_dir=self.temporal)
+        self.assertEqual(os.listdir(self.temporal), [])
+
+
+@unittest.skipIf(diff.np is None, "numpy no instalado")
+class TestVectorDiff(unittest.TestCase):
+    """Tests para diff.vector_diff"""
+
+    def test_huellas_por_bloques(self):
+        """Test: Sólo se materializan exclusivas y modificadas; las idénticas se cuentan"""
+        bloques = lambda filas: [filas[:2], filas[2:]]
+        solo_o, solo_c, modificadas, identicas = vector_diff(
+            bloques(ORIGEN), lambda: bloques(COMPARACION), [0], [1, 2]
+        )
+
+        self.assertEqual(solo_o, [("1", "A", 10)])
+        self.assertEqual(solo_c, [("4", "D", 40)])
+        self.assertEqual(modificadas, [(("3", "C", 30), ("3", "C", 31))])
+        self.assertEqual(identicas, 2)
+
+    def test_comparacion_vacia(self):
+        """Test: Sin filas de comparación todo el origen es exclusivo"""
+        solo_o, solo_c, modificadas, identicas = vector_diff([ORIGEN], lambda: [], [0], [1, 2])
+
+        self.assertEqual(solo_o, ORIGEN)
+        self.assertEqual((solo_c, modificadas, identicas), ([], [], 0))
+
+    def test_valores_con_hash_igual(self):
+        """Test: -1 y -2 (mismo hash() en CPython) se distinguen como clave y como valor"""
+        self.assertEqual(hash(-1), hash(-2))
+        origen = [(-1, -1), (1, -1)]
+        comparacion = [(-2, -1), (1, -2)]
+
+        solo_o, solo_c, modificadas, identicas = vector_diff(
+            [origen], lambda: [comparacion], [0], [1]
+        )
+
+        self.assertEqual(solo_o, [(-1, -1)])
+        self.assertEqual(solo_c, [(-2, -1)])
+        self.assertEqual(modificadas, [((1, -1), (1, -2))])
+        self.assertEqual(identicas, 0)
+
+    def test_clave_repetida_en_origen(self):
+        """Test: Una clave repetida en el origen da los mismos grupos que hash_join"""
+        origen = ORIGEN + [("3", "C", 32), ("2", "B", 20)]
+        solo_o, solo_c, identicas, modificadas = hash_join(origen, COMPARACION, [0], [1, 2])
+
+        for bloques in ([origen], [origen[:3], origen[3:5], origen[5:]]):
+            resultado = vector_diff(bloques, lambda: [COMPARACION], [0], [1, 2])
+            self.assertEqual(sorted(resultado[0]), sorted(solo_o))
+            self.assertEqual(resultado[1], solo_c)
+            self.assertEqual(resultado[2], modificadas)
+            self.assertEqual(resultado[3], len(identicas))
+
+    def test_claves_repetidas(self):
+        """Test: Una clave repetida en la comparación es un error, no una pareja al azar"""
+        with self.assertRaises(ValueError):
+            vector_diff([ORIGEN], lambda: [COMPARACION + [("2", "X", 0)]], [0], [1, 2])
+
+
+class TestTableComparator(unittest.TestCase):
+    """Tests para TableComparator.compare sobre SQLite"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "comparacion.db"),
+            "schemas": [],
+        })
+        # Mismas columnas en distinto orden y una columna extra en tabla2
+        self.db.execute_non_query("CREATE TABLE tabla1 (Codigo TEXT, Nombre TEXT, Monto INT)")
+        self.db.execute_non_query(
+            "CREATE TABLE tabla2 (Monto INT, Codigo TEXT, Nombre TEXT, Extra TEXT)"
+        )
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, ?, ?)", ORIGEN)
+        self.db.execute_insert(
+            "INSERT INTO tabla2 VALUES (?, ?, ?, 'x')",
+            [(monto, codigo, nombre) for codigo, nombre, monto in COMPARACION],
+        )
+        self.config = {"source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+                       "result_table": "dbo.tabla3", "key_columns": ["codigo"]}
+        self.comparator = TableComparator(self.db, self.config)
+
+    def test_compare_por_clave(self):
+        """Test: compare() alinea columnas por nombre y reporta estadísticas"""
+        resultado = self.comparator.compare()
+
+        self.assertEqual(resultado.columns, ["Codigo", "Nombre", "Monto"])
+        self.assertEqual(resultado.only_in_source, [("1", "A", 10)])
+        self.assertEqual(resultado.only_in_comparison, [("4", "D", 40)])
+        self.assertEqual(resultado.modified, [(("3", "C", 30), ("3", "C", 31))])
+        self.assertEqual(resultado.stats["identicos"], 2)
+        self.assertEqual(resultado.stats["motor"], "hash")
+
+    def test_registros_compactos(self):
+        """Test: Las filas comparten el esquema en la clase, sin dict por fila"""
+        fila = self.comparator.compare().only_in_source[0]
+
+        self.assertEqual(fila.Codigo, "1")
+        self.assertEqual(type(fila).columns, ("Codigo", "Nombre", "Monto"))
+        self.assertFalse(hasattr(fila, "__dict__"))
+        self.assertIs(type(fila), type(self.comparator.compare().identical[0]))
+
+    def test_motor_merge(self):
+        """Test: El motor merge produce los mismos grupos que hash"""
+        hash_ = self.comparator.compare("hash")
+        merge = self.comparator.compare("merge")
+
+        self.assertEqual(merge.stats["motor"], "merge")
+        self.assertEqual(merge[1:5], hash_[1:5])
+
+    def test_motor_pushdown(self):
+        """Test: pushdown sólo trae las diferencias y cuenta las idénticas"""
+        hash_ = self.comparator.compare("hash")
+        pushdown = self.comparator.compare("pushdown")
+
+        self.assertEqual(pushdown.only_in_source, hash_.only_in_source)
+        self.assertEqual(pushdown.only_in_comparison, hash_.only_in_comparison)
+        self.assertEqual(pushdown.modified, hash_.modified)
+        self.assertEqual(pushdown.identical, [])
+        self.assertEqual(pushdown.stats["identicos"], 2)
+
+    @unittest.skipIf(diff.np is None, "numpy no instalado")
+    def test_motor_vector(self):
+        """Test: vector devuelve las mismas diferencias que hash como registros"""
+        hash_ = self.comparator.compare("hash")
+        vector = self.comparator.compare("vector")
+
+        self.assertEqual(vector.only_in_source, hash_.only_in_source)
+        self.assertEqual(vector.only_in_comparison, hash_.only_in_comparison)
+        self.assertEqual(vector.modified, hash_.modified)
+        self.assertEqual(vector.stats["identicos"], 2)
+        self.assertEqual(vector.only_in_source[0].Codigo, "1")
+
+    def test_motor_external(self):
+        """Test: El motor external coincide con hash y reporta el rendimiento"""
+        hash_ = self.comparator.compare("hash")
+        external = self.comparator.compare("external")
+
+        self.assertEqual(external[1:5], hash_[1:5])
+        self.assertEqual(external.stats["filas"], 8)
+        self.assertIn("filas_por_segundo", external.stats)
+        self.assertEqual(type(external.identical[0]).columns, ("Codigo", "Nombre", "Monto"))
+
+    def test_pushdown_nulos_iguales(self):
+        """Test: NULL frente a NULL no cuenta como modificación en pushdown"""
+        self.db.execute_non_query("UPDATE tabla1 SET Nombre = NULL WHERE Codigo = '2'")
+        self.db.execute_non_query("UPDATE tabla2 SET Nombre = NULL WHERE Codigo = '2'")
+
+        self.assertEqual(self.comparator.compare("pushdown").stats["identicos"], 2)
+
+    def test_pushdown_claves_nulas(self):
+        """Test: Una clave NULL en ambas tablas coincide en pushdown igual que en hash"""
+        self.db.execute_non_query("UPDATE tabla1 SET Codigo = NULL WHERE Codigo = '2'")
+        self.db.execute_non_query("UPDATE tabla2 SET Codigo = NULL WHERE Codigo = '2'")
+
+        hash_ = self.comparator.compare("hash")
+        pushdown = self.comparator.compare("pushdown")
+
+        self.assertEqual(pushdown.only_in_source, hash_.only_in_source)
+        self.assertEqual(pushdown.only_in_comparison, hash_.only_in_comparison)
+        self.assertEqual(pushdown.stats["identicos"], len(hash_.identical))
+
+    def comparador_texto(self):
+        for tabla in ("texto1", "texto2"):
+            self.db.execute_non_query(
+                f"CREATE TABLE {tabla} (Codigo NVARCHAR(10), Nombre NVARCHAR(20), Monto INT)"
+            )
+        self.db.execute_insert("INSERT INTO texto1 VALUES (?, ?, ?)",
+                               [("1", "abc", 1), ("2", "x", 2)])
+        self.db.execute_insert("INSERT INTO texto2 VALUES (?, ?, ?)",
+                               [("1", "ABC ", 1), ("2 ", "x", 2)])
+        return TableComparator(self.db, {
+            "source_table": "dbo.texto1", "comparison_table": "dbo.texto2",
+            "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def test_pushdown_textos_exactos(self):
+        """Test: Mayúsculas y espacios finales cuentan en pushdown igual que en hash"""
+        comparador = self.comparador_texto()
+        hash_ = comparador.compare("hash")
+        pushdown = comparador.compare("pushdown")
+
+        self.assertEqual(len(hash_.modified), 1)
+        self.assertEqual(pushdown.modified, hash_.modified)
+        self.assertEqual(pushdown.only_in_source, hash_.only_in_source)
+        self.assertEqual(pushdown.only_in_comparison, hash_.only_in_comparison)
+
+    def test_pushdown_binario_en_sql_server(self):
+        """Test: En SQL Server textos y claves se comparan en BIN2 y con DATALENGTH"""
+        comparador = self.comparador_texto()
+        columnas, clave, valores = comparador.comparison_columns()
+        with patch.object(self.db.backend, "exact_text", SqlServerBackend.exact_text):
+            diferencias, conteo = comparador.pushdown_queries(columnas, clave, valores)
+
+        self.assertIn("SELECT S.[Nombre] COLLATE Latin1_General_BIN2, "
+                      "DATALENGTH(S.[Nombre]), S.[Monto] EXCEPT", diferencias)
+        self.assertIn("(S.[Codigo] COLLATE Latin1_General_BIN2 = C.[Codigo] COLLATE "
+                      "Latin1_General_BIN2 AND DATALENGTH(S.[Codigo]) = DATALENGTH(C.[Codigo]))",
+                      conteo)
+        self.assertNotIn("S.[Monto] COLLATE", diferencias)
+
+    def test_motor_solo_conteo_no_inyecta(self):
+        """Test: pushdown y vector se rechazan donde hacen falta las filas idénticas"""
+        for motor in ("pushdown", "vector"):
+            with patch.dict(PROCESSING_CONFIG, {"compare_engine": motor}):
+                with self.assertRaises(ValueError):
+                    self.comparator.compare_tables()
+                with self.assertRaises(ValueError):
+                    list(self.comparator.iter_injection_rows())
+
+    def test_motor_paralelo(self):
+        """Test: Los rangos en procesos separados suman lo mismo que hash"""
+        columnas, clave, valores = self.comparator.comparison_columns()
+        grupos, info = self.comparator.compare_parallel(
+            columnas, clave, valores, workers=2, partitions=3
+        )
+        hash_ = self.comparator.compare("hash")
+
+        self.assertEqual(info["particiones"], 3)
+        self.assertEqual(info["workers"], 2)
+        self.assertEqual(sorted(grupos[0]), sorted(hash_.only_in_source))
+        self.assertEqual(sorted(grupos[1]), sorted(hash_.only_in_comparison))
+        self.assertEqual(sorted(grupos[2]), sorted(hash_.identical))
+        self.assertEqual(sorted(grupos[3]), sorted(hash_.modified))
+
+    def test_rangos_sin_solapamiento(self):
+        """Test: Los rangos de NTILE cubren todas las claves una sola vez"""
+        rangos = self.comparator.partition_ranges("Codigo", 2)
+
+        self.assertEqual(rangos[0], ("([Codigo] IS NULL OR [Codigo] < ?)", ("3",)))
+        self.assertEqual(rangos[-1], ("[Codigo] >= ?", ("3",)))
+
+    def test_iter_diff(self):
+        """Test: iter_diff entrega sólo las diferencias"""
+        marcas = [marca for marca, _, _ in self.comparator.iter_diff(chunk_size=1)]
+
+        self.assertEqual(marcas, ["SOLO_ORIGEN", "MODIFICADO", "SOLO_COMPARACION"])
+
+    def test_datos_de_inyeccion(self):
+        """Test: Las modificadas se marcan MODIFICADO con valores del origen"""
+        datos = self.comparator.prepare_injection_data()
+
+        self.assertIn(("3", "C", 30, "MODIFICADO"), datos)
+        self.assertIn(("4", "D", 40, "SOLO_COMPARACION"), datos)
+        self.assertEqual(len(datos), 5)
+
+    def test_compare_tables_compatible(self):
+        """Test: compare_tables mantiene los tres grupos de diccionarios"""
+        solo_o, solo_c, coincidentes = self.comparator.compare_tables()
+
+        self.assertEqual(len(coincidentes), 2)
+        self.assertIn({"Codigo": "3", "Nombre": "C", "Monto": 30}, solo_o)
+        self.assertIn({"Codigo": "3", "Nombre": "C", "Monto": 31}, solo_c)
+
+    def test_columnas_de_arrastre(self):
+        """Test: carry_columns viaja en el resultado sin compararse"""
+        self.config.update(compare_columns=["Nombre"], carry_columns=["Monto"])
+
+        resultado = self.comparator.compare()
+
+        self.assertEqual(resultado.columns, ["Codigo", "Nombre", "Monto"])
+        self.assertEqual(resultado.modified, [])
+        self.assertEqual(len(resultado.identical), 3)
+        self.assertIn(("3", "C", 30), resultado.identical)
+
+    def test_columnas_ignoradas(self):
+        """Test: ignore_columns no se lee ni se compara"""
+        self.config["ignore_columns"] = ["Monto"]
+
+        self.assertEqual(self.comparator.comparison_columns(), (["Codigo", "Nombre"], [0], [1]))
+
+    def test_normalizacion_en_todos_los_motores(self):
+        """Test: Espacios finales, mayúsculas y vacío = NULL no generan diferencias"""
+        self.db.execute_non_query("UPDATE tabla2 SET Nombre = 'b  ' WHERE Codigo = '2'")
+        self.db.execute_non_query("UPDATE tabla1 SET Nombre = '' WHERE Codigo = '5'")
+        self.db.execute_non_query("UPDATE tabla2 SET Nombre = NULL WHERE Codigo = '5'")
+        self.assertEqual(len(self.comparator.compare("hash").modified), 3)
+
+        self.config["normalize"] = {"*": {"trim": True, "ignore_case": True,
+                                          "empty_as_null": True}}
+        for motor in ("hash", "merge", "pushdown", "external"):
+            resultado = self.comparator.compare(motor)
+            self.assertEqual(resultado.stats["identicos"], 2, motor)
+            self.assertEqual(resultado.modified, [(("3", "C", 30), ("3", "C", 31))], motor)
+
+    def test_clave_inexistente(self):
+        """Test: Una clave que no está en ambas tablas es un error de configuración"""
+        self.config["key_columns"] = ["Extra"]
+
+        with self.assertRaises(ValueError):
+            self.comparator.compare()
+
+
+class TestExternalEnStreaming(unittest.TestCase):
+    """Tests para TableComparator.iter_external con tablas de 40.000 filas"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.temporal = directorio.name
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "external.db"),
+            "schemas": [],
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(f"CREATE TABLE {tabla} (Codigo TEXT, Nombre TEXT, Monto INT)")
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, ?, ?)",
+                               [(f"{i:06d}", f"nombre {i}", i) for i in range(40000)])
+        self.db.execute_insert("INSERT INTO tabla2 VALUES (?, ?, ?)",
+                               [(f"{i:06d}", f"nombre {i}", i + (i % 3 == 0))
+                                for i in range(5000, 45000)])
+        self.config = {"source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+                       "result_table": "dbo.tabla3", "key_columns": ["codigo"]}
+        self.comparator = TableComparator(self.db, self.config)
+        self.comparator.comparison_columns()
+
+    def pico(self, funcion):
+        tracemalloc.start()
+        try:
+            funcion()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memoria_acotada_por_el_presupuesto(self):
+        """Test: El pico de memoria en streaming no supera el presupuesto"""
+        presupuesto = 1 << 20
+        contar = lambda: sum(1 for _ in self.comparator.iter_external(
+            True, chunk_size=1000, memory_budget_mb=1, temp_dir=self.temporal))
+
+        self.assertLess(self.pico(contar), presupuesto)
+        self.assertGreater(self.pico(lambda: self.comparator.compare("hash")), 4 * presupuesto)
+        self.assertEqual(self.comparator.last_external_stats["filas"], 80000)
+
+    def test_inyeccion_en_streaming(self):
+        """Test: Con compare_engine external tabla3 recibe los mismos grupos que con hash"""
+        stats = self.comparator.compare("hash").stats
+        esperado = {"SOLO_ORIGEN": stats["solo_origen"], "SOLO_COMPARACION": stats["solo_comparacion"],
+                    "COINCIDENTE": stats["identicos"], "MODIFICADO": stats["modificados"]}
+        injector = DataInjector(self.db, self.config)
+
+        with patch.dict(PROCESSING_CONFIG, {"compare_engine": "external",
+                                            "compare_temp_dir": self.temporal}):
+            with patch.object(self.comparator.__class__, "compare",
+                              side_effect=AssertionError("compare materializa")):
+                self.assertTrue(injector.inject_data(pipelined=False, differential=False,
+                                                     staged=False))
+
+        conteo = dict(self.db.execute_query(
+            "SELECT TIPO_COMPARACION, COUNT(*) FROM tabla3 GROUP BY TIPO_COMPARACION"
+        ))
+        self.assertEqual(conteo, esperado)
+        self.assertFalse([f for f in os.listdir(self.temporal) if f.startswith("comparacion_")])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+"""
+Test de Enrutamiento Lectura/Escritura
+Valida que DatabaseManager envía las lecturas a la réplica usando dos bases
+del backend SQLite como sustitutos del primario y de la réplica
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestEnrutamientoLectura(unittest.TestCase):
+    """Tests para read_config / route="read" en DatabaseManager"""
+
+    def setUp(self):
+        # Un archivo SQLite por servidor con una fila que lo identifica
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.configs = {}
+        for servidor in ("primario.local", "replica.local"):
+            config = {
+                "backend": "sqlite",
+                "server": servidor,
+                "database": os.path.join(directorio.name, f"{servidor}.db"),
+                "schemas": [],
+            }
+            db = DatabaseManager(config=config)
+            db.execute_non_query("CREATE TABLE nodos (nombre TEXT)")
+            db.execute_non_query("INSERT INTO nodos VALUES (?)", (servidor,))
+            self.configs[servidor] = config
+        close_all_pools()
+        self.primario = self.configs["primario.local"]
+        self.replica = {"database": self.configs["replica.local"]["database"],
+                        "server": "replica.local"}
+
+    def test_lectura_va_a_la_replica(self):
+        """Test: route="read" consulta la réplica y el resto el primario"""
+        db = DatabaseManager(config=self.primario, read_config=self.replica)
+
+        self.assertEqual(db.execute_query("SELECT nombre FROM nodos", route="read"),
+                         [("replica.local",)])
+        self.assertEqual(db.execute_query("SELECT nombre FROM nodos"),
+                         [("primario.local",)])
+        self.assertIsNot(db.read_pool, db.pool)
+
+    def test_sin_replica_usa_primario(self):
+        """Test: Sin réplica configurada las lecturas van al primario"""
+        db = DatabaseManager(config=self.primario)
+
+        self.assertIs(db.read_pool, db.pool)
+        self.assertEqual(db.execute_query("SELECT nombre FROM nodos", route="read"),
+                         [("primario.local",)])
+
+    def test_replica_caida_usa_primario(self):
+        """Test: Con el circuito de la réplica abierto se lee del primario"""
+        db = DatabaseManager(config=self.primario, read_config=self.replica)
+        for _ in range(db.read_breaker.failure_threshold):
+            db.read_breaker.record_failure()
+
+        self.assertEqual(db.execute_query("SELECT nombre FROM nodos", route="read"),
+                         [("primario.local",)])
+
+    def test_iter_query_respeta_ruta(self):
+        """Test: Las lecturas por bloques también se enrutan"""
+        db = DatabaseManager(config=self.primario, read_config=self.replica)
+
+        filas = list(db.iter_query("SELECT nombre FROM nodos", route="read"))
+        self.assertEqual(filas, [("replica.local",)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
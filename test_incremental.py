@@ -0,0 +1,122 @@
+"""
+Test de Comparación Incremental
+Valida las marcas de agua y la actualización de tabla3 sólo con las claves
+que cambiaron (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from datetime import datetime
+from src.database import DatabaseManager, close_all_pools
+from src.injection import DataInjector
+from src.watermark import WatermarkStore, decode_watermark, encode_watermark
+
+
+class TestMarcas(unittest.TestCase):
+    """Tests para la codificación de marcas de agua"""
+
+    def test_ida_y_vuelta(self):
+        """Test: rowversion, fechas, enteros y texto conservan su tipo"""
+        for valor in (b"\x00\x00\x00\x00\x00\x00\x07\xd1", datetime(2024, 5, 1, 8, 30, 0, 120000),
+                      42, "2024-05-01 08:30:00"):
+            self.assertEqual(decode_watermark(*encode_watermark(valor)), valor)
+
+
+class TestInyeccionIncremental(unittest.TestCase):
+    """Tests para DataInjector.inject_incremental"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "incremental.db"),
+            "schemas": [],
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(
+                f"CREATE TABLE {tabla} (Codigo TEXT, Estado TEXT, Ultima_Actualizacion TEXT)"
+            )
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, ?, '2024-01-01 00:00:00')",
+                               [(str(i), "OPEN") for i in range(100)])
+        self.db.execute_insert("INSERT INTO tabla2 VALUES (?, ?, '2024-01-01 00:00:00')",
+                               [(str(i), "OPEN") for i in range(50, 150)])
+        self.config = {"source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+                       "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+                       "ignore_columns": ["Ultima_Actualizacion"],
+                       "watermark_column": "Ultima_Actualizacion"}
+        self.injector = DataInjector(self.db, self.config)
+
+    def resultado(self):
+        return dict(self.db.execute_query("SELECT Codigo, TIPO_COMPARACION FROM tabla3"))
+
+    def test_primera_corrida_completa(self):
+        """Test: Sin marcas se reconcilia todo y se guardan las marcas"""
+        self.assertTrue(self.injector.inject_incremental())
+
+        self.assertEqual(len(self.resultado()), 150)
+        self.assertEqual(WatermarkStore(self.db).get("dbo.tabla1", "Ultima_Actualizacion"),
+                         "2024-01-01 00:00:00")
+
+    def test_solo_claves_cambiadas(self):
+        """Test: La segunda corrida sólo lee y reemplaza las claves actualizadas"""
+        self.injector.inject_incremental()
+        self.db.execute_non_query("UPDATE tabla1 SET Estado = 'CLOSED', "
+                                  "Ultima_Actualizacion = '2024-02-01 00:00:00' WHERE Codigo = '60'")
+        self.db.execute_non_query("INSERT INTO tabla2 VALUES ('5', 'OPEN', '2024-02-01 00:00:00')")
+        self.db.metrics.reset()
+
+        self.assertTrue(self.injector.inject_incremental())
+
+        resultado = self.resultado()
+        self.assertEqual(len(resultado), 150)
+        self.assertEqual(resultado["60"], "MODIFICADO")
+        self.assertEqual(resultado["5"], "COINCIDENTE")
+        self.assertEqual(self.db.metrics.report()["comparar_por_clave"]["filas"], 4)
+        self.assertEqual(self.db.metrics.report()["comparar_cambios"]["filas"], 2)
+
+    def test_sin_cambios(self):
+        """Test: Sin filas nuevas no se toca tabla3"""
+        self.injector.inject_incremental()
+        result, claves, _ = self.injector.comparator.compare_changes({
+            "dbo.tabla1": "2024-01-01 00:00:00", "dbo.tabla2": "2024-01-01 00:00:00",
+        })
+
+        self.assertEqual(claves, [])
+        self.assertEqual(result.stats["claves_cambiadas"], 0)
+
+    def test_clave_nula(self):
+        """Test: Una fila con clave NULL que cambia se reemplaza en lugar de duplicarse"""
+        self.db.execute_non_query("INSERT INTO tabla1 VALUES (NULL, 'OPEN', '2024-01-01 00:00:00')")
+        self.injector.inject_incremental()
+
+        for mes, estado in (("02", "CLOSED"), ("03", "PENDING")):
+            self.db.execute_non_query(
+                f"UPDATE tabla1 SET Estado = '{estado}', "
+                f"Ultima_Actualizacion = '2024-{mes}-01 00:00:00' WHERE Codigo IS NULL"
+            )
+            self.assertTrue(self.injector.inject_incremental())
+
+        self.assertEqual(self.db.execute_query(
+            "SELECT Estado, TIPO_COMPARACION FROM tabla3 WHERE Codigo IS NULL"
+        ), [("PENDING", "SOLO_ORIGEN")])
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM tabla3"), [(151,)])
+
+    def test_reconciliacion_completa(self):
+        """Test: full=True reconstruye tabla3 (p. ej. para reflejar bajas)"""
+        self.injector.inject_incremental()
+        self.db.execute_non_query("DELETE FROM tabla1 WHERE Codigo = '0'")
+
+        self.injector.inject_incremental()
+        self.assertIn("0", self.resultado())
+        self.injector.inject_incremental(full=True)
+        self.assertNotIn("0", self.resultado())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+"""
+Test del Índice Jerárquico de Checksums
+Valida que ComparadorOptimizado sólo baje a los subrangos que cambiaron
+entre ejecuciones (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from src.database import DatabaseManager, close_all_pools
+from src.optimizacion import ComparadorOptimizado, IndiceChecksum, SyncCache, SUBRANGOS
+
+FILAS = 5000
+
+
+class TestIndiceChecksum(unittest.TestCase):
+    """Tests para comparar_optimizado con el índice local"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "indice.db"),
+        })
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[homeb2c_tck] (Ticket NVARCHAR(20), Nodo NVARCHAR(10), Estado NVARCHAR(20))"
+        )
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[homeb2c_tiv] (Incident NVARCHAR(20), Nodo NVARCHAR(10), Estado NVARCHAR(20))"
+        )
+        self.db.execute_insert("INSERT INTO [tigostar].[homeb2c_tck] VALUES (?, ?, ?)",
+                               [(f"T{i}", "N1", "OPEN") for i in range(FILAS)])
+        self.db.execute_insert("INSERT INTO [tigostar].[homeb2c_tiv] VALUES (?, ?, ?)",
+                               [(f"T{i}", "N1", "OPEN") for i in range(0, FILAS, 2)])
+        self.indice = IndiceChecksum(self.db, os.path.join(directorio.name, "cache"))
+        self.comparador = ComparadorOptimizado(self.db, SyncCache(self.db), self.indice)
+
+    def comparar(self):
+        return self.comparador.comparar_optimizado("N1", "homeb2c_tck", "homeb2c_tiv")
+
+    def test_primera_ejecucion_completa(self):
+        """Test: Sin índice previo se recorre el nodo completo y se guarda el índice"""
+        resultado = self.comparar()
+
+        self.assertFalse(resultado["desde_cache"])
+        self.assertEqual(resultado["registros_procesados"], FILAS)
+        self.assertTrue(os.path.exists(self.indice.ruta("N1", "homeb2c_tck")))
+        self.assertTrue(self.comparar()["desde_cache"])
+
+    def test_solo_subrangos_modificados(self):
+        """Test: Con 3 ediciones sólo viajan las filas de sus subrangos"""
+        self.comparar()
+        for ticket in ("T10", "T2001", "T4999"):
+            self.db.execute_non_query(
+                "UPDATE [tigostar].[homeb2c_tck] SET Estado = 'CLOSED' WHERE Ticket = ?", (ticket,)
+            )
+
+        resultado = self.comparar()
+
+        self.assertFalse(resultado["desde_cache"])
+        self.assertEqual(resultado["rangos_modificados"], 3)
+        self.assertEqual(resultado["subrangos_modificados"], 3)
+        self.assertGreaterEqual(resultado["registros_procesados"], 3)
+        self.assertLess(resultado["registros_procesados"], 3 * 4 * FILAS // SUBRANGOS + 10)
+        self.assertTrue(self.comparar()["desde_cache"])
+
+    def test_filas_nuevas_y_borradas(self):
+        """Test: Altas y bajas también marcan su subrango como distinto"""
+        self.comparar()
+        self.db.execute_non_query("DELETE FROM [tigostar].[homeb2c_tiv] WHERE Incident = 'T8'")
+        self.db.execute_insert("INSERT INTO [tigostar].[homeb2c_tiv] VALUES (?, ?, ?)",
+                               [("T9001", "N1", "OPEN")])
+
+        resultado = self.comparar()
+
+        self.assertEqual(resultado["subrangos_modificados"], 2)
+        self.assertLess(resultado["registros_procesados"], 50)
+
+    def test_indice_danado(self):
+        """Test: Un índice ilegible se ignora y se reconstruye"""
+        self.comparar()
+        with open(self.indice.ruta("N1", "homeb2c_tck"), "w", encoding="utf-8") as f:
+            f.write("{no es json")
+
+        self.assertIsNone(self.indice.cargar("N1", "homeb2c_tck"))
+        self.db.execute_non_query("UPDATE [tigostar].[homeb2c_tck] SET Estado = 'X' WHERE Ticket = 'T1'")
+        self.assertEqual(self.comparar()["registros_procesados"], FILAS)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,153 @@
+"""
+Test de la Inyección Diferencial
+Valida que tabla3 se actualice con un único MERGE desde la tabla delta,
+escribiendo sólo las filas que cambiaron (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from config.credentials import PROCESSING_CONFIG
+from src.database import DatabaseManager, close_all_pools
+from src.diff import row_hash
+from src.injection import DataInjector
+
+
+class TestInyeccionDiferencial(unittest.TestCase):
+    """Tests para DataInjector.inject_differential"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "diferencial.db"),
+            "schemas": [],
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(f"CREATE TABLE {tabla} (Codigo TEXT, Estado TEXT)")
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, ?)",
+                               [(str(i), "OPEN") for i in range(100)])
+        self.db.execute_insert("INSERT INTO tabla2 VALUES (?, ?)",
+                               [(str(i), "OPEN") for i in range(50, 150)])
+        self.injector = DataInjector(self.db, {
+            "source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+            "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def resultado(self):
+        return dict(self.db.execute_query("SELECT Codigo, TIPO_COMPARACION FROM tabla3"))
+
+    def test_huella_estable(self):
+        """Test: La huella depende sólo de los valores y cabe en BIGINT"""
+        huella = row_hash(("1", "OPEN", "COINCIDENTE"))
+
+        self.assertEqual(huella, row_hash(["1", "OPEN", "COINCIDENTE"]))
+        self.assertNotEqual(huella, row_hash(("1", "CLOSED", "COINCIDENTE")))
+        self.assertTrue(-2 ** 63 <= huella < 2 ** 63)
+
+    def test_primera_carga_y_sin_cambios(self):
+        """Test: La primera corrida inserta todo; la segunda no escribe nada"""
+        self.assertTrue(self.injector.inject_differential())
+        self.assertEqual(self.injector.last_differential_stats["insertadas"], 150)
+        self.assertEqual(len(self.resultado()), 150)
+
+        self.assertTrue(self.injector.inject_differential())
+        stats = self.injector.last_differential_stats
+        self.assertEqual(stats["sin_cambios"], 150)
+        self.assertEqual(stats["filas_escritas"], 0)
+        self.assertFalse(self.db.table_exists("dbo.tabla3_delta"))
+
+    def test_solo_escribe_cambios(self):
+        """Test: Altas, cambios y bajas se aplican con un MERGE sobre las claves cambiadas"""
+        self.injector.inject_differential()
+        self.db.execute_non_query("UPDATE tabla1 SET Estado = 'CLOSED' WHERE Codigo = '60'")
+        self.db.execute_non_query("DELETE FROM tabla2 WHERE Codigo = '140'")
+        self.db.execute_non_query("INSERT INTO tabla1 VALUES ('900', 'OPEN')")
+
+        self.assertTrue(self.injector.inject_differential())
+        stats = self.injector.last_differential_stats
+        self.assertEqual((stats["insertadas"], stats["actualizadas"], stats["borradas"]),
+                         (1, 1, 1))
+        self.assertEqual(stats["filas_escritas"], 3)
+        resultado = self.resultado()
+        self.assertEqual(resultado["60"], "MODIFICADO")
+        self.assertEqual(resultado["900"], "SOLO_ORIGEN")
+        self.assertNotIn("140", resultado)
+        self.assertEqual(len(resultado), 150)
+
+    def test_tabla_cargada_sin_huellas(self):
+        """Test: Una tabla3 cargada con inject_data se completa con ROW_HASH"""
+        self.assertTrue(self.injector.inject_data(pipelined=False, differential=False))
+        self.db.execute_non_query("ALTER TABLE tabla3 DROP COLUMN ROW_HASH")
+        self.db.schema.invalidate("dbo.tabla3")
+
+        self.assertTrue(self.injector.inject_differential())
+        self.assertEqual(self.injector.last_differential_stats["actualizadas"], 150)
+        self.assertEqual(self.db.execute_query(
+            "SELECT COUNT(*) FROM tabla3 WHERE ROW_HASH IS NULL"
+        ), [(0,)])
+
+    def test_clave_nula(self):
+        """Test: Una clave NULL se reconoce entre corridas en lugar de insertarse otra vez"""
+        self.db.execute_non_query("INSERT INTO tabla1 VALUES (NULL, 'OPEN')")
+        self.assertTrue(self.injector.inject_differential())
+        self.assertTrue(self.injector.inject_differential())
+
+        stats = self.injector.last_differential_stats
+        self.assertEqual((stats["sin_cambios"], stats["filas_escritas"]), (151, 0))
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM tabla3"), [(151,)])
+
+        self.db.execute_non_query("DELETE FROM tabla1 WHERE Codigo IS NULL")
+        self.assertTrue(self.injector.inject_differential())
+        self.assertEqual(self.injector.last_differential_stats["borradas"], 1)
+        self.assertEqual(self.db.execute_query(
+            "SELECT COUNT(*) FROM tabla3 WHERE Codigo IS NULL"
+        ), [(0,)])
+
+    def test_clave_max_sin_indice_en_delta(self):
+        """Test: Una clave NVARCHAR(MAX) no se indexa en la tabla delta"""
+        for tabla in ("origen", "comparacion"):
+            self.db.execute_non_query(
+                f"CREATE TABLE {tabla} (Codigo NVARCHAR(MAX), Estado NVARCHAR(10))"
+            )
+        self.db.execute_insert("INSERT INTO origen VALUES (?, 'OPEN')",
+                               [(str(i),) for i in range(10)])
+        injector = DataInjector(self.db, {
+            "source_table": "dbo.origen", "comparison_table": "dbo.comparacion",
+            "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+        })
+        ejecutar = self.db.execute_non_query
+        sentencias = []
+
+        def registrar(query, *args, **kwargs):
+            sentencias.append(query)
+            return ejecutar(query, *args, **kwargs)
+
+        with patch.object(self.db, "execute_non_query", side_effect=registrar):
+            self.assertTrue(injector.inject_differential())
+
+        self.assertEqual(injector.last_differential_stats["insertadas"], 10)
+        self.assertFalse([q for q in sentencias if "ix_tabla3_delta_clave" in q])
+
+    def test_motor_solo_conteo_no_borra(self):
+        """Test: Con pushdown no se borran de tabla3 las filas coincidentes"""
+        self.assertTrue(self.injector.inject_differential())
+
+        with patch.dict(PROCESSING_CONFIG, {"compare_engine": "pushdown"}):
+            with self.assertRaises(ValueError):
+                self.injector.inject_differential()
+            with self.assertRaises(ValueError):
+                self.injector.inject_data(pipelined=False, differential=False)
+
+        self.assertEqual(list(self.resultado().values()).count("COINCIDENTE"), 50)
+        self.assertEqual(len(self.resultado()), 150)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
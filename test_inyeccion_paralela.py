@@ -0,0 +1,103 @@
+"""
+Test de Inyección en Paralelo
+Valida el reparto por rangos de clave, los escritores con conexión propia y
+la reversión de la corrida cuando un escritor falla (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.database import DatabaseManager, close_all_pools
+from src.diff import key_range_shards
+from src.injection import DataInjector
+
+
+class TestRangosDeClave(unittest.TestCase):
+    """Tests para diff.key_range_shards"""
+
+    def test_rangos_disjuntos(self):
+        """Test: Rangos contiguos, ordenados y sin partir una misma clave"""
+        filas = [(k, i) for i, k in enumerate([5, 3, None, 3, 3, 9, 1, 7, 7, 2])]
+        rangos = key_range_shards(filas, [0], 3)
+
+        claves = [[fila[0] for fila in rango] for rango in rangos]
+        self.assertEqual(sum(claves, []), [None, 1, 2, 3, 3, 3, 5, 7, 7, 9])
+        self.assertEqual(len(rangos), 3)
+        self.assertEqual(len([c for c in claves if 3 in c]), 1)
+        self.assertEqual(len([c for c in claves if 7 in c]), 1)
+
+    def test_mas_rangos_que_filas(self):
+        """Test: No se generan rangos vacíos"""
+        self.assertEqual(key_range_shards([(1,), (2,)], [0], 4), [[(1,)], [(2,)]])
+
+
+class TestInyeccionParalela(unittest.TestCase):
+    """Tests para DataInjector.inject_sharded"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "paralela.db"),
+            "schemas": [],
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(f"CREATE TABLE {tabla} (Codigo TEXT, Estado TEXT)")
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, 'OPEN')",
+                               [(f"{i:05d}",) for i in range(3000)])
+        self.db.execute_insert("INSERT INTO tabla2 VALUES (?, ?)",
+                               [(f"{i:05d}", "OPEN" if i % 10 else "CLOSED")
+                                for i in range(1000, 4000)])
+        self.injector = DataInjector(self.db, {
+            "source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+            "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def conteo(self):
+        return dict(self.db.execute_query(
+            "SELECT TIPO_COMPARACION, COUNT(*) FROM tabla3 GROUP BY TIPO_COMPARACION"
+        ))
+
+    def test_mismo_resultado_que_por_lotes(self):
+        """Test: Tres escritores insertan las mismas filas, cada uno su rango"""
+        self.assertTrue(self.injector.inject_data(pipelined=False))
+        esperado = self.conteo()
+        self.injector.clear_result_table()
+
+        self.assertTrue(self.injector.inject_sharded(writers=3))
+
+        self.assertEqual(self.conteo(), esperado)
+        estadisticas = self.injector.last_sharded_stats
+        self.assertEqual(estadisticas["registros"], 4000)
+        self.assertEqual([e["estado"] for e in estadisticas["escritores"]], ["ok"] * 3)
+        rangos = [e["rango"] for e in estadisticas["escritores"]]
+        for (_, fin), (inicio, _) in zip(rangos, rangos[1:]):
+            self.assertLess(fin, inicio)
+
+    def test_fallo_de_un_escritor_revierte(self):
+        """Test: Si un escritor falla se borran las filas de la corrida"""
+        self.assertTrue(self.injector.inject_data(pipelined=False))
+        insertar = self.db.execute_insert
+
+        def falla_un_rango(query, data, *args, **kwargs):
+            filas = list(data)
+            if filas and filas[0][0] >= "02000":
+                raise RuntimeError("sin conexión")
+            return insertar(query, filas, *args, **kwargs)
+
+        with patch.object(self.db, "execute_insert", side_effect=falla_un_rango):
+            self.assertFalse(self.injector.inject_sharded(writers=2))
+
+        estados = [e["estado"] for e in self.injector.last_sharded_stats["escritores"]]
+        self.assertIn("error", estados)
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM tabla3"), [(4000,)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
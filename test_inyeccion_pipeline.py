@@ -0,0 +1,94 @@
+"""
+Test de Inyección en Tubería
+Valida que comparar e insertar con cola acotada y varios escritores deje
+en tabla3 lo mismo que la inyección por lotes (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from config.credentials import PROCESSING_CONFIG
+from src.database import DatabaseManager, close_all_pools
+from src.injection import DataInjector
+
+
+class TestInyeccionPipeline(unittest.TestCase):
+    """Tests para DataInjector.inject_pipelined"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "pipeline.db"),
+            "schemas": [],
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(f"CREATE TABLE {tabla} (Codigo TEXT, Estado TEXT)")
+        self.db.execute_insert("INSERT INTO tabla1 VALUES (?, 'OPEN')",
+                               [(f"{i:05d}",) for i in range(3000)])
+        self.db.execute_insert("INSERT INTO tabla2 VALUES (?, ?)",
+                               [(f"{i:05d}", "OPEN" if i % 10 else "CLOSED")
+                                for i in range(1000, 4000)])
+        self.injector = DataInjector(self.db, {
+            "source_table": "dbo.tabla1", "comparison_table": "dbo.tabla2",
+            "result_table": "dbo.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def conteo(self):
+        return dict(self.db.execute_query(
+            "SELECT TIPO_COMPARACION, COUNT(*) FROM tabla3 GROUP BY TIPO_COMPARACION"
+        ))
+
+    def test_mismo_resultado_que_por_lotes(self):
+        """Test: Dos escritores y cola de 2 lotes insertan las mismas filas"""
+        self.assertTrue(self.injector.inject_data(pipelined=False))
+        esperado = self.conteo()
+        self.injector.clear_result_table()
+
+        self.assertTrue(self.injector.inject_pipelined(writers=2, queue_batches=2))
+
+        self.assertEqual(self.conteo(), esperado)
+        estadisticas = self.injector.last_pipeline_stats
+        self.assertEqual(estadisticas["registros"], 4000)
+        self.assertEqual(len(estadisticas["escritores"]), 2)
+        self.assertEqual(estadisticas["comparacion"]["registros"], 4000)
+
+    def test_fallo_del_escritor(self):
+        """Test: Si la escritura falla la tubería termina y reporta error"""
+        with patch.object(self.db, "execute_insert", side_effect=RuntimeError("sin conexión")):
+            self.assertFalse(self.injector.inject_pipelined(writers=2, queue_batches=1))
+
+    def test_fallo_de_un_escritor_revierte(self):
+        """Test: Si un escritor falla se borran los lotes que otros ya confirmaron"""
+        self.assertTrue(self.injector.inject_data(pipelined=False))
+        insertar = self.db.execute_insert
+        llamadas = []
+
+        def falla_el_segundo(query, data, *args, **kwargs):
+            llamadas.append(query)
+            if len(llamadas) == 2:
+                # Falla cuando el otro escritor ya confirmó algún lote
+                limite = time.monotonic() + 5
+                while (self.db.execute_query("SELECT COUNT(*) FROM tabla3")[0][0] <= 4000
+                       and time.monotonic() < limite):
+                    time.sleep(0.01)
+                raise RuntimeError("sin conexión")
+            return insertar(query, data, *args, **kwargs)
+
+        with patch.dict(PROCESSING_CONFIG, {"batch_size": 100}), \
+                patch.object(self.db, "execute_insert", side_effect=falla_el_segundo):
+            self.assertFalse(self.injector.inject_pipelined(writers=2, queue_batches=1))
+
+        self.assertGreater(self.injector.last_pipeline_stats["revertidas"], 0)
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM tabla3"), [(4000,)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+"""
+Test de la Inyección con Staging
+Valida la carga en {tabla3}_staging y el intercambio atómico con la tabla
+vigente (backend SQLite)
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.database import DatabaseManager, close_all_pools
+from src.injection import DataInjector
+
+
+class TestInyeccionStaging(unittest.TestCase):
+    """Tests para DataInjector.inject_staged"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "staging.db"),
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(
+                f"CREATE TABLE [tigostar].[{tabla}] (Codigo NVARCHAR(20), Estado NVARCHAR(20))"
+            )
+        self.db.execute_insert("INSERT INTO [tigostar].[tabla1] VALUES (?, ?)",
+                               [(str(i), "OPEN") for i in range(100)])
+        self.db.execute_insert("INSERT INTO [tigostar].[tabla2] VALUES (?, ?)",
+                               [(str(i), "OPEN") for i in range(50, 150)])
+        self.injector = DataInjector(self.db, {
+            "source_table": "tigostar.tabla1", "comparison_table": "tigostar.tabla2",
+            "result_table": "tigostar.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def tablas_e_indices(self):
+        return {fila[0] for fila in self.db.execute_query(
+            "SELECT name FROM [tigostar].sqlite_master WHERE type IN ('table', 'index')"
+        ) if not fila[0].startswith("sqlite_")}
+
+    def test_carga_e_intercambio(self):
+        """Test: tabla3 queda completa, con sus índices y sin tablas auxiliares"""
+        self.assertTrue(self.injector.inject_staged())
+        self.assertEqual(self.injector.last_staged_stats["registros"], 150)
+
+        self.db.execute_non_query("UPDATE [tigostar].[tabla1] SET Estado = 'CLOSED' WHERE Codigo = '60'")
+        self.assertTrue(self.injector.inject_staged())
+
+        self.assertEqual(self.tablas_e_indices(),
+                         {"tabla1", "tabla2", "tabla3", "ix_tabla3_clave", "ix_tabla3_tipo"})
+        self.assertEqual(self.db.execute_query(
+            "SELECT TIPO_COMPARACION FROM [tigostar].[tabla3] WHERE Codigo = '60'"
+        ), [("MODIFICADO",)])
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM [tigostar].[tabla3]"),
+                         [(150,)])
+
+    def test_falla_antes_del_intercambio(self):
+        """Test: Si la carga falla, la tabla vigente no cambia"""
+        self.injector.inject_staged()
+        self.db.execute_non_query("DELETE FROM [tigostar].[tabla2]")
+
+        with patch.object(self.injector.comparator, "iter_injection_rows",
+                          side_effect=RuntimeError("corte de red")):
+            self.assertFalse(self.injector.inject_staged())
+
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM [tigostar].[tabla3]"),
+                         [(150,)])
+        self.assertTrue(self.injector.inject_staged())
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM [tigostar].[tabla3]"),
+                         [(100,)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,86 @@
+"""
+Test de la Lectura en Streaming
+Valida DatabaseManager.iter_query: tamaño de bloque, modo chunks y que la
+conexión vuelva al pool aunque el generador no se consuma completo
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gc
+import tempfile
+import unittest
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestIterQuery(unittest.TestCase):
+    """Tests para DatabaseManager.iter_query sobre SQLite"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "streaming.db"),
+            "schemas": [],
+        })
+        self.db.execute_non_query("CREATE TABLE numeros (n INTEGER)")
+        self.db.execute_insert("INSERT INTO numeros VALUES (?)", [(i,) for i in range(100)])
+
+    def prestadas(self):
+        return self.db.pool.stats()["prestadas"]
+
+    def test_filas_sueltas(self):
+        """Test: Sin chunks entrega cada fila en orden, sin importar chunk_size"""
+        filas = list(self.db.iter_query("SELECT n FROM numeros ORDER BY n", chunk_size=7))
+
+        self.assertEqual(filas, [(i,) for i in range(100)])
+
+    def test_bloques(self):
+        """Test: Con chunks=True entrega listas de chunk_size filas (la última, el resto)"""
+        bloques = list(self.db.iter_query("SELECT n FROM numeros ORDER BY n",
+                                          chunk_size=40, chunks=True))
+
+        self.assertEqual([len(b) for b in bloques], [40, 40, 20])
+        self.assertEqual(bloques[1][0], (40,))
+
+    def test_parametros(self):
+        """Test: Los parámetros se pasan a la consulta"""
+        filas = list(self.db.iter_query("SELECT n FROM numeros WHERE n < ?", (3,)))
+
+        self.assertEqual(sorted(filas), [(0,), (1,), (2,)])
+
+    def test_conexion_prestada_mientras_se_consume(self):
+        """Test: La conexión se presta al empezar y vuelve al agotar el generador"""
+        filas = self.db.iter_query("SELECT n FROM numeros", chunk_size=10)
+        next(filas)
+        self.assertEqual(self.prestadas(), 1)
+
+        list(filas)
+        self.assertEqual(self.prestadas(), 0)
+
+    def test_consumo_parcial_y_cierre(self):
+        """Test: Cerrar un generador a medio consumir devuelve la conexión"""
+        filas = self.db.iter_query("SELECT n FROM numeros", chunk_size=10)
+        for _ in range(15):
+            next(filas)
+        filas.close()
+
+        self.assertEqual(self.prestadas(), 0)
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM numeros"), [(100,)])
+
+    def test_generador_abandonado(self):
+        """Test: Un generador descartado sin cerrar también devuelve la conexión"""
+        filas = self.db.iter_query("SELECT n FROM numeros", chunk_size=10)
+        next(filas)
+        del filas
+        gc.collect()
+
+        self.assertEqual(self.prestadas(), 0)
+        self.assertEqual(self.db.pool.stats()["abiertas"], self.db.pool.stats()["libres"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
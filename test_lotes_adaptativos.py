@@ -0,0 +1,155 @@
+"""
+Test de Lotes Adaptativos
+Valida que AdaptiveBatchSizer ajuste el tamaño de lote hacia la latencia
+objetivo dentro de sus límites y su uso en DatabaseManager.execute_insert
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import threading
+import unittest
+from src.api_gateway import APIGateway
+from src.batching import BATCH_SIZES, AdaptiveBatchSizer, BatchSizeRegistry
+from src.database import DatabaseManager, close_all_pools
+
+
+class TestAdaptiveBatchSizer(unittest.TestCase):
+    """Tests para el controlador de tamaño de lote"""
+
+    def test_crece_si_los_lotes_son_rapidos(self):
+        """Test: Lotes muy por debajo del objetivo duplican el tamaño (tope max_step)"""
+        sizer = AdaptiveBatchSizer(1000, min_size=100, max_size=50000, target_seconds=0.5)
+
+        self.assertEqual(sizer.record(1000, 0.01), 2000)
+        self.assertEqual(sizer.record(2000, 0.02), 4000)
+
+    def test_se_achica_si_los_lotes_son_lentos(self):
+        """Test: Un lote de 2 s con objetivo 0.5 s reduce el tamaño a la mitad"""
+        sizer = AdaptiveBatchSizer(8000, target_seconds=0.5)
+
+        self.assertEqual(sizer.record(8000, 2.0), 4000)
+
+    def test_converge_al_objetivo(self):
+        """Test: Con 0.1 ms por fila y objetivo 0.5 s se estabiliza en ~5000 filas"""
+        sizer = AdaptiveBatchSizer(500, target_seconds=0.5)
+        for _ in range(10):
+            sizer.record(sizer.size, sizer.size * 0.0001)
+
+        self.assertAlmostEqual(sizer.size, 5000, delta=500)
+        self.assertEqual(sizer.stats()["tamanos"][0], 500)
+        self.assertEqual(sizer.stats()["lotes"], 10)
+
+    def test_limites(self):
+        """Test: El tamaño nunca sale de [min_size, max_size]"""
+        sizer = AdaptiveBatchSizer(400, min_size=300, max_size=600, target_seconds=0.5)
+        self.assertEqual(sizer.record(400, 10.0), 300)
+        for _ in range(5):
+            sizer.record(sizer.size, 0.001)
+        self.assertEqual(sizer.size, 600)
+        self.assertEqual(AdaptiveBatchSizer(10).size, 100)
+        with self.assertRaises(ValueError):
+            AdaptiveBatchSizer(100, min_size=500, max_size=100)
+
+
+class TestBatchSizeRegistry(unittest.TestCase):
+    """Tests para el registro compartido de tamaños de lote"""
+
+    def test_aprendido_por_sentencia(self):
+        """Test: Cada sentencia recuerda su propio tamaño final"""
+        registro = BatchSizeRegistry()
+        sizer = AdaptiveBatchSizer(1000)
+        sizer.record(1000, 0.01)
+        registro.record("INSERT INTO a VALUES (?)", "INSERT a", sizer)
+
+        self.assertEqual(registro.learned("INSERT INTO a VALUES (?)", 500), 2000)
+        self.assertEqual(registro.learned("INSERT INTO b VALUES (?)", 500), 500)
+        reporte = registro.report()["INSERT a"]
+        self.assertEqual((reporte["cargas"], reporte["tamano_aprendido"]), (1, 2000))
+        self.assertEqual(reporte["ultima_carga"]["tamanos"], [1000, 2000])
+
+    def test_escritores_concurrentes(self):
+        """Test: Cargas simultáneas de la misma sentencia no pierden registros"""
+        registro = BatchSizeRegistry()
+
+        def cargar():
+            for _ in range(200):
+                registro.record("INSERT INTO a VALUES (?)", "INSERT a", AdaptiveBatchSizer(1000))
+
+        hilos = [threading.Thread(target=cargar) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(registro.report()["INSERT a"]["cargas"], 800)
+
+
+class TestInsertAdaptativo(unittest.TestCase):
+    """Tests para execute_insert(adaptive=True) sobre SQLite"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        BATCH_SIZES.reset()
+        self.addCleanup(BATCH_SIZES.reset)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "lotes.db"),
+            "schemas": [],
+        })
+        self.db.execute_non_query("CREATE TABLE destino (Id INTEGER, Nombre TEXT)")
+
+    def test_inserta_todo_y_recuerda_el_tamano(self):
+        """Test: Se insertan todas las filas y la próxima carga parte del tamaño aprendido"""
+        consulta = "INSERT INTO destino VALUES (?, ?)"
+        filas = [(i, f"fila {i}") for i in range(20000)]
+
+        insertadas = self.db.execute_insert(consulta, iter(filas), batch_size=200,
+                                            adaptive=True)
+
+        self.assertEqual(insertadas, 20000)
+        self.assertEqual(self.db.execute_query("SELECT COUNT(*) FROM destino"), [(20000,)])
+        lotes = self.db.last_insert_stats["lotes"]
+        self.assertEqual(lotes["tamano_inicial"], 200)
+        self.assertGreater(lotes["tamano_final"], 200)
+
+        self.db.execute_insert(consulta, filas[:10], batch_size=200, adaptive=True)
+        self.assertEqual(self.db.last_insert_stats["lotes"]["tamano_inicial"],
+                         lotes["tamano_final"])
+
+    def test_estadisticas_por_hilo_y_en_gateway(self):
+        """Test: Cada hilo ve su propia carga y el gateway expone los tamaños aprendidos"""
+        consulta = "INSERT INTO destino VALUES (?, ?)"
+        vistos = {}
+
+        def cargar(filas):
+            self.db.execute_insert(consulta, [(i, "x") for i in range(filas)],
+                                   batch_size=100, adaptive=True)
+            vistos[filas] = self.db.last_insert_stats["registros"]
+
+        hilos = [threading.Thread(target=cargar, args=(filas,)) for filas in (300, 700)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(vistos, {300: 300, 700: 700})
+        self.assertEqual(self.db.last_insert_stats, {})
+        lotes = APIGateway(self.db).get_optimization_stats()["lotes"]
+        self.assertEqual(lotes["INSERT destino"]["cargas"], 2)
+        self.assertEqual(lotes["INSERT destino"]["tamano_aprendido"],
+                         BATCH_SIZES.learned(consulta, 0))
+
+    def test_sin_adaptativo(self):
+        """Test: Con adaptive=False no hay estadísticas de lotes"""
+        self.db.execute_insert("INSERT INTO destino VALUES (?, ?)", [(1, "a")], adaptive=False)
+
+        self.assertNotIn("lotes", self.db.last_insert_stats)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
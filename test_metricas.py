@@ -0,0 +1,59 @@
+"""
+Test de Métricas por Consulta
+Valida histogramas (p50/p95/p99) y etiquetas por defecto
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import unittest
+from src.metrics import Histogram, QueryMetrics, label_for
+
+
+class TestMetricas(unittest.TestCase):
+    """Tests para src.metrics"""
+
+    def test_percentiles_aproximados(self):
+        """Test: Los percentiles caen dentro del error del bucket (~19%)"""
+        histograma = Histogram()
+        for i in range(1, 1001):
+            histograma.add(i / 1000)
+
+        self.assertAlmostEqual(histograma.percentile(0.50), 0.5, delta=0.5 * 0.2)
+        self.assertAlmostEqual(histograma.percentile(0.95), 0.95, delta=0.95 * 0.2)
+        self.assertEqual(histograma.percentile(0.99), histograma.max)
+
+    def test_registro_por_etiqueta(self):
+        """Test: Cada etiqueta acumula llamadas y filas"""
+        metricas = QueryMetrics()
+        metricas.record("paso6_datos_nodo", 0.001, 0.02, 0.005, 10)
+        metricas.record("paso6_datos_nodo", 0.001, 0.04, 0.005, 5)
+        metricas.record("paso2_cierres_automaticos", 0.001, 0.5, 0.0, -1)
+
+        reporte = metricas.report()
+        self.assertEqual(list(reporte)[0], "paso2_cierres_automaticos")
+        self.assertEqual(reporte["paso6_datos_nodo"]["llamadas"], 2)
+        self.assertEqual(reporte["paso6_datos_nodo"]["filas"], 15)
+        self.assertEqual(reporte["paso2_cierres_automaticos"]["filas"], 0)
+
+    def test_desactivado(self):
+        """Test: Con enabled=False no se registra nada"""
+        metricas = QueryMetrics(enabled=False)
+        metricas.record("x", 0.1, 0.1, 0.1, 1)
+        self.assertEqual(metricas.report(), {})
+
+    def test_etiqueta_por_defecto(self):
+        """Test: La etiqueta usa el verbo y la tabla principal"""
+        self.assertEqual(
+            label_for("MERGE [tigostar].[homecc_fal] AS FAL USING (SELECT * FROM x)"),
+            "MERGE homecc_fal",
+        )
+        self.assertEqual(
+            label_for("SELECT TOP 1 x FROM [tigostar].[homeb2c_consolidado]"),
+            "SELECT homeb2c_consolidado",
+        )
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
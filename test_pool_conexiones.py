@@ -0,0 +1,104 @@
+"""
+Test del Pool de Conexiones
+Valida préstamo, reutilización, límites y evicción del pool de DatabaseManager
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from src.database import ConnectionPool, PoolTimeoutError
+
+
+def crear_conexion_falsa():
+    """Conexión simulada que responde a SELECT 1"""
+    conn = MagicMock()
+    conn.cursor.return_value.fetchone.return_value = (1,)
+    return conn
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests para ConnectionPool"""
+
+    def test_reutiliza_conexiones(self):
+        """Test: Una conexión devuelta se vuelve a prestar sin reconectar"""
+        connect = MagicMock(side_effect=crear_conexion_falsa)
+        pool = ConnectionPool(connect, max_size=2)
+
+        conn = pool.acquire()
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(connect.call_count, 1)
+        conn.rollback.assert_called_once()
+
+    def test_timeout_cuando_esta_lleno(self):
+        """Test: Pedir prestado con el pool agotado respeta el timeout"""
+        pool = ConnectionPool(crear_conexion_falsa, max_size=1)
+        pool.acquire()
+
+        inicio = time.monotonic()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire(timeout=0.05)
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_espera_devolucion(self):
+        """Test: Un hilo bloqueado recibe la conexión cuando otro la devuelve"""
+        pool = ConnectionPool(crear_conexion_falsa, max_size=1)
+        conn = pool.acquire()
+        threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+        self.assertIs(pool.acquire(timeout=2), conn)
+
+    def test_descarta_conexion_muerta(self):
+        """Test: La verificación al prestar descarta conexiones caídas"""
+        pool = ConnectionPool(crear_conexion_falsa, max_size=2, validate_after=0)
+        muerta = pool.acquire()
+        pool.release(muerta)
+        muerta.cursor.side_effect = Exception("Communication link failure")
+
+        conn = pool.acquire()
+        self.assertIsNot(conn, muerta)
+        muerta.close.assert_called_once()
+        self.assertEqual(pool.stats()["abiertas"], 1)
+
+    def test_descarta_si_rollback_falla(self):
+        """Test: Una conexión rota al devolverla no vuelve al pool"""
+        pool = ConnectionPool(crear_conexion_falsa, max_size=1)
+        conn = pool.acquire()
+        conn.rollback.side_effect = Exception("Conexión rota")
+        pool.release(conn)
+
+        self.assertEqual(pool.stats()["abiertas"], 0)
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_eviccion_por_inactividad(self):
+        """Test: Las conexiones inactivas se cierran respetando min_size"""
+        pool = ConnectionPool(crear_conexion_falsa, min_size=1, max_size=3,
+                              idle_timeout=0.01)
+        conexiones = [pool.acquire() for _ in range(3)]
+        for conn in conexiones:
+            pool.release(conn)
+        time.sleep(0.03)
+
+        pool.acquire()
+        cerradas = [c for c in conexiones if c.close.called]
+        self.assertEqual(len(cerradas), 2)
+        self.assertEqual(pool.stats()["abiertas"], 1)
+
+    def test_error_de_conexion_libera_cupo(self):
+        """Test: Si falla la conexión, el cupo queda disponible"""
+        connect = MagicMock(side_effect=[Exception("Login failed"), crear_conexion_falsa()])
+        pool = ConnectionPool(connect, max_size=1)
+
+        with self.assertRaises(Exception):
+            pool.acquire()
+        self.assertIsNotNone(pool.acquire(timeout=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,129 @@
+"""
+Test de Resiliencia
+Valida el circuit breaker y los reintentos con backoff ante caídas de SQL Server
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from src.database import DatabaseManager, close_all_pools
+from src.resilience import CircuitBreaker, CircuitOpenError, is_retryable_connect, retry_call
+
+
+class ErrorOdbc(Exception):
+    """Error con SQLSTATE como primer argumento, igual que pyodbc.Error"""
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests para CircuitBreaker"""
+
+    def test_abre_tras_umbral(self):
+        """Test: Tras N fallos seguidos las llamadas fallan al instante"""
+        breaker = CircuitBreaker(failure_threshold=3, open_interval=60)
+        for _ in range(3):
+            breaker.before_call()
+            breaker.record_failure()
+
+        self.assertTrue(breaker.is_open)
+        inicio = time.monotonic()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        self.assertLess(time.monotonic() - inicio, 0.01)
+
+    def test_exito_reinicia_contador(self):
+        """Test: Un éxito intermedio evita que se abra"""
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_semiabierto_prueba_y_cierra(self):
+        """Test: Pasado el intervalo se permite una prueba; si funciona se cierra"""
+        breaker = CircuitBreaker(failure_threshold=1, open_interval=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.before_call()
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_semiabierto_falla_y_reabre(self):
+        """Test: Si la prueba falla el circuito vuelve a abrirse"""
+        breaker = CircuitBreaker(failure_threshold=1, open_interval=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+
+
+class TestRetry(unittest.TestCase):
+    """Tests para retry_call"""
+
+    @patch('src.resilience.time.sleep')
+    def test_reintenta_transitorios(self, mock_sleep):
+        """Test: Los errores de comunicación (08S01) se reintentan"""
+        func = MagicMock(side_effect=[ErrorOdbc("08S01", "Communication link failure"), "ok"])
+        self.assertEqual(retry_call(func, attempts=3), "ok")
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @patch('src.resilience.time.sleep')
+    def test_no_reintenta_errores_sql(self, mock_sleep):
+        """Test: Un error de sintaxis (42000) falla en el primer intento"""
+        func = MagicMock(side_effect=ErrorOdbc("42000", "Incorrect syntax"))
+        with self.assertRaises(ErrorOdbc):
+            retry_call(func, attempts=3)
+        self.assertEqual(func.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    @patch('src.resilience.time.sleep')
+    def test_respeta_intentos(self, mock_sleep):
+        """Test: Tras agotar los intentos se propaga el error"""
+        func = MagicMock(side_effect=ErrorOdbc("HYT00", "Login timeout expired"))
+        with self.assertRaises(ErrorOdbc):
+            retry_call(func, attempts=3, base_delay=0.1, max_delay=0.15)
+        self.assertEqual(func.call_count, 3)
+        for llamada in mock_sleep.call_args_list:
+            self.assertLessEqual(llamada.args[0], 0.15)
+
+
+class TestConexionCaida(unittest.TestCase):
+    """Tests para la apertura de conexiones durante una caída"""
+
+    def setUp(self):
+        self.addCleanup(close_all_pools)
+
+    def test_clasificacion(self):
+        """Test: Los timeouts de conexión no se reintentan; el enlace caído sí"""
+        self.assertFalse(is_retryable_connect(ErrorOdbc("HYT00", "Login timeout expired")))
+        self.assertFalse(is_retryable_connect(ErrorOdbc("08001", "Server not found")))
+        self.assertTrue(is_retryable_connect(ErrorOdbc("08S01", "Communication link failure")))
+
+    @patch('src.resilience.time.sleep')
+    def test_timeout_de_conexion_un_solo_intento(self, mock_sleep):
+        """Test: Un timeout al conectar cuesta un intento y cuenta un fallo del circuito"""
+        db = DatabaseManager(config={"backend": "sqlite", "database": ":memory:",
+                                     "server": "caido.local", "schemas": []})
+        connect = MagicMock(side_effect=ErrorOdbc("HYT00", "Login timeout expired"))
+
+        with patch.object(db.backend, "connect", connect), \
+                patch.object(db.backend, "Error", ErrorOdbc):
+            with self.assertRaises(ErrorOdbc):
+                db.execute_query("SELECT 1")
+
+        self.assertEqual(connect.call_count, 1)
+        mock_sleep.assert_not_called()
+        self.assertEqual(db.breaker.stats()["fallos_consecutivos"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
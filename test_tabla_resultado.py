@@ -0,0 +1,123 @@
+"""
+Test de la Tabla de Resultados
+Valida que tabla3 se cree con los tipos del origen y con índices por clave
+y por TIPO_COMPARACION
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import tempfile
+import unittest
+from src.database import DatabaseManager, close_all_pools
+from src.injection import DataInjector
+from src.schema import ColumnInfo, common_sql_type, indexable_type, sql_type
+
+
+class TestSqlType(unittest.TestCase):
+    """Tests para schema.sql_type"""
+
+    def test_tipos(self):
+        """Test: Largo, (MAX), precisión/escala y rowversion"""
+        self.assertEqual(sql_type(ColumnInfo("a", 1, "nvarchar", 50)), "NVARCHAR(50)")
+        self.assertEqual(sql_type(ColumnInfo("a", 1, "varchar", -1)), "VARCHAR(MAX)")
+        self.assertEqual(sql_type(ColumnInfo("a", 1, "decimal", None, 12, 2)), "DECIMAL(12, 2)")
+        self.assertEqual(sql_type(ColumnInfo("a", 1, "datetime2")), "DATETIME2")
+        self.assertEqual(sql_type(ColumnInfo("a", 1, "timestamp")), "BINARY(8)")
+        self.assertEqual(sql_type(None), "NVARCHAR(MAX)")
+
+    def test_tipo_comun(self):
+        """Test: Mismo tipo toma el largo mayor; tipos distintos pasan a NVARCHAR(MAX)"""
+        entero = ColumnInfo("a", 1, "int")
+        self.assertEqual(common_sql_type(entero, entero), "INT")
+        self.assertEqual(common_sql_type(entero, None), "INT")
+        self.assertEqual(common_sql_type(entero, ColumnInfo("a", 1, "nvarchar", 20)),
+                         "NVARCHAR(MAX)")
+        self.assertEqual(common_sql_type(ColumnInfo("a", 1, "varchar", 20),
+                                         ColumnInfo("a", 1, "varchar", 50)), "VARCHAR(50)")
+        self.assertEqual(common_sql_type(ColumnInfo("a", 1, "varchar", 20),
+                                         ColumnInfo("a", 1, "varchar", -1)), "VARCHAR(MAX)")
+
+    def test_tipos_indexables(self):
+        """Test: (MAX), TEXT, NTEXT, IMAGE y XML no pueden ser clave de índice"""
+        self.assertTrue(indexable_type("NVARCHAR(20)"))
+        for tipo in ("NVARCHAR(MAX)", "TEXT", "NTEXT", "IMAGE", "XML"):
+            self.assertFalse(indexable_type(tipo), tipo)
+
+
+class TestTablaResultado(unittest.TestCase):
+    """Tests para DataInjector.prepare_result_table sobre SQLite"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.addCleanup(close_all_pools)
+        self.db = DatabaseManager(config={
+            "backend": "sqlite",
+            "database": os.path.join(directorio.name, "resultado.db"),
+        })
+        for tabla in ("tabla1", "tabla2"):
+            self.db.execute_non_query(
+                f"CREATE TABLE [tigostar].[{tabla}] (Codigo NVARCHAR(20), "
+                f"Monto DECIMAL(12,2), Fecha DATETIME, Nota NVARCHAR(MAX))"
+            )
+        self.db.execute_insert("INSERT INTO [tigostar].[tabla1] VALUES (?, ?, ?, ?)",
+                               [("A", 10.5, "2024-01-01 00:00:00", "x")])
+        self.injector = DataInjector(self.db, {
+            "source_table": "tigostar.tabla1", "comparison_table": "tigostar.tabla2",
+            "result_table": "tigostar.tabla3", "key_columns": ["Codigo"],
+        })
+
+    def test_columnas_tipadas_e_indices(self):
+        """Test: Tipos del origen, TIPO_COMPARACION acotado e índices creados"""
+        self.assertTrue(self.injector.prepare_result_table())
+
+        tipos = {c.name: (c.data_type, c.max_length)
+                 for c in self.db.schema.get_columns("tigostar.tabla3")}
+        self.assertEqual(tipos["Codigo"], ("nvarchar", 20))
+        self.assertEqual(tipos["Monto"][0], "decimal")
+        self.assertEqual(tipos["Fecha"][0], "datetime")
+        self.assertEqual(tipos["TIPO_COMPARACION"], ("varchar", 20))
+        indices = {fila[0] for fila in self.db.execute_query(
+            "SELECT name FROM [tigostar].sqlite_master WHERE type = 'index'"
+        )}
+        self.assertEqual(indices, {"ix_tabla3_clave", "ix_tabla3_tipo"})
+
+    def test_inyeccion_tipada(self):
+        """Test: Los valores se guardan con su tipo y no como texto"""
+        self.assertTrue(self.injector.inject_data(pipelined=False))
+
+        self.assertEqual(self.db.execute_query(
+            "SELECT Codigo, Monto, TIPO_COMPARACION FROM [tigostar].[tabla3]"
+        ), [("A", 10.5, "SOLO_ORIGEN")])
+
+    def test_tipos_distintos_en_comparacion(self):
+        """Test: Una columna INT en origen y NVARCHAR en comparación admite ambas filas"""
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[origen] (Codigo INT, Nombre NVARCHAR(20))"
+        )
+        self.db.execute_non_query(
+            "CREATE TABLE [tigostar].[comparacion] (Codigo NVARCHAR(20), Nombre NVARCHAR(20))"
+        )
+        self.db.execute_insert("INSERT INTO [tigostar].[origen] VALUES (?, ?)", [(1, "a")])
+        self.db.execute_insert("INSERT INTO [tigostar].[comparacion] VALUES (?, ?)",
+                               [("X-1", "b")])
+        injector = DataInjector(self.db, {
+            "source_table": "tigostar.origen", "comparison_table": "tigostar.comparacion",
+            "result_table": "tigostar.tabla3", "key_columns": ["Codigo"],
+        })
+
+        self.assertTrue(injector.inject_data(pipelined=False))
+
+        tipos = {c.name: (c.data_type, c.max_length)
+                 for c in self.db.schema.get_columns("tigostar.tabla3")}
+        self.assertEqual(tipos["Codigo"][0], "nvarchar")
+        self.assertEqual(tipos["Nombre"], ("nvarchar", 20))
+        self.assertEqual(self.db.execute_query(
+            "SELECT COUNT(*) FROM [tigostar].[tabla3] WHERE TIPO_COMPARACION = 'SOLO_COMPARACION'"
+        ), [(1,)])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)